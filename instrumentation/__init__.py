@@ -0,0 +1,9 @@
+"""
+Request instrumentation shared by the vacation website and the statistics
+backend: the Server-Timing header and slow request log (middleware,
+timing), Prometheus metrics on /metrics (metrics) and database connection
+waits (postgresql).
+
+An installed app, so that SQL is timed on every connection. Both projects'
+settings put the directory holding this package on ``sys.path``.
+"""
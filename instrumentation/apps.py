@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class InstrumentationConfig(AppConfig):
+    name = 'instrumentation'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .timing import install_query_timer
+
+        connection_created.connect(install_query_timer, dispatch_uid='instrumentation.install_query_timer')
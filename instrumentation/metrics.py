@@ -0,0 +1,447 @@
+"""
+Prometheus metrics without a client library or locks.
+
+Every thread writes its samples into a shard of its own, so recording a
+sample never waits on another thread; a thread that exits leaves its shard
+to the next new one. A shard is an append-only table of
+``(key, float64)`` records: new series are appended and published by bumping
+the used length in the header afterwards, existing ones are overwritten in
+place. Only the owning thread ever writes to a shard.
+
+With ``METRICS_DIR`` set the shards are memory-mapped files named after the
+process id, so ``/metrics`` served by any worker sums every worker's shards
+(gunicorn, uWSGI ...). The directory must be emptied whenever the server
+starts. Counters and histograms of exited workers keep counting; gauges only
+include processes that are still alive. Without ``METRICS_DIR`` shards live in
+process memory and only the serving process is reported.
+
+``/metrics`` answers requests from ``METRICS_ALLOWED_NETWORKS`` (loopback
+unless set) and, when ``METRICS_TOKEN`` is set, requests from anywhere
+sending it as ``Authorization: Bearer <token>``; everyone else gets a 403.
+"""
+import hmac
+import ipaddress
+import mmap
+import os
+import struct
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .timing import current_timings
+
+_HEADER = struct.Struct('<Q')
+_RECORD_HEADER = struct.Struct('<I4x')
+_VALUE = struct.Struct('<d')
+_INITIAL_SHARD_SIZE = 64 * 1024
+_SHARD_SUFFIX = '.metrics'
+# Separates the parts of a sample key: metric name, sample suffix, labels, le
+_SEP = '\x1f'
+
+
+class _Shard:
+    """One thread's samples, in a file-backed or in-process buffer"""
+
+    def __init__(self, directory: Optional[str]):
+        self._fd = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{os.getpid()}-{next(_shard_ids)}{_SHARD_SUFFIX}')
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+            os.ftruncate(self._fd, _INITIAL_SHARD_SIZE)
+            self.buffer = mmap.mmap(self._fd, _INITIAL_SHARD_SIZE)
+        else:
+            self.buffer = bytearray(_INITIAL_SHARD_SIZE)
+        self._used = _HEADER.size
+        _HEADER.pack_into(self.buffer, 0, self._used)
+        # key -> [offset of the value, value]
+        self._slots: Dict[str, list] = {}
+
+    def add(self, key: str, amount: float):
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = [self._append(key), 0.0]
+        slot[1] += amount
+        _VALUE.pack_into(self.buffer, slot[0], slot[1])
+
+    def _append(self, key: str) -> int:
+        encoded = key.encode()
+        padded = -(-len(encoded) // 8) * 8
+        size = _RECORD_HEADER.size + padded + _VALUE.size
+        if self._used + size > len(self.buffer):
+            self._grow(max(len(self.buffer) * 2, self._used + size))
+        offset = self._used
+        _RECORD_HEADER.pack_into(self.buffer, offset, len(encoded))
+        self.buffer[offset + _RECORD_HEADER.size:offset + _RECORD_HEADER.size + len(encoded)] = encoded
+        value_offset = offset + _RECORD_HEADER.size + padded
+        _VALUE.pack_into(self.buffer, value_offset, 0.0)
+        # Readers only look at records below the published length
+        self._used += size
+        _HEADER.pack_into(self.buffer, 0, self._used)
+        return value_offset
+
+    def _grow(self, size: int):
+        if self._fd is None:
+            self.buffer.extend(bytes(size - len(self.buffer)))
+            return
+        os.ftruncate(self._fd, size)
+        old, self.buffer = self.buffer, mmap.mmap(self._fd, size)
+        old.close()
+
+
+def _read_records(data) -> Iterable[Tuple[str, float]]:
+    used = _HEADER.unpack_from(data, 0)[0]
+    offset = _HEADER.size
+    while offset < used:
+        length = _RECORD_HEADER.unpack_from(data, offset)[0]
+        start = offset + _RECORD_HEADER.size
+        key = bytes(data[start:start + length]).decode()
+        offset = start + -(-length // 8) * 8
+        yield key, _VALUE.unpack_from(data, offset)[0]
+        offset += _VALUE.size
+
+
+_shard_ids = count()
+_local = threading.local()
+# Shards of this process, read directly when there is no METRICS_DIR
+_shards: List[_Shard] = []
+# Shards whose thread has exited, for the next new thread to take over
+_free_shards: List[_Shard] = []
+
+
+class _ThreadExit:
+    """Kept in a thread's local storage, which is dropped when the thread exits"""
+
+
+def _reset_after_fork():
+    global _local
+    _local = threading.local()
+    _shards.clear()
+    _free_shards.clear()
+    _pool_capacity.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _shard() -> _Shard:
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        # runserver and ASGI run each request on a new thread; recycling
+        # keeps that from leaving a shard, file and mapping per request
+        try:
+            shard = _free_shards.pop()
+        except IndexError:
+            shard = _Shard(getattr(settings, 'METRICS_DIR', None))
+            _shards.append(shard)
+        _local.shard = shard
+        _local.exit = _ThreadExit()
+        weakref.finalize(_local.exit, _free_shards.append, shard)
+    return shard
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _braces(labels: str) -> str:
+    return f'{{{labels}}}' if labels else ''
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_registry: Dict[str, 'Metric'] = {}
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys: Dict[tuple, str] = {}
+        _registry[name] = self
+
+    def _labels(self, labelvalues: tuple) -> str:
+        return ','.join(
+            f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, labelvalues)
+        )
+
+    def _key(self, labelvalues: tuple) -> str:
+        key = self._keys.get(labelvalues)
+        if key is None:
+            key = self._keys[labelvalues] = _SEP.join((self.name, '', self._labels(labelvalues), ''))
+        return key
+
+    def samples(self, values: Dict[Tuple[str, str, str], float], totals) -> Iterable[str]:
+        for (suffix, labels, _), value in sorted(values.items()):
+            yield f'{self.name}{suffix}{_braces(labels)} {value!r}'
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount: float = 1):
+        _shard().add(self._key(labelvalues), amount)
+
+
+class Gauge(Metric):
+    """Summed over live processes, e.g. requests in flight"""
+    kind = 'gauge'
+
+    def inc(self, *labelvalues, amount: float = 1):
+        _shard().add(self._key(labelvalues), amount)
+
+    def dec(self, *labelvalues, amount: float = 1):
+        _shard().add(self._key(labelvalues), -amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _series(self, labelvalues: tuple) -> tuple:
+        series = self._keys.get(labelvalues)
+        if series is None:
+            labels = self._labels(labelvalues)
+            # Buckets are stored non-cumulatively, so an observation writes one
+            series = self._keys[labelvalues] = (
+                [_SEP.join((self.name, '_bucket', labels, repr(float(bound)))) for bound in self.buckets]
+                + [_SEP.join((self.name, '_bucket', labels, '+Inf'))],
+                _SEP.join((self.name, '_sum', labels, '')),
+                _SEP.join((self.name, '_count', labels, '')),
+            )
+        return series
+
+    def observe(self, value: float, *labelvalues):
+        buckets, sum_key, count_key = self._series(labelvalues)
+        shard = _shard()
+        shard.add(buckets[bisect_left(self.buckets, value)], 1)
+        shard.add(sum_key, value)
+        shard.add(count_key, 1)
+
+    def samples(self, values, totals):
+        series = defaultdict(dict)
+        for (suffix, labels, le), value in values.items():
+            series[labels][suffix, le] = value
+        for labels, samples in sorted(series.items()):
+            prefix = f'{labels},' if labels else ''
+            cumulative = 0.0
+            for le in [repr(float(bound)) for bound in self.buckets] + ['+Inf']:
+                cumulative += samples.get(('_bucket', le), 0.0)
+                yield f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative!r}'
+            yield f'{self.name}_sum{_braces(labels)} {samples.get(("_sum", ""), 0.0)!r}'
+            yield f'{self.name}_count{_braces(labels)} {samples.get(("_count", ""), 0.0)!r}'
+
+
+class HitRatio(Metric):
+    """Gauge computed at scrape time from a counter whose last label is ``result``, hit or miss"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, counter: Counter):
+        assert counter.labelnames[-1] == 'result'
+        super().__init__(name, documentation, counter.labelnames[:-1])
+        self.counter = counter
+
+    def samples(self, values, totals):
+        lookups = defaultdict(lambda: [0.0, 0.0])
+        for (_, labels, _), value in totals.get(self.counter.name, {}).items():
+            labels, _, result = labels.rpartition(',')
+            lookups[labels][0 if result == 'result="hit"' else 1] += value
+        for labels, (hits, misses) in sorted(lookups.items()):
+            yield f'{self.name}{_braces(labels)} {hits / (hits + misses)!r}'
+
+
+class Ratio(Metric):
+    """Gauge computed at scrape time as one gauge over another with the same labels"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, numerator: Gauge, denominator: Gauge):
+        assert numerator.labelnames == denominator.labelnames
+        super().__init__(name, documentation, numerator.labelnames)
+        self.numerator = numerator
+        self.denominator = denominator
+
+    def samples(self, values, totals):
+        numerators = {labels: value for (_, labels, _), value in totals.get(self.numerator.name, {}).items()}
+        for (_, labels, _), value in sorted(totals.get(self.denominator.name, {}).items()):
+            if value:
+                yield f'{self.name}{_braces(labels)} {numerators.get(labels, 0.0) / value!r}'
+
+
+def _collect() -> Dict[str, Dict[Tuple[str, str, str], float]]:
+    """Sample values summed over every shard, by metric name"""
+    totals = defaultdict(lambda: defaultdict(float))
+
+    def add(records, alive=True):
+        for key, value in records:
+            name, suffix, labels, le = key.split(_SEP)
+            metric = _registry.get(name)
+            if metric is None or (metric.kind == 'gauge' and not alive):
+                continue
+            totals[name][suffix, labels, le] += value
+
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        for shard in list(_shards):
+            add(_read_records(shard.buffer))
+        return totals
+
+    alive = {}
+    for entry in os.scandir(directory) if os.path.isdir(directory) else ():
+        if not entry.name.endswith(_SHARD_SUFFIX):
+            continue
+        pid = int(entry.name.split('-', 1)[0])
+        if pid not in alive:
+            alive[pid] = _process_alive(pid)
+        try:
+            with open(entry.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            continue
+        if len(data) >= _HEADER.size:
+            add(_read_records(data), alive[pid])
+    return totals
+
+
+def exposition() -> str:
+    """Every registered metric in the Prometheus text format"""
+    totals = _collect()
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        lines.extend(metric.samples(totals.get(name, {}), totals))
+    return '\n'.join(lines) + '\n'
+
+
+def _scrape_allowed(request) -> bool:
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        scheme, _, supplied = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(supplied.encode(), token.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    networks = getattr(settings, 'METRICS_ALLOWED_NETWORKS', ('127.0.0.1/32', '::1/128'))
+    return any(address in ipaddress.ip_network(network) for network in networks)
+
+
+def metrics_view(request):
+    if not _scrape_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests being served')
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Request latency by URL name', ['view', 'method'],
+)
+RESPONSES = Counter(
+    'http_responses_total', 'Responses by URL name and status code', ['view', 'method', 'status'],
+)
+DB_QUERIES = Counter('db_queries_total', 'SQL statements executed by URL name', ['view'])
+DB_DURATION = Counter('db_query_duration_seconds_total', 'Time spent in SQL by URL name', ['view'])
+DB_CONNECTION_WAIT = Histogram(
+    'db_connection_wait_seconds', 'Time to take a connection from the pool, or to open one without a pool',
+    ['alias', 'source'], buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+DB_CONNECTION_ERRORS = Counter(
+    'db_connection_errors_total', 'Connections that could not be opened or taken from the pool in time',
+    ['alias', 'source'],
+)
+DB_CONNECTIONS_IN_USE = Gauge('db_connections_in_use', 'Database connections held by requests', ['alias'])
+DB_POOL_CAPACITY = Gauge('db_pool_max_connections', 'Connections the pools may hold at most', ['alias'])
+DB_POOL_UTILISATION = Ratio(
+    'db_pool_utilisation', 'Share of the pools\' connections held by requests', DB_CONNECTIONS_IN_USE, DB_POOL_CAPACITY,
+)
+
+# Pool size counted into db_pool_max_connections by this process, by alias
+_pool_capacity: Dict[str, int] = {}
+_pool_capacity_lock = threading.Lock()
+
+
+def record_pool_capacity(alias: str, max_size: int):
+    if _pool_capacity.get(alias) == max_size:
+        return
+    with _pool_capacity_lock:
+        previous = _pool_capacity.get(alias, 0)
+        _pool_capacity[alias] = max_size
+        DB_POOL_CAPACITY.inc(alias, amount=max_size - previous)
+
+
+def view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<unresolved>'
+
+
+class MetricsMiddleware:
+    """
+    Record request latency, status codes and SQL counts by URL name.
+
+    Listed right after ``RequestTimingMiddleware``, whose timings supply the
+    SQL counts; nothing here takes a lock.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            response = self.get_response(request)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+        self.record(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            response = await self.get_response(request)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+        self.record(request, response, started)
+        return response
+
+    def record(self, request, response, started):
+        view = view_name(request)
+        REQUEST_DURATION.observe(time.perf_counter() - started, view, request.method)
+        RESPONSES.inc(view, request.method, response.status_code)
+        timings = current_timings.get()
+        if timings is not None:
+            DB_QUERIES.inc(view, amount=timings.queries)
+            DB_DURATION.inc(view, amount=timings.db)
+
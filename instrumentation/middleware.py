@@ -0,0 +1,78 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .timing import RequestTimings, current_timings
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimingMiddleware:
+    """
+    Time every request's SQL, template rendering and view, and report them in
+    a ``Server-Timing`` header that browser dev tools display.
+
+    Requests slower than ``SLOW_REQUEST_THRESHOLD_MS`` are logged with their
+    ``SLOW_REQUEST_TOP_QUERIES`` slowest statements. Listed first in
+    MIDDLEWARE so the total covers the other middleware too; the view time
+    runs from the view being resolved until its response (rendered, for a
+    TemplateResponse) comes back.
+    """
+    
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings(getattr(settings, 'SLOW_REQUEST_TOP_QUERIES', 5))
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings(getattr(settings, 'SLOW_REQUEST_TOP_QUERIES', 5))
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        if timings.view_started is not None:
+            timings.view = time.perf_counter() - timings.view_started
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            response['Server-Timing'] = timings.server_timing()
+        
+        threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 500)
+        if threshold is not None and timings.total * 1000 >= threshold:
+            self.log_slow_request(request, response, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    def log_slow_request(self, request, response, timings):
+        lines = [
+            f'Slow request {request.method} {request.path} {response.status_code} '
+            f'{timings.total * 1000:.1f}ms: view {timings.view * 1000:.1f}ms, '
+            f'db {timings.db * 1000:.1f}ms in {timings.queries} queries, '
+            f'templates {timings.templates * 1000:.1f}ms'
+        ]
+        lines.extend(
+            f'  {duration * 1000:8.1f}ms  {sql}' for duration, sql in timings.slowest_queries()
+        )
+        logger.warning('\n'.join(lines))
@@ -0,0 +1,47 @@
+"""
+The PostgreSQL backend, recording how long requests wait for a connection.
+
+With ``OPTIONS['pool']`` a connection is taken from the process's psycopg
+pool, waiting while all of them are in use; without, every one is a new
+TCP connection and authentication. Either wait is observed in
+``db_connection_wait_seconds``, and connections held count towards the
+pool utilisation on /metrics.
+"""
+import time
+
+from django.db.backends.postgresql import base
+
+from ..metrics import (
+    DB_CONNECTION_ERRORS,
+    DB_CONNECTION_WAIT,
+    DB_CONNECTIONS_IN_USE,
+    record_pool_capacity,
+)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        source = 'pool' if pool is not None else 'connect'
+        if pool is not None:
+            record_pool_capacity(self.alias, pool.max_size)
+        started = time.perf_counter()
+        try:
+            connection = super().get_new_connection(conn_params)
+        except Exception:
+            DB_CONNECTION_ERRORS.inc(self.alias, source)
+            raise
+        finally:
+            DB_CONNECTION_WAIT.observe(time.perf_counter() - started, self.alias, source)
+        DB_CONNECTIONS_IN_USE.inc(self.alias)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return super()._close()
+        try:
+            # Back to the pool, or closed
+            return super()._close()
+        finally:
+            DB_CONNECTIONS_IN_USE.dec(self.alias)
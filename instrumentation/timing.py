@@ -0,0 +1,106 @@
+"""
+Per-request timing: SQL statements, template rendering and the view.
+
+``instrumentation.middleware.RequestTimingMiddleware`` creates a
+``RequestTimings`` for each request and makes it current through a context
+variable, so the query wrapper and the template backend below can add to it
+without being handed the request.
+The query wrapper is installed on every database connection as it opens.
+"""
+import heapq
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from django.template.backends.django import DjangoTemplates, Template
+
+current_timings: ContextVar[Optional['RequestTimings']] = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    """Counters for one request; durations are in seconds"""
+
+    def __init__(self, top_queries: int = 5):
+        self.started = time.perf_counter()
+        self.view_started: Optional[float] = None
+        self.view = 0.0
+        self.queries = 0
+        self.db = 0.0
+        self.templates = 0.0
+        self._template_depth = 0
+        self._top_queries = top_queries
+        # Min-heap of (duration, sql), so the fastest is dropped first
+        self._slowest: List[Tuple[float, str]] = []
+
+    def add_query(self, sql: str, duration: float):
+        self.queries += 1
+        self.db += duration
+        if len(self._slowest) < self._top_queries:
+            heapq.heappush(self._slowest, (duration, sql))
+        elif self._slowest and duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (duration, sql))
+
+    def slowest_queries(self) -> List[Tuple[float, str]]:
+        return sorted(self._slowest, reverse=True)
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header, in milliseconds"""
+        metrics = [
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.templates * 1000:.1f}',
+            f'view;dur={self.view * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ]
+        return ', '.join(metrics)
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper feeding statements into the current ``RequestTimings``"""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        # Parameters are left out so logged statements carry no user data
+        timings.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """``connection_created`` receiver wrapping every connection in ``time_query``"""
+    # Connections belong to threads, and under ASGI the queries of a request
+    # run on another thread than its middleware; the context variable follows
+    # the request there. A connection reconnecting keeps its wrappers.
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_query)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = current_timings.get()
+        if timings is None:
+            return super().render(context, request)
+        # Templates rendered while another one renders are already counted
+        timings._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings._template_depth -= 1
+            if not timings._template_depth:
+                timings.templates += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, adding render time to the current request's timings"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
@@ -3,6 +3,8 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from .refdata import reference_data
+
 
 class Role(models.Model):
     """
@@ -55,7 +57,11 @@ class VacationUser(models.Model):
     
     @property
     def is_admin(self) -> bool:
-        return self.role and self.role.role_name == 'admin'
+        # A dictionary lookup, unless the role is newer than this process's copy
+        role_name = reference_data.role_name(self.role_id)
+        if role_name is None:
+            return self.role and self.role.role_name == 'admin'
+        return role_name == 'admin'
     
     class Meta:
         db_table = 'users'
@@ -103,6 +109,8 @@ class Vacation(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(10000)]
     )
     image_file = models.CharField(max_length=255)
+    # Denormalized like counter maintained by the vacation website
+    likes_count = models.PositiveIntegerField(default=0)
     
     def clean(self):
         if self.start_date and self.end_date:
@@ -115,7 +123,7 @@ class Vacation(models.Model):
     
     @property
     def like_count(self) -> int:
-        return self.likes.count()
+        return self.likes_count
     
     def is_liked_by_user(self, user) -> bool:
         if user.is_authenticated:
@@ -159,3 +167,15 @@ class Like(models.Model):
         db_table = 'likes'
         unique_together = ['user', 'vacation']
         managed = False
+
+
+class ReferenceDataGeneration(models.Model):
+    """
+    Counter the vacation website bumps whenever roles or countries change -
+    points to shared vacation database table (see refdata.py).
+    """
+    generation = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'reference_data_generation'
+        managed = False
@@ -0,0 +1,64 @@
+"""
+In-process cache of the reference tables, roles and countries.
+
+Both are tiny and only the vacation website changes them, bumping the
+shared ReferenceDataGeneration counter when it does. Each process loads them
+once, answers lookups from dictionaries and compares its copy's generation
+with the counter at most once per ``REFERENCE_DATA_CHECK_INTERVAL`` seconds.
+
+Snapshots are immutable and swapped in whole, so readers never lock.
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+
+class Snapshot:
+    def __init__(self, generation: Optional[int]):
+        from .models import Country, Role
+
+        self.generation = generation
+        self.roles_by_id: Dict[int, 'Role'] = {role.pk: role for role in Role.objects.all()}
+        self.countries: Tuple['Country', ...] = tuple(Country.objects.order_by('country_name'))
+        self.countries_by_id = {country.pk: country for country in self.countries}
+
+
+def current_generation() -> int:
+    from .models import ReferenceDataGeneration
+
+    return ReferenceDataGeneration.objects.values_list('generation', flat=True).first() or 0
+
+
+class ReferenceData:
+    def __init__(self):
+        self._snapshot: Optional[Snapshot] = None
+        self._checked = 0.0
+
+    def snapshot(self) -> Snapshot:
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked < getattr(settings, 'REFERENCE_DATA_CHECK_INTERVAL', 5):
+            return snapshot
+        generation = current_generation()
+        if snapshot is None or snapshot.generation != generation:
+            snapshot = self._snapshot = Snapshot(generation)
+        self._checked = now
+        return snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def role_name(self, role_id: int) -> Optional[str]:
+        role = self.snapshot().roles_by_id.get(role_id)
+        return role.role_name if role is not None else None
+
+    def countries(self) -> Tuple:
+        """Every country, ordered by name"""
+        return self.snapshot().countries
+
+    def country(self, country_id: int):
+        return self.snapshot().countries_by_id.get(country_id)
+
+
+reference_data = ReferenceData()
@@ -0,0 +1,116 @@
+"""
+Dashboard reads from a PostgreSQL read replica.
+
+With a ``replica`` database configured, ``ReplicaRouter`` sends every read
+of users, vacations and likes there, so the aggregates behind the dashboard
+don't compete with the vacation website's traffic on the primary. Roles,
+countries and the reference data counter are tiny, cached in process and
+read from the primary, where the vacation website's changes show at once.
+
+While the replica does not answer, or lags more than
+``REPLICA_MAX_LAG_SECONDS`` behind the primary, reads go to the primary;
+each process checks at most once per ``REPLICA_CHECK_INTERVAL`` seconds.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA = 'replica'
+# Models whose reads go to the replica
+REPLICA_MODELS = {'stats.vacationuser', 'stats.vacation', 'stats.like'}
+
+_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    -- Nothing left to replay: the last replayed transaction is merely old
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class ReplicaStatus:
+    """Whether the replica may be read from, rechecked every ``REPLICA_CHECK_INTERVAL`` seconds"""
+
+    def __init__(self, alias: str = REPLICA):
+        self.alias = alias
+        self._usable: Optional[bool] = None
+        self._checked: Optional[float] = None
+
+    def usable(self) -> bool:
+        if self.alias not in connections.settings:
+            return False
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < settings.REPLICA_CHECK_INTERVAL:
+            return self._usable is True
+        if _on_event_loop():
+            # No queries here (aiterator() asks for its database on the loop);
+            # the next read from sync code checks
+            return self._usable is True
+        # Other threads keep the last answer while this one checks
+        self._checked = now
+        usable = self._check()
+        if usable and self._usable is False:
+            logger.warning('Replica %r is back in use', self.alias)
+        self._usable = usable
+        return usable
+
+    def invalidate(self):
+        self._checked = None
+
+    def _check(self) -> bool:
+        try:
+            lag = self.lag()
+        except DatabaseError as exc:
+            # A broken connection is dropped at the end of the request
+            logger.warning('Replica %r is unavailable: %s', self.alias, exc)
+            return False
+        if lag > settings.REPLICA_MAX_LAG_SECONDS:
+            logger.warning('Replica %r lags %.1fs behind the primary', self.alias, lag)
+            return False
+        return True
+
+    def lag(self) -> float:
+        """Seconds of changes the replica has yet to replay; 0 for a stand-in that is no replica"""
+        connection = connections[self.alias]
+        with connection.cursor() as cursor:
+            cursor.execute(_LAG_SQL if connection.vendor == 'postgresql' else 'SELECT 0')
+            return float(cursor.fetchone()[0])
+
+
+replica = ReplicaStatus()
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in REPLICA_MODELS and replica.usable():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Not None: Django would write an instance back where it was read from
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        if {obj1._state.db, obj2._state.db} <= {'default', REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == REPLICA else None
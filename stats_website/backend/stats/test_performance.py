@@ -0,0 +1,421 @@
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, Client
+from django.urls import reverse
+from datetime import date, timedelta
+from .models import Role, VacationUser, Country, Vacation, Like, ReferenceDataGeneration
+
+# The models are unmanaged, their tables the vacation website's, so the test
+# database has none of them until this module creates them
+MODELS = [Role, VacationUser, Country, Vacation, Like, ReferenceDataGeneration]
+TOKEN = 'a' * 32
+
+
+def setUpModule():
+    with connection.schema_editor() as editor:
+        for model in MODELS:
+            editor.create_model(model)
+
+
+def tearDownModule():
+    with connection.schema_editor() as editor:
+        for model in reversed(MODELS):
+            editor.delete_model(model)
+
+
+def create_vacations():
+    """A past, an ongoing and two future vacations with 3, 0, 5 and 1 likes"""
+    today = date.today()
+    italy = Country.objects.create(country_name='Italy')
+    greece = Country.objects.create(country_name='Greece')
+    for country, start, likes_count in [
+        (italy, today - timedelta(days=20), 3),
+        (greece, today - timedelta(days=2), 0),
+        (italy, today + timedelta(days=10), 5),
+        (greece, today + timedelta(days=30), 1),
+    ]:
+        Vacation.objects.create(
+            country=country,
+            description=f'{country.country_name} trip',
+            start_date=start,
+            end_date=start + timedelta(days=7),
+            price=1000,
+            image_file='rome.jpg',
+            likes_count=likes_count
+        )
+
+
+class StatsRequestInstrumentationTestCase(TestCase):
+
+    def setUp(self):
+        from unittest import mock
+        from . import replicas
+
+        # On PostgreSQL the replica's connection can't see this test's rows
+        patcher = mock.patch.object(replicas.replica, 'usable', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {TOKEN}')
+        create_vacations()
+
+    def metrics(self, response):
+        return {
+            metric.split(';')[0]: metric
+            for metric in response['Server-Timing'].split(', ')
+        }
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('vacation_stats'))
+
+        metrics = self.metrics(response)
+        self.assertEqual(set(metrics), {'db', 'tpl', 'view', 'total'})
+        self.assertRegex(metrics['db'], r'^db;dur=\d+\.\d;desc="[1-9]\d* queries"$')
+        self.assertEqual(metrics['tpl'], 'tpl;dur=0.0')
+
+    def test_slow_requests_logged_with_slowest_statements(self):
+        from django.test import override_settings
+
+        with override_settings(SLOW_REQUEST_THRESHOLD_MS=0, SLOW_REQUEST_TOP_QUERIES=1):
+            with self.assertLogs('instrumentation.middleware', 'WARNING') as logs:
+                self.client.get(reverse('vacation_stats'))
+
+        lines = logs.records[0].getMessage().splitlines()
+        self.assertTrue(lines[0].startswith('Slow request GET /api/stats/vacations/ 200 '))
+        self.assertEqual(len(lines), 2)
+        self.assertIn('SELECT', lines[1])
+
+    async def test_async_requests_are_timed(self):
+        from django.test import AsyncClient
+
+        response = await AsyncClient().get(reverse('total_likes'), headers={'Authorization': f'Bearer {TOKEN}'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(self.metrics(response)['db'], r'^db;dur=\d+\.\d;desc="[1-9]\d* queries"$')
+
+    def test_requests_recorded_by_url_name(self):
+        before = self.scrape()
+        self.client.get(reverse('likes_distribution'))
+        self.client.get('/api/no-such-page/')
+        after = self.scrape()
+
+        def delta(name):
+            return after.get(name, 0) - before.get(name, 0)
+
+        self.assertEqual(delta('http_responses_total{view="likes_distribution",method="GET",status="200"}'), 1)
+        self.assertEqual(delta('http_responses_total{view="<unresolved>",method="GET",status="404"}'), 1)
+        self.assertEqual(delta('http_request_duration_seconds_count{view="likes_distribution",method="GET"}'), 1)
+        self.assertGreater(delta('db_queries_total{view="likes_distribution"}'), 0)
+        self.assertEqual(after['http_requests_in_flight'], 1)
+
+    def test_exited_threads_leave_their_shards_to_new_ones(self):
+        import threading
+        from instrumentation import metrics
+
+        counter = metrics.Counter('test_thread_events_total', 'Test events')
+        self.addCleanup(metrics._registry.pop, counter.name)
+
+        shards = len(metrics._shards)
+        # One thread per request, as under runserver
+        for _ in range(20):
+            thread = threading.Thread(target=counter.inc)
+            thread.start()
+            thread.join()
+
+        self.assertLessEqual(len(metrics._shards), shards + 1)
+        self.assertEqual(self.scrape()['test_thread_events_total'], 20)
+
+    def test_scraped_only_from_allowed_networks_or_with_token(self):
+        from django.test import override_settings
+
+        with override_settings(METRICS_ALLOWED_NETWORKS=['10.0.0.0/8'], METRICS_TOKEN='s3cret'):
+            response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7')
+            self.assertEqual(response.status_code, 403)
+            response = self.client.get(
+                reverse('metrics'), REMOTE_ADDR='203.0.113.7', headers={'Authorization': 'Bearer s3cret'}
+            )
+            self.assertEqual(response.status_code, 200)
+
+
+class StatsReferenceDataTestCase(TestCase):
+
+    def setUp(self):
+        from .refdata import reference_data
+
+        self.reference_data = reference_data
+        reference_data.invalidate()
+        self.addCleanup(reference_data.invalidate)
+        self.generation = ReferenceDataGeneration.objects.create(generation=1)
+        self.italy = Country.objects.create(country_name='Italy')
+
+    def test_reloaded_once_generation_is_bumped(self):
+        from django.test import override_settings
+
+        self.assertEqual(self.reference_data.country(self.italy.pk).country_name, 'Italy')
+        Country.objects.filter(pk=self.italy.pk).update(country_name='Italia')
+
+        with override_settings(REFERENCE_DATA_CHECK_INTERVAL=60):
+            # Until the vacation website bumps the counter the copy stands
+            self.assertEqual(self.reference_data.country(self.italy.pk).country_name, 'Italy')
+
+        ReferenceDataGeneration.objects.update(generation=2)
+        with override_settings(REFERENCE_DATA_CHECK_INTERVAL=0), self.assertNumQueries(3):
+            self.assertEqual(self.reference_data.country(self.italy.pk).country_name, 'Italia')
+
+    def test_admin_role_from_reference_data(self):
+        admin = Role.objects.create(role_name='admin')
+        user = VacationUser(
+            first_name='Admin', last_name='Test', email='admin@test.com', role_id=admin.pk, password='x'
+        )
+
+        self.reference_data.snapshot()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.is_admin)
+
+
+class AsyncStatsViewsTestCase(TestCase):
+
+    def setUp(self):
+        from unittest import mock
+        from . import replicas
+
+        # On PostgreSQL the replica's connection can't see this test's rows
+        patcher = mock.patch.object(replicas.replica, 'usable', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        role = Role.objects.create(role_name='user')
+        for n in range(3):
+            VacationUser.objects.create(
+                first_name='User', last_name=str(n), email=f'user{n}@test.com', role=role, password='x'
+            )
+        create_vacations()
+        users = list(VacationUser.objects.all())
+        for vacation in Vacation.objects.all()[:2]:
+            for user in users[:2]:
+                Like.objects.create(user=user, vacation=vacation)
+
+    def get(self, view, asynchronous=False):
+        import json
+        from asgiref.sync import async_to_sync
+        from django.contrib.sessions.backends.db import SessionStore
+        from django.test import AsyncRequestFactory, RequestFactory
+
+        factory = AsyncRequestFactory() if asynchronous else RequestFactory()
+        request = factory.get('/', headers={'Authorization': f'Bearer {TOKEN}'})
+        request.session = SessionStore()
+        response = async_to_sync(view)(request) if asynchronous else view(request)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_async_views_answer_as_sync_ones(self):
+        from . import views
+
+        for name in ['vacation_stats', 'total_users', 'total_likes', 'likes_distribution']:
+            with self.subTest(name):
+                self.assertEqual(
+                    self.get(getattr(views, f'a{name}'), asynchronous=True),
+                    self.get(getattr(views, name))
+                )
+        self.assertEqual(
+            self.get(views.avacation_stats, asynchronous=True),
+            {'pastVacations': 1, 'ongoingVacations': 1, 'futureVacations': 2}
+        )
+        self.assertEqual(self.get(views.atotal_likes, asynchronous=True), {'totalLikes': 4})
+
+    def test_vacation_stats_counted_in_one_query(self):
+        from . import views
+
+        self.get(views.atotal_users, asynchronous=True)
+        with self.assertNumQueries(1):
+            self.get(views.avacation_stats, asynchronous=True)
+
+    def test_new_country_named_in_distribution(self):
+        from . import views
+
+        self.get(views.alikes_distribution, asynchronous=True)
+        spain = Country.objects.create(country_name='Spain')
+        Vacation.objects.create(
+            country=spain,
+            description='Madrid',
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=3),
+            price=500,
+            image_file='madrid.jpg',
+            likes_count=9
+        )
+
+        distribution = self.get(views.alikes_distribution, asynchronous=True)
+        self.assertEqual(distribution[0], {'destination': 'Spain', 'likes': 9, 'image': 'madrid.jpg'})
+
+    async def test_authentication_required(self):
+        from django.test import AsyncClient
+
+        response = await AsyncClient().get(reverse('total_users'))
+        self.assertEqual(response.status_code, 401)
+
+
+class StatsReplicaRouterTestCase(TestCase):
+    """Routing tests need a 'replica' database; in tests it mirrors the default one"""
+
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from django.db import connections
+
+        def close_replica():
+            # The test database can't be dropped while the replica holds connections to it
+            connections['replica'].close()
+            if connections['replica'].vendor == 'postgresql':
+                connections['replica'].close_pool()
+
+        if 'replica' in connections.settings:
+            cls.addClassCleanup(close_replica)
+
+    def setUp(self):
+        from . import replicas
+
+        self.replicas = replicas
+        replicas.replica.invalidate()
+        self.addCleanup(replicas.replica.invalidate)
+
+    def require_replica(self):
+        from django.db import connections
+
+        if 'replica' not in connections.settings:
+            self.skipTest('no replica database configured')
+
+    def test_dashboard_reads_go_to_replica(self):
+        self.require_replica()
+
+        self.assertEqual(VacationUser.objects.all().db, 'replica')
+        self.assertEqual(Vacation.objects.all().db, 'replica')
+        self.assertEqual(Like.objects.all().db, 'replica')
+        # Reference data is read where the vacation website's changes show at once
+        self.assertEqual(Country.objects.all().db, 'default')
+        self.assertEqual(Role.objects.all().db, 'default')
+
+    def test_falls_back_to_primary_when_replica_lags_or_is_down(self):
+        from unittest import mock
+        from django.db import OperationalError
+        from django.test import override_settings
+
+        self.require_replica()
+        replica = self.replicas.replica
+
+        with override_settings(REPLICA_MAX_LAG_SECONDS=5), \
+                mock.patch.object(type(replica), 'lag', return_value=30.0):
+            self.assertEqual(Vacation.objects.all().db, 'default')
+        # The answer stands until the next check is due
+        self.assertEqual(Vacation.objects.all().db, 'default')
+
+        replica.invalidate()
+        with mock.patch.object(type(replica), 'lag', side_effect=OperationalError('connection refused')):
+            self.assertEqual(Vacation.objects.all().db, 'default')
+
+        replica.invalidate()
+        self.assertEqual(Vacation.objects.all().db, 'replica')
+
+    def test_lag_is_measured_on_replica(self):
+        self.require_replica()
+
+        # The test database is a primary, or SQLite standing in for a replica
+        self.assertEqual(self.replicas.replica.lag(), 0)
+
+    def test_endpoints_answer_from_primary_without_replica(self):
+        from unittest import mock
+
+        create_vacations()
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {TOKEN}')
+        with mock.patch.object(self.replicas.replica, 'usable', return_value=False):
+            response = client.get(reverse('vacation_stats'))
+
+        self.assertEqual(response.json(), {'pastVacations': 1, 'ongoingVacations': 1, 'futureVacations': 2})
+
+
+class StatsReplicaWritesTestCase(TransactionTestCase):
+    """Commits its rows, so that the replica's connection can read them"""
+
+    databases = '__all__'
+
+    def setUp(self):
+        from django.db import connections
+
+        if 'replica' not in connections.settings:
+            self.skipTest('no replica database configured')
+
+        def close_replica():
+            connections['replica'].close()
+            if connections['replica'].vendor == 'postgresql':
+                connections['replica'].close_pool()
+
+        def delete_rows():
+            # Flushing leaves the unmanaged tables alone
+            Vacation.objects.using('default').all().delete()
+            Country.objects.using('default').all().delete()
+
+        self.addCleanup(close_replica)
+        self.addCleanup(delete_rows)
+        create_vacations()
+
+    def test_instance_read_from_replica_is_saved_to_primary(self):
+        from . import replicas
+
+        replicas.replica.invalidate()
+        vacation = Vacation.objects.first()
+        self.assertEqual(vacation._state.db, 'replica')
+
+        vacation.description = 'Edited'
+        vacation.save()
+
+        self.assertEqual(vacation._state.db, 'default')
+        self.assertEqual(Vacation.objects.using('default').get(pk=vacation.pk).description, 'Edited')
+
+
+class StatsConnectionPoolTestCase(TransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor != 'postgresql' or connection.pool is None:
+            self.skipTest('connection pooling needs PostgreSQL with DB_POOL on')
+
+    def samples(self):
+        from instrumentation.metrics import exposition
+
+        return {
+            name: float(value)
+            for name, value in (line.rsplit(' ', 1) for line in exposition().splitlines() if not line.startswith('#'))
+        }
+
+    def test_connection_from_pool_is_measured_and_returned(self):
+        import threading
+
+        waits = 'db_connection_wait_seconds_count{alias="default",source="pool"}'
+        in_use = 'db_connections_in_use{alias="default"}'
+        before = self.samples()
+        holding = {}
+
+        def request():
+            # A thread of its own gets a connection of its own
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            holding.update(self.samples())
+            connection.close()
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+        after = self.samples()
+
+        self.assertEqual(holding[waits] - before.get(waits, 0), 1)
+        self.assertEqual(holding[in_use] - before.get(in_use, 0), 1)
+        self.assertEqual(holding['db_pool_max_connections{alias="default"}'], connection.pool.max_size)
+        # Closing handed the connection back to the pool
+        self.assertEqual(after[in_use], before.get(in_use, 0))
@@ -1,11 +1,21 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    vacation_stats, total_users, total_likes, likes_distribution = (
+        views.avacation_stats, views.atotal_users, views.atotal_likes, views.alikes_distribution
+    )
+else:
+    vacation_stats, total_users, total_likes, likes_distribution = (
+        views.vacation_stats, views.total_users, views.total_likes, views.likes_distribution
+    )
+
 urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
-    path('stats/vacations/', views.vacation_stats, name='vacation_stats'),
-    path('total/users/', views.total_users, name='total_users'),
-    path('total/likes/', views.total_likes, name='total_likes'),
-    path('distribution/likes/', views.likes_distribution, name='likes_distribution'),
+    path('stats/vacations/', vacation_stats, name='vacation_stats'),
+    path('total/users/', total_users, name='total_users'),
+    path('total/likes/', total_likes, name='total_likes'),
+    path('distribution/likes/', likes_distribution, name='likes_distribution'),
 ]
\ No newline at end of file
@@ -1,15 +1,27 @@
 from typing import Dict, Any, List
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q
 from django.shortcuts import render
 from django.http import JsonResponse, HttpRequest
 from django.contrib.auth import authenticate, login, logout
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
-from django.db.models import Count
 import json
 import hashlib
 import time
 from .models import VacationUser, Vacation, Like
+from .refdata import reference_data
+
+
+def country_name(country_id):
+    country = reference_data.country(country_id)
+    if country is None:
+        # Added since this process last loaded the countries
+        reference_data.invalidate()
+        country = reference_data.country(country_id)
+    return country.country_name if country is not None else None
+
 
 def is_authenticated(request):
     """Check if request is authenticated via session or token"""
@@ -170,14 +182,99 @@ def likes_distribution(request: HttpRequest) -> JsonResponse:
     if not is_authenticated(request):
         return JsonResponse({'error': 'Authentication required'}, status=401)
     
+    # Country names come from the in-process reference data, not a join
     distribution = (Vacation.objects
-                   .annotate(likes_count=Count('likes'))
-                   .values('country__country_name', 'likes_count', 'image_file')
+                   .values('country_id', 'likes_count', 'image_file')
                    .order_by('-likes_count'))
     
     result = [
         {
-            'destination': item['country__country_name'],
+            'destination': country_name(item['country_id']),
+            'likes': item['likes_count'],
+            'image': item['image_file']
+        }
+        for item in distribution
+    ]
+    
+    return JsonResponse(result, safe=False)
+
+
+# Async versions of the statistics endpoints, served instead of the views
+# above when settings.ASYNC_VIEWS is on (under ASGI). They wait on the
+# database through the async ORM instead of holding a worker thread.
+
+async def ais_authenticated(request):
+    """is_authenticated() without loading the session on the event loop"""
+    if await request.session.aget('authenticated'):
+        return True
+    # The session is loaded now, so the rest of the check is in memory
+    return is_authenticated(request)
+
+
+async def acountry_names(country_ids) -> Dict[int, str]:
+    """Country names by id, reloading the reference data off the event loop if needed"""
+    snapshot = await sync_to_async(reference_data.snapshot)()
+    if not set(country_ids) <= snapshot.countries_by_id.keys():
+        # Added since this process last loaded the countries
+        reference_data.invalidate()
+        snapshot = await sync_to_async(reference_data.snapshot)()
+    return {pk: country.country_name for pk, country in snapshot.countries_by_id.items()}
+
+
+async def avacation_stats(request: HttpRequest) -> JsonResponse:
+    """Async vacation_stats()"""
+    if not await ais_authenticated(request):
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    today = timezone.now().date()
+    
+    # The three counts are independent, but the async ORM runs a request's
+    # queries one at a time on its connection; one scan answers all three
+    counts = await Vacation.objects.aaggregate(
+        past=Count('id', filter=Q(end_date__lt=today)),
+        ongoing=Count('id', filter=Q(start_date__lte=today, end_date__gte=today)),
+        future=Count('id', filter=Q(start_date__gt=today)),
+    )
+    
+    return JsonResponse({
+        'pastVacations': counts['past'],
+        'ongoingVacations': counts['ongoing'],
+        'futureVacations': counts['future']
+    })
+
+
+async def atotal_users(request: HttpRequest) -> JsonResponse:
+    """Async total_users()"""
+    if not await ais_authenticated(request):
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    return JsonResponse({'totalUsers': await VacationUser.objects.acount()})
+
+
+async def atotal_likes(request: HttpRequest) -> JsonResponse:
+    """Async total_likes()"""
+    if not await ais_authenticated(request):
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    return JsonResponse({'totalLikes': await Like.objects.acount()})
+
+
+async def alikes_distribution(request: HttpRequest) -> JsonResponse:
+    """Async likes_distribution()"""
+    if not await ais_authenticated(request):
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    distribution = [
+        item async for item in Vacation.objects
+        .values('country_id', 'likes_count', 'image_file')
+        .order_by('-likes_count')
+        .aiterator()
+    ]
+    names = await acountry_names({item['country_id'] for item in distribution})
+    
+    result = [
+        {
+            'destination': names.get(item['country_id']),
             'likes': item['likes_count'],
             'image': item['image_file']
         }
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stats_project.settings')
+# Under ASGI the statistics endpoints use the async ORM
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -11,10 +11,16 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# The instrumentation app, shared with the vacation website, is at the top of the
+# repository; the Dockerfile copies it to /instrumentation
+if str(BASE_DIR.parent.parent) not in sys.path:
+    sys.path.append(str(BASE_DIR.parent.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -47,10 +53,13 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'corsheaders',
+    'instrumentation',
     'stats',
 ]
 
 MIDDLEWARE = [
+    'instrumentation.middleware.RequestTimingMiddleware',
+    'instrumentation.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -65,7 +74,8 @@ ROOT_URLCONF = 'stats_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, also recording render time for RequestTimingMiddleware
+        'BACKEND': 'instrumentation.timing.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,17 +96,88 @@ WSGI_APPLICATION = 'stats_project.wsgi.application'
 
 import os
 
+# Each process keeps a pool of connections (DB_POOL, on by default) and a
+# request hands its connection back when it finishes, so it neither connects
+# nor authenticates. A request waits up to DB_POOL_TIMEOUT seconds for one of
+# the DB_POOL_MAX_SIZE connections to be free, then fails. Connections are
+# checked before they are handed out and replaced after DB_POOL_MAX_LIFETIME
+# seconds; idle ones above DB_POOL_MIN_SIZE close after DB_POOL_MAX_IDLE.
+# With DB_POOL off (e.g. behind pgbouncer) each thread keeps its connection
+# for DB_CONN_MAX_AGE seconds instead.
+DB_POOL = os.environ.get('DB_POOL', 'True').lower() in ['true', '1', 'yes', 'on']
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'vacation_db',
-        'USER': 'postgres',
-        'PASSWORD': 'password',
-        'HOST': 'db',
-        'PORT': '5432',
+        # django.db.backends.postgresql, timing connection waits for /metrics
+        'ENGINE': 'instrumentation.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'vacation_db'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'password'),
+        'HOST': os.environ.get('DB_HOST', 'db'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+                'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+                'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 600)),
+            },
+        } if DB_POOL else {},
     }
 }
 
+# A read replica for the dashboard's reads, configured like the primary
+# wherever DB_REPLICA_* is unset; see replicas.py for REPLICA_MAX_LAG_SECONDS
+# and REPLICA_CHECK_INTERVAL. Tests use the default database for both.
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        # Seconds to connect or wait for a pooled connection; a replica that
+        # is down must not hold requests up for long
+        'OPTIONS': {'connect_timeout': int(os.environ.get('DB_REPLICA_TIMEOUT', 2))},
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DB_POOL:
+        DATABASES['replica']['OPTIONS']['pool'] = {
+            **DATABASES['default']['OPTIONS']['pool'],
+            'timeout': DATABASES['replica']['OPTIONS']['connect_timeout'],
+        }
+
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+
+
+# RequestTimingMiddleware: a Server-Timing header on every response, and a
+# warning with the slowest statements for requests over the threshold
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'True').lower() in ['true', '1', 'yes', 'on']
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 500))
+SLOW_REQUEST_TOP_QUERIES = 5
+
+# Prometheus metrics at /metrics. With several worker processes point
+# METRICS_DIR at a directory they share, emptied whenever the server starts.
+# Only addresses in METRICS_ALLOWED_NETWORKS (comma separated) may scrape
+# them, or anyone sending METRICS_TOKEN as "Authorization: Bearer <token>".
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_ALLOWED_NETWORKS = os.environ.get('METRICS_ALLOWED_NETWORKS', '127.0.0.1/32,::1/128').split(',')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+# Serve the statistics endpoints from the async views, which wait on the
+# database without holding a thread; asgi.py turns this on
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() in ['true', '1', 'yes', 'on']
+
+
+# Roles and countries are cached in each process (see refdata.py); how many
+# seconds a process may go before checking whether the vacation website changed them
+REFERENCE_DATA_CHECK_INTERVAL = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -147,7 +228,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Use Django's default User model for authentication
 
 # Database table mapping to match vacation website  
-DATABASE_ROUTERS = []
+DATABASE_ROUTERS = ['stats.replicas.ReplicaRouter']
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -0,0 +1,14 @@
+"""
+Standalone benchmarks for the vacation website.
+
+Run from the vacation_website directory, e.g.::
+
+    python -m benchmarks.upload_memory
+
+Each benchmark creates (and afterwards destroys) a throwaway test database
+on the configured server, just like ``manage.py test`` does.
+
+``benchmarks.views`` drives every view over seeded datasets of several sizes
+and checks query counts and timings against ``budgets.json``; run it before
+and after a change and diff the JSON it writes.
+"""
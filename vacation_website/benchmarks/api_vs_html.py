@@ -0,0 +1,110 @@
+"""
+JSON API versus HTML rendering over a 10k-vacation catalog.
+
+Seeds a test database, then times the first page of the HTML list, the
+same page from /api/vacations/ (with each available JSON backend and with
+a sparse fieldset), and a walk through the whole catalog via the
+infinite-scroll HTML fragments and via the API.
+
+    python -m benchmarks.api_vs_html [--rows 10000] [--repeat 20]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from .harness import create_user, test_database
+
+
+def seed(rows):
+    from vacations.models import Country, Vacation
+
+    rng = random.Random(13)
+    countries = Country.objects.bulk_create(
+        Country(country_name=f'Benchmark Country {i}') for i in range(50)
+    )
+    first_day = date.today() + timedelta(days=1)
+    vacations = []
+    for i in range(rows):
+        start = first_day + timedelta(days=rng.randrange(3 * 365))
+        vacations.append(Vacation(
+            country=rng.choice(countries),
+            description=f'Benchmark vacation {i}. ' + 'Sun, sea and sightseeing. ' * 12,
+            start_date=start,
+            end_date=start + timedelta(days=rng.randrange(3, 22)),
+            price=rng.randrange(0, 1000000) / 100,
+            image_file='images/vacation_images/default.jpg',
+            likes_count=rng.randrange(500),
+        ))
+    Vacation.objects.bulk_create(vacations, batch_size=2000)
+
+
+def time_request(client, url, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, params)
+        timings.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise SystemExit(f'{url} returned {response.status_code}')
+    return statistics.median(timings), len(response.content)
+
+
+def walk(client, url, params, cursor_of):
+    """Follow next cursors until the end; returns (seconds, requests)"""
+    params = dict(params)
+    requests = 0
+    started = time.perf_counter()
+    while True:
+        data = client.get(url, params).json()
+        requests += 1
+        cursor = cursor_of(data)
+        if not cursor:
+            break
+        params['after'] = cursor
+    return time.perf_counter() - started, requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help='Vacations to seed')
+    parser.add_argument('--repeat', type=int, default=20, help='Requests per measurement')
+    args = parser.parse_args()
+
+    with test_database():
+        from django.test import Client, override_settings
+        from django.urls import reverse
+        from vacations.serialization import orjson
+
+        seed(args.rows)
+        client = Client()
+        client.force_login(create_user('bench-user@test.com'))
+
+        list_url = reverse('vacation_list')
+        api_url = reverse('api_vacation_list')
+        backends = ['json'] + (['orjson'] if orjson is not None else [])
+
+        print(f"{'first page':<40} {'median':>9} {'bytes':>9}")
+        cases = [('HTML list page', list_url, {}, None)]
+        for backend in backends:
+            cases.append((f'API, 24 rows, {backend}', api_url, {}, backend))
+            cases.append((f'API, 100 rows, {backend}', api_url, {'limit': 100}, backend))
+        cases.append(('API, 100 rows, fields=id,price', api_url, {'limit': 100, 'fields': 'id,price'}, None))
+        for label, url, params, backend in cases:
+            with override_settings(VACATIONS_JSON_BACKEND=backend):
+                seconds, size = time_request(client, url, params, args.repeat)
+            print(f'{label:<40} {seconds * 1000:>7.2f}ms {size:>9}')
+
+        print()
+        print(f"{'whole catalog':<40} {'total':>9} {'requests':>9}")
+        seconds, requests = walk(client, reverse('vacation_page'), {}, lambda data: data['next_cursor'])
+        print(f"{'HTML fragments, 24 per page':<40} {seconds:>8.2f}s {requests:>9}")
+        for backend in backends:
+            with override_settings(VACATIONS_JSON_BACKEND=backend):
+                seconds, requests = walk(client, api_url, {'limit': 100}, lambda data: data['next_cursor'])
+            print(f"{f'API, 100 per page, {backend}':<40} {seconds:>8.2f}s {requests:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+The vacation list under concurrent load, served sync (WSGI) and async (ASGI).
+
+WSGI is modelled as a pool of ``--threads`` worker threads running the sync
+view, like one gunicorn gthread worker: a request waits for a free thread,
+which it then holds while it waits on the database. ASGI is one event loop
+running the async view, like one uvicorn worker, with each request's sync
+code on a thread of its own as under Django's ASGIHandler.
+
+For each level of ``--concurrency`` (requests in flight) ``--requests`` list
+pages are fetched by a signed-in user; latencies include time spent waiting
+for a thread. ``--db-latency`` adds a sleep to every SQL statement, standing
+in for a database across the network, which is the wait async serving
+stops spending a thread on.
+
+    python -m benchmarks.asgi_concurrency [--concurrency 1,8,32,64] [--requests 256]
+                                          [--threads 8] [--db-latency 2]
+
+Use a database server; a test database in SQLite memory is not shared
+between threads.
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .harness import connection_waits, create_user, serve_async, test_database, use_async_views
+
+
+def connections_opened():
+    """New connections to the server so far, by the pool or by requests themselves"""
+    from django.db import connections
+
+    pool = connections['default'].pool
+    if pool is not None:
+        return pool.get_stats().get('connections_num', 0)
+    return int(connection_waits().get('connect', (0, 0))[0])
+
+
+class Usage:
+    """Peak live threads (sampled) and database connections opened during a run"""
+
+    def __init__(self):
+        self.peak_threads = 0
+        self.connections = 0
+        self._done = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._done.wait(0.002):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def __enter__(self):
+        self._opened = connections_opened()
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._sampler.join()
+        self.connections = connections_opened() - self._opened
+
+
+def add_db_latency(seconds):
+    """Sleep ``seconds`` before every statement, on connections opened from now on"""
+    from django.db.backends.signals import connection_created
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+
+
+def run_wsgi(cookies, url, concurrency, requests, threads):
+    from django.db import connections
+    from django.test import Client
+
+    local = threading.local()
+    timings = []
+
+    def serve(queued):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+            local.client.cookies = cookies
+        response = local.client.get(url)
+        timings.append(time.perf_counter() - queued)
+        if response.status_code != 200:
+            raise SystemExit(f'{url} returned {response.status_code}')
+
+    in_flight = threading.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = []
+        for _ in range(requests):
+            in_flight.acquire()
+            future = executor.submit(serve, time.perf_counter())
+            future.add_done_callback(lambda _: in_flight.release())
+            futures.append(future)
+        for future in futures:
+            future.result()
+        # Worker threads keep their connections; have each close its own
+        barrier = threading.Barrier(threads)
+        for future in [executor.submit(lambda: (barrier.wait(), connections.close_all()))
+                       for _ in range(threads)]:
+            future.result()
+    return timings
+
+
+def run_asgi(cookies, url, concurrency, requests):
+    from django.test import AsyncClient
+
+    timings = []
+
+    async def main():
+        client = AsyncClient()
+        client.cookies = cookies
+        in_flight = asyncio.Semaphore(concurrency)
+
+        async def serve():
+            async with in_flight:
+                started = time.perf_counter()
+                response = await serve_async(client.get, url)
+                timings.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise SystemExit(f'{url} returned {response.status_code}')
+
+        await asyncio.gather(*(serve() for _ in range(requests)))
+
+    asyncio.run(main())
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', default='1,8,32,64', help='Comma-separated requests in flight')
+    parser.add_argument('--requests', type=int, default=256, help='Requests per concurrency level')
+    parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+    parser.add_argument('--db-latency', type=float, default=2.0, help='Milliseconds added to every statement')
+    parser.add_argument('--vacations', type=int, default=1000, help='Vacations to seed')
+    args = parser.parse_args()
+
+    with test_database():
+        from io import StringIO
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.db import connections
+        from django.test import Client
+        from django.urls import reverse
+
+        # A generation check landing in a timed request would add a query at random
+        settings.REFERENCE_DATA_CHECK_INTERVAL = float('inf')
+        # Queued requests are slow by design; don't log each one
+        settings.SLOW_REQUEST_THRESHOLD_MS = float('inf')
+        call_command(
+            'generate_load_data', users=10, vacations=args.vacations, likes=args.vacations * 5,
+            countries=20, seed=1, replace=True, stdout=StringIO(),
+        )
+        client = Client()
+        client.force_login(create_user('concurrency@load.test'))
+        cookies = client.cookies
+        url = reverse('vacation_list')
+        connections.close_all()
+        if args.db_latency:
+            add_db_latency(args.db_latency / 1000)
+
+        print(f'{"mode":<5} {"in flight":>9} {"req/s":>8} {"p50":>9} {"p95":>9} {"threads":>8} {"connections":>12}')
+        for mode in ('wsgi', 'asgi'):
+            use_async_views(mode == 'asgi')
+            for concurrency in (int(level) for level in args.concurrency.split(',')):
+                with Usage() as usage:
+                    started = time.perf_counter()
+                    if mode == 'wsgi':
+                        timings = run_wsgi(cookies, url, concurrency, args.requests, args.threads)
+                    else:
+                        timings = run_asgi(cookies, url, concurrency, args.requests)
+                    elapsed = time.perf_counter() - started
+                timings.sort()
+                print(f'{mode:<5} {concurrency:>9} {len(timings) / elapsed:>8.1f} '
+                      f'{statistics.median(timings) * 1000:>7.1f}ms '
+                      f'{timings[int(len(timings) * 0.95)] * 1000:>7.1f}ms '
+                      f'{usage.peak_threads:>8} {usage.connections:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Request latency with a new database connection per request and with the pool.
+
+Fetches the vacation list as a signed-in user ``--requests`` times at each
+level of ``--concurrency`` (threads serving requests), once with ``DB_POOL``
+off and ``CONN_MAX_AGE=0``, where every request connects and authenticates,
+and once with the connection pool. Each request ends the way
+``request_finished`` ends it, closing its connection or handing it back.
+
+Reports request latency, the time spent getting connections
+(``db_connection_wait_seconds``) and how many connections were opened.
+
+    python -m benchmarks.connection_pool [--concurrency 1,8] [--requests 200]
+
+Use a database server; the connection cost measured is that of the
+configured one, and a server across the network costs several round trips
+more per connection than one on localhost.
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .harness import connection_waits, create_user, test_database
+
+
+def use_pool(enabled, options):
+    """Switch the default database between the pool and a connection per request"""
+    from django.db import connections
+
+    connections.close_all()
+    connections['default'].close_pool()
+    settings_dict = connections.settings['default']
+    if enabled:
+        settings_dict['OPTIONS']['pool'] = options
+    else:
+        settings_dict['OPTIONS'].pop('pool', None)
+    settings_dict['CONN_MAX_AGE'] = 0
+
+
+def run(cookies, url, concurrency, requests):
+    from django.db import close_old_connections, connections
+    from django.test import Client
+
+    local = threading.local()
+    timings = []
+
+    def serve():
+        if not hasattr(local, 'client'):
+            local.client = Client()
+            local.client.cookies = cookies
+        started = time.perf_counter()
+        response = local.client.get(url)
+        # What request_finished does; the test client leaves it out
+        close_old_connections()
+        timings.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise SystemExit(f'{url} returned {response.status_code}')
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(serve) for _ in range(requests)]:
+            future.result()
+        barrier = threading.Barrier(concurrency)
+        for future in [executor.submit(lambda: (barrier.wait(), connections.close_all()))
+                       for _ in range(concurrency)]:
+            future.result()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', default='1,8', help='Comma-separated threads serving requests')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+    parser.add_argument('--vacations', type=int, default=1000, help='Vacations to seed')
+    args = parser.parse_args()
+
+    with test_database():
+        from io import StringIO
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.db import connections
+        from django.test import Client
+        from django.urls import reverse
+
+        options = connections.settings['default']['OPTIONS'].get('pool')
+        if not options:
+            raise SystemExit('Needs PostgreSQL with DB_POOL on, which is the default')
+        settings.REFERENCE_DATA_CHECK_INTERVAL = float('inf')
+        settings.SLOW_REQUEST_THRESHOLD_MS = float('inf')
+        call_command(
+            'generate_load_data', users=10, vacations=args.vacations, likes=args.vacations * 5,
+            countries=20, seed=1, replace=True, stdout=StringIO(),
+        )
+        client = Client()
+        client.force_login(create_user('pool@load.test'))
+        cookies = client.cookies
+        url = reverse('vacation_list')
+
+        print(f'{"connections":<11} {"threads":>7} {"p50":>9} {"p95":>9} {"wait/req":>9} {"opened":>7}')
+        for mode in ('per-request', 'pool'):
+            for concurrency in (int(level) for level in args.concurrency.split(',')):
+                use_pool(mode == 'pool', options)
+                source = 'pool' if mode == 'pool' else 'connect'
+                before = connection_waits().get(source, (0.0, 0.0))
+                timings = run(cookies, url, concurrency, args.requests)
+                count, total = connection_waits().get(source, (0.0, 0.0))
+                pool = connections['default'].pool
+                opened = pool.get_stats().get('connections_num', 0) if pool else count - before[0]
+                timings.sort()
+                print(f'{mode:<11} {concurrency:>7} '
+                      f'{statistics.median(timings) * 1000:>7.1f}ms '
+                      f'{timings[int(len(timings) * 0.95)] * 1000:>7.1f}ms '
+                      f'{(total - before[1]) / len(timings) * 1000:>7.2f}ms '
+                      f'{opened:>7.0f}')
+        use_pool(True, options)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import importlib
+import os
+from contextlib import contextmanager
+
+import django
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vacation_project.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database(verbosity=0):
+    """Configure Django and run the body against a freshly created test database."""
+    setup_django()
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=verbosity, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def create_user(email, role_name='user', password='benchpass123'):
+    from vacations.models import Role, User
+
+    role, _ = Role.objects.get_or_create(role_name=role_name)
+    return User.objects.create_user(
+        email=email,
+        password=password,
+        first_name='Bench',
+        last_name=role_name.title(),
+        role=role,
+    )
+
+
+def use_async_views(enabled):
+    """Route the views that have async versions to them, or back to the sync ones"""
+    from django.conf import settings
+    from django.urls import clear_url_caches
+
+    settings.ASYNC_VIEWS = enabled
+    # The routes are picked when the URLconf is imported
+    for module in ('vacations.urls', settings.ROOT_URLCONF):
+        importlib.reload(importlib.import_module(module))
+    clear_url_caches()
+
+
+async def serve_async(method, *args, **kwargs):
+    """``await method(*args, **kwargs)`` on an AsyncClient, the way ASGIHandler serves a request"""
+    from asgiref.sync import ThreadSensitiveContext, sync_to_async
+    from django.db import connections
+
+    # Sync code of each request runs on a thread of its own
+    async with ThreadSensitiveContext():
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            # request_finished would close the request thread's connection
+            await sync_to_async(connections.close_all)()
+
+
+def connection_waits():
+    """(count, total seconds) of db_connection_wait_seconds by source, summed over labels"""
+    from instrumentation.metrics import DB_CONNECTION_WAIT, _collect
+
+    waits = {}
+    for (suffix, labels, _), value in _collect().get(DB_CONNECTION_WAIT.name, {}).items():
+        source = labels.rsplit('source="', 1)[-1].rstrip('"')
+        count, total = waits.get(source, (0.0, 0.0))
+        if suffix == '_count':
+            count += value
+        elif suffix == '_sum':
+            total += value
+        waits[source] = (count, total)
+    return waits
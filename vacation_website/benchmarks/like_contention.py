@@ -0,0 +1,93 @@
+"""
+Like and unlike throughput with every thread racing on one vacation.
+
+``--threads`` users each add and remove their like ``--operations`` times
+through ``vacations.likes``, the way concurrent toggle requests would, so
+every operation contends for the same vacation row. Reports operations per
+second and operation latency, checks that ``likes_count`` still matches the
+likes, and exits non-zero below ``--min-rate`` operations per second.
+
+    python -m benchmarks.like_contention [--threads 8] [--operations 50] [--min-rate 100]
+
+Needs PostgreSQL; SQLite serialises the writers instead of locking the row.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from .harness import test_database
+
+
+def hammer(user_id, vacation_id, operations):
+    from django.db import connection
+    from vacations.likes import add_like, remove_like
+
+    timings = []
+    try:
+        for i in range(operations):
+            operation = add_like if i % 3 else remove_like
+            started = time.perf_counter()
+            operation(user_id, vacation_id)
+            timings.append(time.perf_counter() - started)
+    finally:
+        connection.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8, help='Users liking and unliking at once')
+    parser.add_argument('--operations', type=int, default=50, help='Likes and unlikes per user')
+    parser.add_argument('--min-rate', type=float, default=100, help='Operations per second to fail below')
+    args = parser.parse_args()
+
+    with test_database():
+        from django.db import connection
+        from vacations.models import Country, Like, Role, User, Vacation
+
+        if connection.vendor != 'postgresql':
+            raise SystemExit('Needs PostgreSQL')
+        role = Role.objects.create(role_name='user')
+        users = [
+            User.objects.create(email=f'contention{i}@load.test', first_name='Bench', last_name=str(i), role=role)
+            for i in range(args.threads)
+        ]
+        vacation = Vacation.objects.create(
+            country=Country.objects.create(country_name='Contention'),
+            description='Hot vacation',
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=40),
+            price=1000,
+            image_file='test.jpg',
+        )
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            timings = [
+                timing
+                for thread_timings in executor.map(
+                    hammer, [user.id for user in users], [vacation.id] * args.threads,
+                    [args.operations] * args.threads,
+                )
+                for timing in thread_timings
+            ]
+        elapsed = time.perf_counter() - started
+
+        vacation.refresh_from_db()
+        likes = Like.objects.filter(vacation=vacation).count()
+        rate = len(timings) / elapsed
+        timings.sort()
+        print(f'{"threads":>7} {"ops":>6} {"ops/s":>8} {"p50":>9} {"p95":>9}')
+        print(f'{args.threads:>7} {len(timings):>6} {rate:>8.0f} '
+              f'{statistics.median(timings) * 1000:>7.1f}ms '
+              f'{timings[int(len(timings) * 0.95)] * 1000:>7.1f}ms')
+        if vacation.likes_count != likes:
+            raise SystemExit(f'likes_count is {vacation.likes_count} for {likes} likes')
+        if rate < args.min_rate:
+            raise SystemExit(f'{rate:.0f} operations per second, below {args.min_rate:.0f}')
+
+
+if __name__ == '__main__':
+    main()
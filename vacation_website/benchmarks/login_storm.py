@@ -0,0 +1,135 @@
+"""
+List-page latency during a login storm, with the sync and the async login views.
+
+Drives the project in process the way an ASGI server would: requests are
+coroutines on one event loop, and the sync code of each request runs on a
+thread of its own, as under Django's ASGIHandler. A prober
+keeps fetching the vacation list as a signed-in user, first alone and then
+while ``--logins`` sign-ins arrive ``--concurrency`` at a time, once against
+the sync login view and once with ``ASYNC_VIEWS``, whose password hashing
+runs on the bounded pool in vacations/hashing.py.
+
+    python -m benchmarks.login_storm [--logins 60] [--concurrency 30]
+                                     [--workers N] [--max-pending N]
+
+Use a database server (a test database in SQLite memory is not shared
+between threads) and the production password hasher, or there is nothing
+to measure.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+from .harness import create_user, serve_async, test_database, use_async_views
+
+PASSWORD = 'stormpass123'
+
+
+def summary(timings):
+    timings = sorted(timings)
+    return (
+        statistics.median(timings),
+        timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        timings[-1],
+    )
+
+
+async def probe(client, url, timings, until):
+    while not until.is_set():
+        started = time.perf_counter()
+        response = await serve_async(client.get, url)
+        timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise SystemExit(f'{url} returned {response.status_code}')
+        await asyncio.sleep(0.01)
+
+
+async def storm(url, email, logins, concurrency):
+    from django.test import AsyncClient
+
+    statuses = Counter()
+    gate = asyncio.Semaphore(concurrency)
+
+    async def sign_in(i):
+        async with gate:
+            # Every fourth attempt has a wrong password; it costs the same hash
+            password = PASSWORD if i % 4 else 'wrong-password'
+            response = await serve_async(AsyncClient().post, url, {'email': email, 'password': password})
+            statuses[response.status_code] += 1
+
+    await asyncio.gather(*(sign_in(i) for i in range(logins)))
+    return statuses
+
+
+async def run(mode, user, args):
+    from django.test import AsyncClient
+    from django.urls import reverse
+
+    use_async_views(mode == 'async')
+    prober = AsyncClient()
+    await serve_async(prober.aforce_login, user)
+    list_url = reverse('vacation_list')
+
+    idle = []
+    stop = asyncio.Event()
+    task = asyncio.create_task(probe(prober, list_url, idle, stop))
+    await asyncio.sleep(args.idle)
+    stop.set()
+    await task
+
+    busy = []
+    stop = asyncio.Event()
+    task = asyncio.create_task(probe(prober, list_url, busy, stop))
+    started = time.perf_counter()
+    statuses = await storm(reverse('login'), user.email, args.logins, args.concurrency)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await task
+
+    for label, timings in (('idle', idle), ('storm', busy)):
+        p50, p95, worst = summary(timings)
+        print(f'{mode:<6} {label:<6} list p50 {p50:8.1f}ms  p95 {p95:8.1f}ms  max {worst:8.1f}ms  '
+              f'({len(timings)} requests)')
+    responses = ', '.join(f'{count}x{status}' for status, count in sorted(statuses.items()))
+    print(f'{mode:<6} logins {args.logins} in {elapsed:.1f}s: {responses}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=60, help='Sign-in attempts in the storm')
+    parser.add_argument('--concurrency', type=int, default=30, help='Sign-ins in flight at once')
+    parser.add_argument('--idle', type=float, default=2.0, help='Seconds to probe before the storm')
+    parser.add_argument('--vacations', type=int, default=1000, help='Vacations to seed')
+    parser.add_argument('--workers', type=int, help='PASSWORD_HASHING_WORKERS')
+    parser.add_argument('--max-pending', type=int, help='PASSWORD_HASHING_MAX_PENDING')
+    parser.add_argument('--mode', choices=('sync', 'async'), action='append',
+                        help='Run only this login view (repeatable)')
+    args = parser.parse_args()
+
+    with test_database():
+        from io import StringIO
+        from django.conf import settings
+        from django.core.management import call_command
+
+        # Every sign-in hashes with the production hasher on purpose; don't log each one
+        settings.SLOW_REQUEST_THRESHOLD_MS = float('inf')
+        if args.workers:
+            settings.PASSWORD_HASHING_WORKERS = args.workers
+        if args.max_pending:
+            settings.PASSWORD_HASHING_MAX_PENDING = args.max_pending
+
+        call_command(
+            'generate_load_data', users=10, vacations=args.vacations, likes=args.vacations * 5,
+            countries=20, seed=1, replace=True, stdout=StringIO(),
+        )
+        user = create_user('storm@load.test', password=PASSWORD)
+        print(f'hasher {settings.PASSWORD_HASHERS[0].rsplit(".", 1)[-1]}, '
+              f'{args.logins} logins {args.concurrency} at a time')
+        for mode in args.mode or ('sync', 'async'):
+            asyncio.run(run(mode, user, args))
+
+
+if __name__ == '__main__':
+    main()
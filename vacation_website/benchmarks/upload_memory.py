@@ -0,0 +1,137 @@
+"""
+Peak-RSS benchmark for vacation image uploads.
+
+Uploads a small and a large (default 50 MB) JPEG through add_vacation_view
+and reports how much the process's peak resident set grew for each. The
+multipart body is streamed from disk into the request handler, exactly as a
+WSGI server would, so only server-side memory is measured. With streaming
+uploads the growth should be about the same for both sizes.
+
+    python -m benchmarks.upload_memory [--size-mb 50]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import uuid
+from datetime import date, timedelta
+
+from .harness import create_user, test_database
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _make_jpeg(path, target_bytes):
+    # Noise barely compresses, so pixel count controls the file size
+    from PIL import Image
+
+    pixels = max(int(target_bytes / 1.15), 64 * 64)
+    width = int((pixels * 4 / 3) ** 0.5)
+    height = pixels // width
+    Image.frombytes('RGB', (width, height), os.urandom(width * height * 3)).save(path, 'JPEG', quality=95)
+
+
+def make_jpeg(path, target_bytes):
+    """Generate the test image in a separate process so it does not inflate our RSS"""
+    process = multiprocessing.get_context('spawn').Process(target=_make_jpeg, args=(path, target_bytes))
+    process.start()
+    process.join()
+    return os.path.getsize(path)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_multipart(body_path, boundary, fields, image_path):
+    with open(body_path, 'wb') as body:
+        for name, value in fields.items():
+            body.write(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            )
+        body.write(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="{os.path.basename(image_path)}"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'.encode()
+        )
+        with open(image_path, 'rb') as image:
+            shutil.copyfileobj(image, body, CHUNK_SIZE)
+        body.write(f'\r\n--{boundary}--\r\n'.encode())
+
+
+def upload(handler, session_cookie, country_id, image_path, workdir):
+    boundary = uuid.uuid4().hex
+    body_path = os.path.join(workdir, 'body.bin')
+    write_multipart(body_path, boundary, {
+        'country': country_id,
+        'description': 'Benchmark upload',
+        'start_date': date.today() + timedelta(days=30),
+        'end_date': date.today() + timedelta(days=40),
+        'price': '1000.00',
+    }, image_path)
+
+    with open(body_path, 'rb') as body:
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/add/',
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_COOKIE': session_cookie,
+            'CONTENT_TYPE': f'multipart/form-data; boundary={boundary}',
+            'CONTENT_LENGTH': str(os.path.getsize(body_path)),
+            'wsgi.input': body,
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+        }
+        before = peak_rss_mb()
+        response = handler(environ)
+        after = peak_rss_mb()
+
+    if response.status_code != 302:
+        raise SystemExit(f'Upload failed with status {response.status_code}')
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=50, help='Size of the large upload')
+    parser.add_argument('--small-mb', type=int, default=5, help='Size of the baseline upload')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='upload-bench-')
+    try:
+        sizes = {}
+        for label, megabytes in (('small', args.small_mb), ('large', args.size_mb)):
+            path = os.path.join(workdir, f'{label}.jpg')
+            sizes[label] = (path, make_jpeg(path, megabytes * 1024 * 1024))
+
+        with test_database():
+            from django.conf import settings
+            from django.test import Client, override_settings
+            from django.test.client import ClientHandler
+            from vacations.models import Country
+
+            with override_settings(MEDIA_ROOT=os.path.join(workdir, 'media'),
+                                   VACATION_IMAGE_MAX_UPLOAD_SIZE=(args.size_mb + 10) * 1024 * 1024):
+                admin = create_user('bench-admin@test.com', role_name='admin')
+                country = Country.objects.create(country_name='Benchmark Country')
+                client = Client()
+                client.force_login(admin)
+                session_cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+                handler = ClientHandler(enforce_csrf_checks=False)
+
+                print(f"{'upload':>10} {'size':>10} {'peak RSS before':>16} {'peak RSS after':>15} {'growth':>8}")
+                for label in ('small', 'large'):
+                    path, size = sizes[label]
+                    before, after = upload(handler, session_cookie, country.id, path, workdir)
+                    print(f'{label:>10} {size / 2**20:>8.1f}MB {before:>14.1f}MB {after:>13.1f}MB {after - before:>6.1f}MB')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
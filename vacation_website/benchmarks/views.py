@@ -0,0 +1,267 @@
+"""
+View benchmarks with query-count and latency budgets.
+
+Seeds each dataset size with generate_load_data, drives every view through
+the test client and records median/p95 wall time, SQL query count and SQL
+time per request. Results are written as JSON so runs can be diffed across
+commits; the exit status is 1 when any limit in the budget file is exceeded.
+
+    python -m benchmarks.views [--sizes 100,1000,10000] [--repeat 10]
+                               [--budgets benchmarks/budgets.json] [--output results.json]
+                               [--cold] [--only vacation_list]
+
+The budget file has a section per database vendor, since the same view may
+take a different number of queries on each, mapping scenario names to their
+``queries``, ``wall_ms`` (median) and ``sql_ms`` (median) limits. Query
+budgets apply at every size, so a count that grows with the data (an N+1)
+fails even when each query is fast.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+from .harness import create_user, test_database
+
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(__file__), 'budgets.json')
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # Builds (path, data) from the fixture dictionary
+    request: Callable[[Dict], tuple]
+    client: str = 'user'
+
+
+@dataclass
+class Result:
+    scenario: str
+    size: int
+    status: int
+    wall_ms_median: float
+    wall_ms_p95: float
+    queries: int
+    sql_ms: float
+
+
+def scenarios() -> List[Scenario]:
+    from django.urls import reverse
+
+    return [
+        Scenario('vacation_list', 'get', lambda f: (reverse('vacation_list'), {})),
+        Scenario('vacation_list_admin', 'get', lambda f: (reverse('vacation_list'), {}), client='admin'),
+        Scenario('vacation_list_filtered', 'get', lambda f: (
+            reverse('vacation_list'), {'country': f['country_id'], 'sort': 'popular'})),
+        Scenario('vacation_page', 'get', lambda f: (reverse('vacation_page'), {'after': f['cursor']})),
+        Scenario('search', 'get', lambda f: (reverse('search'), {'q': 'beaches museums'})),
+        Scenario('api_list', 'get', lambda f: (reverse('api_vacation_list'), {'limit': 100})),
+        Scenario('api_detail', 'get', lambda f: (reverse('api_vacation_detail', args=[f['vacation_id']]), {})),
+        Scenario('like_put', 'put', lambda f: (reverse('toggle_like', args=[f['vacation_id']]), {})),
+        Scenario('like_delete', 'delete', lambda f: (reverse('toggle_like', args=[f['vacation_id']]), {})),
+        Scenario('toggle_like', 'post', lambda f: (reverse('toggle_like', args=[f['vacation_id']]), {})),
+        Scenario('add_vacation_form', 'get', lambda f: (reverse('add_vacation'), {}), client='admin'),
+        Scenario('edit_vacation_form', 'get', lambda f: (
+            reverse('edit_vacation', args=[f['vacation_id']]), {}), client='admin'),
+        Scenario('admin_vacations', 'get', lambda f: (
+            reverse('admin:vacations_vacation_changelist'), {}), client='admin'),
+        Scenario('admin_vacations_search', 'get', lambda f: (
+            reverse('admin:vacations_vacation_changelist'), {'q': 'beaches'}), client='admin'),
+        Scenario('admin_likes', 'get', lambda f: (reverse('admin:vacations_like_changelist'), {}), client='admin'),
+        Scenario('login_page', 'get', lambda f: (reverse('login'), {}), client='anonymous'),
+        Scenario('login', 'post', lambda f: (reverse('login'), {
+            'email': f['user_email'], 'password': 'loadtest123'}), client='anonymous'),
+    ]
+
+
+def seed(size):
+    """Load ``size`` vacations, size/10 users and 5 likes per vacation; returns fixtures"""
+    from io import StringIO
+    from django.core.management import call_command
+    from vacations.models import Vacation
+    from vacations.pagination import encode_cursor
+    from vacations.views import VACATION_FEED_KEYS, VACATION_PAGE_SIZE
+
+    users = max(size // 10, 10)
+    call_command(
+        'generate_load_data', users=users, vacations=size, likes=min(size * 5, users * size),
+        countries=min(max(size // 100, 5), 50), seed=1, replace=True, stdout=StringIO(),
+    )
+    vacation = Vacation.objects.order_by('-likes_count', 'id').first()
+    page_end = Vacation.objects.order_by(*VACATION_FEED_KEYS)[VACATION_PAGE_SIZE - 1:VACATION_PAGE_SIZE].get()
+    return {
+        'vacation_id': vacation.id,
+        'country_id': vacation.country_id,
+        'cursor': encode_cursor([getattr(page_end, key) for key in VACATION_FEED_KEYS]),
+        'user_email': 'user0000000@load.test',
+    }
+
+
+class QueryTimer:
+    """Execute wrapper counting queries and their time with perf_counter precision"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def measure(client, scenario, fixtures, repeat, cold):
+    from django.core.cache import cache
+    from django.db import connection
+
+    path, data = scenario.request(fixtures)
+    send = getattr(client, scenario.method)
+    timings, query_counts, sql_times = [], [], []
+    status = None
+    # One untimed request warms caches and lazy imports
+    for attempt in range(repeat + 1):
+        if cold:
+            cache.clear()
+        queries = QueryTimer()
+        with connection.execute_wrapper(queries):
+            started = time.perf_counter()
+            response = send(path, data)
+            elapsed = time.perf_counter() - started
+        status = response.status_code
+        if attempt == 0:
+            continue
+        timings.append(elapsed * 1000)
+        query_counts.append(queries.count)
+        sql_times.append(queries.seconds * 1000)
+
+    timings.sort()
+    return Result(
+        scenario=scenario.name,
+        size=0,
+        status=status,
+        wall_ms_median=round(statistics.median(timings), 2),
+        wall_ms_p95=round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        queries=max(query_counts),
+        sql_ms=round(statistics.median(sql_times), 2),
+    )
+
+
+def check_budgets(results: List[Result], budgets: Dict) -> List[str]:
+    violations = []
+    for result in results:
+        limits = budgets.get(result.scenario)
+        if limits is None:
+            continue
+        if result.status >= 400:
+            violations.append(f'{result.scenario}@{result.size}: HTTP {result.status}')
+        for key, value in (('queries', result.queries), ('wall_ms', result.wall_ms_median),
+                           ('sql_ms', result.sql_ms)):
+            limit = limits.get(key)
+            if limit is not None and value > limit:
+                violations.append(f'{result.scenario}@{result.size}: {key} {value} > {limit}')
+    return violations
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma-separated vacation counts')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed requests per scenario')
+    parser.add_argument('--budgets', default=DEFAULT_BUDGETS, help='JSON file of per-scenario limits')
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+    parser.add_argument('--only', action='append', help='Run only these scenarios (repeatable)')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    with open(args.budgets) as f:
+        budgets = json.load(f)
+
+    results = []
+    with test_database():
+        from django.conf import settings
+        from django.db import connection
+        from django.test import Client
+
+        # A generation check landing in a timed request would add a query
+        # to it at random; seeding reloads the reference data anyway
+        settings.REFERENCE_DATA_CHECK_INTERVAL = float('inf')
+        # The login scenario measures the view, not PBKDF2 (see benchmarks.login_storm
+        # for that); users are created below, so their hashes are fast too
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        # A single process sees all of its own cache, as every worker does a
+        # shared one, so the auth lookups are cached as in such a deployment
+        settings.AUTH_USER_CACHE = True
+        settings.SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+        admin = create_user('bench-admin@test.com', role_name='admin')
+        admin.is_staff = admin.is_superuser = True
+        admin.save()
+
+        selected = [s for s in scenarios() if not args.only or s.name in args.only]
+        for size in sizes:
+            fixtures = seed(size)
+            from vacations.models import User
+
+            clients = {'anonymous': Client(), 'user': Client(), 'admin': Client()}
+            clients['user'].force_login(User.objects.get(email=fixtures['user_email']))
+            clients['admin'].force_login(admin)
+
+            for scenario in selected:
+                result = measure(clients[scenario.client], scenario, fixtures, args.repeat, args.cold)
+                result.size = size
+                results.append(result)
+                print(f'{scenario.name:<26} {size:>7} {result.wall_ms_median:>9.2f}ms '
+                      f'{result.queries:>4}q {result.sql_ms:>8.2f}ms sql', file=sys.stderr)
+
+        database = connection.vendor
+
+    if database not in budgets:
+        print(f'No budgets for {database} in {args.budgets}; nothing is enforced', file=sys.stderr)
+    violations = check_budgets(results, budgets.get(database, {}))
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'database': database,
+            'settings': settings.SETTINGS_MODULE,
+            'sizes': sizes,
+            'repeat': args.repeat,
+            'cold_cache': args.cold,
+        },
+        'results': [asdict(result) for result in results],
+        'violations': violations,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    for violation in violations:
+        print(f'BUDGET EXCEEDED {violation}', file=sys.stderr)
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -67,7 +67,6 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 
     // Add loading states to forms
-    const forms = document.querySelectorAll('form');
     forms.forEach(form => {
         form.addEventListener('submit', function(event) {
             const submitButton = this.querySelector('button[type="submit"]');
@@ -86,8 +85,59 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
     });
+
+    initInfiniteScroll();
 });
 
+// Infinite scrolling for the vacation feed: when the sentinel below the cards
+// comes into view, fetch the next keyset page and append its cards.
+function initInfiniteScroll() {
+    const sentinel = document.getElementById('vacation-feed-sentinel');
+    const feed = document.getElementById('vacation-feed');
+    if (!sentinel || !feed || !('IntersectionObserver' in window)) {
+        return;
+    }
+
+    let loading = false;
+    const observer = new IntersectionObserver(entries => {
+        if (!entries.some(entry => entry.isIntersecting) || loading) {
+            return;
+        }
+        const cursor = sentinel.dataset.nextCursor;
+        if (!cursor) {
+            return;
+        }
+
+        loading = true;
+        // The page URL carries the list's filters and sort order
+        const url = new URL(sentinel.dataset.pageUrl, window.location.href);
+        url.searchParams.set('after', cursor);
+        fetch(url, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    throw new Error(data.error);
+                }
+                feed.insertAdjacentHTML('beforeend', data.html);
+                if (data.next_cursor) {
+                    sentinel.dataset.nextCursor = data.next_cursor;
+                } else {
+                    observer.disconnect();
+                    sentinel.remove();
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                observer.disconnect();
+            })
+            .finally(() => {
+                loading = false;
+            });
+    }, { rootMargin: '400px' });
+
+    observer.observe(sentinel);
+}
+
 // Utility functions
 function showAlert(message, type = 'info') {
     const alertContainer = document.createElement('div');
@@ -11,11 +11,19 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import sys
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# The instrumentation app, shared with the statistics backend, is at the top of the
+# repository; the Dockerfile copies it to /instrumentation
+if str(BASE_DIR.parent) not in sys.path:
+    sys.path.append(str(BASE_DIR.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -46,15 +54,19 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'instrumentation',
     'vacations',
 ]
 
 MIDDLEWARE = [
+    'instrumentation.middleware.RequestTimingMiddleware',
+    'instrumentation.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'vacations.replicas.ReplicaReadsMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'vacations.middleware.SuppressWellKnownMiddleware',
@@ -64,7 +76,8 @@ ROOT_URLCONF = 'vacation_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, also recording render time for RequestTimingMiddleware
+        'BACKEND': 'instrumentation.timing.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -83,17 +96,114 @@ WSGI_APPLICATION = 'vacation_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Each process keeps a pool of connections (DB_POOL, on by default) and a
+# request hands its connection back when it finishes, so it neither connects
+# nor authenticates. A request waits up to DB_POOL_TIMEOUT seconds for one of
+# the DB_POOL_MAX_SIZE connections to be free, then fails. Connections are
+# checked before they are handed out and replaced after DB_POOL_MAX_LIFETIME
+# seconds; idle ones above DB_POOL_MIN_SIZE close after DB_POOL_MAX_IDLE.
+# With DB_POOL off (e.g. behind pgbouncer) each thread keeps its connection
+# for DB_CONN_MAX_AGE seconds instead.
+DB_POOL = os.environ.get('DB_POOL', 'True').lower() in ['true', '1', 'yes', 'on']
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # django.db.backends.postgresql, timing connection waits for /metrics
+        'ENGINE': 'instrumentation.postgresql',
         'NAME': os.environ.get('DB_NAME', 'vacation_db'),
         'USER': os.environ.get('DB_USER', 'postgres'),
         'PASSWORD': os.environ.get('DB_PASSWORD', 'password'),
         'HOST': os.environ.get('DB_HOST', 'db'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+                'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+                'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 600)),
+            },
+        } if DB_POOL else {},
+    }
+}
+
+# A read replica, configured like the primary wherever DB_REPLICA_* is unset.
+# REPLICA_READS (off by default) sends the reads of vacations and likes in
+# GET requests there, falling back to the primary while the replica is down or
+# lags more than REPLICA_MAX_LAG_SECONDS (checked every REPLICA_CHECK_INTERVAL
+# seconds); see replicas.py. Tests use the default database for both.
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        # Seconds to connect or wait for a pooled connection; a replica that
+        # is down must not hold requests up for long
+        'OPTIONS': {'connect_timeout': int(os.environ.get('DB_REPLICA_TIMEOUT', 2))},
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DB_POOL:
+        DATABASES['replica']['OPTIONS']['pool'] = {
+            **DATABASES['default']['OPTIONS']['pool'],
+            'timeout': DATABASES['replica']['OPTIONS']['connect_timeout'],
+        }
+
+DATABASE_ROUTERS = ['vacations.replicas.ReplicaRouter']
+REPLICA_READS = os.environ.get('REPLICA_READS', 'False').lower() in ['true', '1', 'yes', 'on']
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Defaults to a process-local cache; point CACHE_BACKEND/CACHE_LOCATION at
+# memcached or redis to share it between workers.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        # Counts hits and misses for /metrics, then defers to METERED_BACKEND
+        'BACKEND': 'vacations.metrics.MeteredCache',
+        'METERED_BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'vacation-cache'),
     }
 }
 
+# Whether every worker sees what one of them writes to or deletes from the cache
+CACHE_SHARED = CACHE_BACKEND != 'django.core.cache.backends.locmem.LocMemCache'
+
+# Worker processes serving the site, as uvicorn and gunicorn read it. Liked
+# sets are written through to the cache and deleted vacations marked in it,
+# so a worker with a cache of its own would show stale likes and answer 304
+# for a stale list; more than one worker needs a shared cache.
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+if WEB_CONCURRENCY > 1 and not CACHE_SHARED:
+    raise ImproperlyConfigured(
+        f'WEB_CONCURRENCY={WEB_CONCURRENCY} needs a cache shared by the workers; '
+        'set CACHE_BACKEND and CACHE_LOCATION to memcached or redis'
+    )
+
+
+# The signed-in user and their role are cached between requests (see
+# backends.py), and sessions read through the cache, only when the cache is
+# shared: in a process-local one, other workers would keep a deactivated,
+# deleted or logged-out user signed in with the copy they cached.
+AUTH_USER_CACHE = CACHE_SHARED
+SESSION_ENGINE = (
+    'django.contrib.sessions.backends.cached_db' if AUTH_USER_CACHE
+    else 'django.contrib.sessions.backends.db'
+)
+
+
+# Roles and countries are cached in each process (see refdata.py); how many
+# seconds a process may go before checking whether another one changed them
+REFERENCE_DATA_CHECK_INTERVAL = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -135,6 +245,20 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/app/media'
 
+# Uploads above FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to a temporary file,
+# so worker memory stays flat no matter how large the image is
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5 MB
+VACATION_IMAGE_MAX_UPLOAD_SIZE = int(os.environ.get('VACATION_IMAGE_MAX_UPLOAD_SIZE', 60 * 1024 * 1024))
+FILE_UPLOAD_HANDLERS = [
+    'vacations.uploads.UploadSizeLimitHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# Checked from the image header before decoding to reject decompression bombs.
+# JPEGs are decoded downscaled; other formats are decoded in full (~3 bytes/pixel)
+VACATION_IMAGE_MAX_PIXELS = int(os.environ.get('VACATION_IMAGE_MAX_PIXELS', 60_000_000))
+VACATION_IMAGE_MAX_FULL_DECODE_PIXELS = int(os.environ.get('VACATION_IMAGE_MAX_FULL_DECODE_PIXELS', 16_000_000))
+
 AUTH_USER_MODEL = 'vacations.User'
 
 AUTHENTICATION_BACKENDS = [
@@ -145,6 +269,28 @@ AUTHENTICATION_BACKENDS = [
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 
+# RequestTimingMiddleware: a Server-Timing header on every response, and a
+# warning with the slowest statements for requests over the threshold
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'True').lower() in ['true', '1', 'yes', 'on']
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 500))
+SLOW_REQUEST_TOP_QUERIES = 5
+
+# Prometheus metrics at /metrics. With several worker processes point
+# METRICS_DIR at a directory they share, emptied whenever the server starts.
+# Only addresses in METRICS_ALLOWED_NETWORKS (comma separated) may scrape
+# them, or anyone sending METRICS_TOKEN as "Authorization: Bearer <token>".
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_ALLOWED_NETWORKS = os.environ.get('METRICS_ALLOWED_NETWORKS', '127.0.0.1/32,::1/128').split(',')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+# Serve login and registration from the async views (see hashing.py); asgi.py
+# turns this on. Password hashes run on a pool of PASSWORD_HASHING_WORKERS
+# threads (default: one per CPU) and beyond PASSWORD_HASHING_MAX_PENDING
+# running or queued hashes (default: four per worker) the views answer 429.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() in ['true', '1', 'yes', 'on']
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 0)) or None
+PASSWORD_HASHING_MAX_PENDING = int(os.environ.get('PASSWORD_HASHING_MAX_PENDING', 0)) or None
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -184,6 +330,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'instrumentation': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
         'django.request': {
             'handlers': ['console', 'file'],
             'level': 'WARNING',  # Log warnings and errors
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import User, Role, Country, Vacation, Like
+from .search import filter_vacations, uses_search_vector
 
 
 @admin.register(Role)
@@ -42,12 +43,20 @@ class CountryAdmin(admin.ModelAdmin):
 class VacationAdmin(admin.ModelAdmin):
     list_display = ['country', 'description', 'start_date', 'end_date', 'price', 'like_count']
     list_filter = ['country', 'start_date']
+    list_select_related = ['country']
     search_fields = ['country__country_name', 'description']
     ordering = ['start_date']
     
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text GIN index instead of ILIKE '%term%' scans
+        if search_term and uses_search_vector():
+            return filter_vacations(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+    
     def like_count(self, obj):
-        return obj.like_count
+        return obj.likes_count
     like_count.short_description = 'Likes'
+    like_count.admin_order_field = 'likes_count'
 
 
 @admin.register(Like)
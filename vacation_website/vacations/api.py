@@ -0,0 +1,140 @@
+"""
+Read-only JSON API for vacations.
+
+Rows are built with ``.values()`` straight from the query, so no model
+instances are created, and only the columns behind the requested
+``?fields=`` are selected. The list accepts the same filters and sort
+orders as the HTML catalog and pages with the same keyset cursors.
+"""
+from typing import Dict, List, Sequence
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from .cache import liked_vacation_ids
+from .forms import VacationFilterForm
+from .models import Vacation
+from .pagination import InvalidCursor, paginate_keyset
+from .serialization import dumps
+from .views import VACATION_PAGE_SIZE, VACATION_SORTS
+
+API_MAX_PAGE_SIZE = 100
+
+# API field -> column it is read from
+API_FIELDS = {
+    'id': 'id',
+    'country': 'country__country_name',
+    'description': 'description',
+    'start_date': 'start_date',
+    'end_date': 'end_date',
+    'price': 'price',
+    'likes_count': 'likes_count',
+    'image_url': 'image_file',
+}
+# Computed per user from the cached liked set, no column needed
+COMPUTED_FIELDS = ('liked',)
+
+DEFAULT_FIELDS = tuple(API_FIELDS) + COMPUTED_FIELDS
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def json_response(data, status=200) -> HttpResponse:
+    return HttpResponse(dumps(data), content_type='application/json', status=status)
+
+
+def requested_fields(request) -> List[str]:
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(DEFAULT_FIELDS)
+    fields = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in DEFAULT_FIELDS]
+    if unknown or not fields:
+        raise InvalidFields(
+            f"Unknown field(s): {', '.join(unknown) or '(none)'}. "
+            f"Available: {', '.join(DEFAULT_FIELDS)}"
+        )
+    return fields
+
+
+def _columns(fields: Sequence[str], extra: Sequence[str] = ()) -> List[str]:
+    columns = [API_FIELDS[name] for name in fields if name in API_FIELDS]
+    if 'liked' in fields:
+        columns.append('id')
+    columns.extend(extra)
+    return list(dict.fromkeys(columns))
+
+
+def _build_rows(rows: List[Dict], fields: Sequence[str], user) -> List[Dict]:
+    liked_ids = liked_vacation_ids(user) if 'liked' in fields and not user.is_admin else frozenset()
+    media_url = settings.MEDIA_URL
+    results = []
+    for row in rows:
+        item = {}
+        for name in fields:
+            if name == 'liked':
+                item[name] = row['id'] in liked_ids
+            elif name == 'image_url':
+                item[name] = f"{media_url}{row['image_file']}"
+            else:
+                item[name] = row[API_FIELDS[name]]
+        results.append(item)
+    return results
+
+
+@login_required
+@require_GET
+def vacation_list_api(request):
+    """
+    Page through vacations: ?fields=, ?limit=, ?after=, plus the catalog's
+    filter and sort parameters.
+    """
+    try:
+        fields = requested_fields(request)
+    except InvalidFields as e:
+        return json_response({'success': False, 'error': str(e)}, status=400)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', VACATION_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+    except ValueError:
+        return json_response({'success': False, 'error': 'limit must be a number'}, status=400)
+
+    filter_form = VacationFilterForm(request.GET)
+    filter_form.is_valid()
+    keys = VACATION_SORTS[filter_form.sort_order]
+    # The sort key columns are needed to build the next cursor
+    rows = filter_form.filter(Vacation.objects.all()).values(
+        *_columns(fields, extra=[key.lstrip('-') for key in keys])
+    )
+    try:
+        page = paginate_keyset(rows, keys, limit, after=request.GET.get('after'))
+    except InvalidCursor as e:
+        return json_response({'success': False, 'error': str(e)}, status=400)
+
+    return json_response({
+        'success': True,
+        'results': _build_rows(page.items, fields, request.user),
+        'next_cursor': page.next_cursor,
+    })
+
+
+@login_required
+@require_GET
+def vacation_detail_api(request, vacation_id):
+    try:
+        fields = requested_fields(request)
+    except InvalidFields as e:
+        return json_response({'success': False, 'error': str(e)}, status=400)
+
+    row = Vacation.objects.filter(pk=vacation_id).values(*_columns(fields)).first()
+    if row is None:
+        return json_response({'success': False, 'error': 'Vacation not found'}, status=404)
+
+    return json_response({
+        'success': True,
+        'vacation': _build_rows([row], fields, request.user)[0],
+    })
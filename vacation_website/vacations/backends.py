@@ -1,5 +1,11 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
+
+from .cache import get_auth_user
+from .hashing import amake_password, averify_password
 
 User = get_user_model()
 
@@ -28,9 +34,44 @@ class EmailBackend(ModelBackend):
                 return user
         return None
     
-    def get_user(self, user_id):
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        """
+        authenticate() for async views: the lookup uses the async ORM and
+        hashing runs on the hashing pool, which may raise HashingPoolSaturated.
+        
+        Rejected credentials raise PermissionDenied, so they are not tried
+        again by ModelBackend, whose aauthenticate() hashes on the event loop.
+        """
+        if username is None:
+            username = kwargs.get('email')
+        
+        if username is None or password is None:
+            return None
+        
         try:
-            user = User.objects.get(pk=user_id)
+            user = await User.objects.aget(email=username)
         except User.DoesNotExist:
-            return None
-        return user if self.user_can_authenticate(user) else None
\ No newline at end of file
+            # Same hashing cost as for an existing user (#20760)
+            await amake_password(password)
+            raise PermissionDenied
+        
+        is_correct, must_update = await averify_password(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            raise PermissionDenied
+        if must_update:
+            # Hasher or iteration count changed since the password was set
+            user.password = await amake_password(password)
+            await user.asave(update_fields=['password'])
+        return user
+    
+    def get_user(self, user_id):
+        def load():
+            return User.objects.select_related('role').filter(pk=user_id).first()
+        
+        # Cached with its role, so request.user.is_admin needs no query either
+        user = get_auth_user(user_id, load) if settings.AUTH_USER_CACHE else load()
+        return user if user is not None and self.user_can_authenticate(user) else None
+    
+    async def aget_user(self, user_id):
+        # ModelBackend's version queries the database, skipping the cache
+        return await sync_to_async(self.get_user)(user_id)
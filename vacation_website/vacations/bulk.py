@@ -0,0 +1,120 @@
+"""
+Bulk loading of rows into model tables.
+
+On PostgreSQL ``copy_rows()`` streams rows through ``COPY ... FROM STDIN``,
+which skips per-row statement parsing, planning and round trips entirely:
+psycopg2's ``copy_expert()`` reads from a file-like wrapper around the row
+iterator, psycopg 3 gets each row through ``Copy.write_row()``. Neither
+materializes the whole load in memory. Other databases fall back to
+``bulk_create()`` in batches.
+
+Like ``bulk_create()``, this bypasses ``Model.save()``, ``full_clean()`` and
+signals, so callers must validate rows and supply every non-null column.
+Database triggers still fire.
+"""
+import csv
+import io
+from itertools import islice
+from typing import Any, Iterable, Iterator, Sequence
+
+from django.db import connections
+
+COPY_CHUNK_ROWS = 1000
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+# PostgreSQL text can never contain NUL, so it safely marks NULLs for the
+# csv module, which has no way to leave just those fields unquoted
+_NULL = '\x00'
+_QUOTED_NULL = f'"{_NULL}"'
+
+
+def _csv_chunks(rows: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    # In COPY's CSV format an unquoted empty field is NULL and a quoted one
+    # is an empty string, so everything is quoted except the NULL markers
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, COPY_CHUNK_ROWS))
+        if not chunk:
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator='\n').writerows(
+            row if None not in row else [_NULL if value is None else value for value in row]
+            for row in chunk
+        )
+        yield buffer.getvalue().replace(_QUOTED_NULL, '').encode()
+
+
+class _IteratorReader(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks"""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._pending = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class _Counter:
+    """Pass rows through while counting them"""
+
+    def __init__(self, rows: Iterable[Sequence[Any]]):
+        self._rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self._rows:
+            self.count += 1
+            yield row
+
+
+def copy_rows(model, fields: Sequence[str], rows: Iterable[Sequence[Any]],
+              using: str = 'default', batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Insert ``rows`` (tuples of values in ``fields`` order) into ``model``'s
+    table and return how many were written. ``fields`` are model field names;
+    foreign keys take the related primary key.
+    """
+    connection = connections[using]
+    opts = model._meta
+    columns = [opts.get_field(name).column for name in fields]
+    counter = _Counter(rows)
+
+    if connection.vendor != 'postgresql':
+        attnames = [opts.get_field(name).attname for name in fields]
+        iterator = iter(counter)
+        while True:
+            batch = [model(**dict(zip(attnames, row))) for row in islice(iterator, batch_size)]
+            if not batch:
+                break
+            model._default_manager.db_manager(using).bulk_create(batch, batch_size=batch_size)
+        return counter.count
+
+    quote = connection.ops.quote_name
+    target = f"{quote(opts.db_table)} ({', '.join(quote(column) for column in columns)})"
+    with connection.cursor() as cursor:
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            cursor.copy_expert(
+                f'COPY {target} FROM STDIN WITH (FORMAT csv)',
+                _IteratorReader(_csv_chunks(counter)),
+            )
+        else:
+            # psycopg 3 adapts and escapes each value itself
+            with cursor.copy(f'COPY {target} FROM STDIN') as copy:
+                for row in counter:
+                    copy.write_row(row)
+    return counter.count
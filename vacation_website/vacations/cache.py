@@ -0,0 +1,145 @@
+"""
+Cache helpers for the vacation feed.
+
+Per-user cache of liked vacation ids:
+
+The feed needs to know which of the cards on screen the current user liked.
+Instead of asking the likes table on every render, each user's liked ids are
+loaded once into Django's cache framework and kept up to date write-through
+by the like views. Every write bumps a per-user version, which is also what
+tells clients that the user's like state changed. Versions are nanosecond
+timestamps, so they double as the time of the user's last like change.
+
+Authenticated users:
+EmailBackend.get_user() runs on every authenticated request. With
+settings.AUTH_USER_CACHE (on when the cache is shared between workers) the
+user is cached together with its role, stamped with a per-user version;
+saving or deleting the user (or its role) bumps the version, so an entry
+loaded before the change is never served, even if it was written after.
+
+Vacation card fragments:
+The shared part of each card is cached as a template fragment keyed by
+``(vacation.id, vacation.version)``; see vacation_card.html and
+admin_vacation_card.html. Vacation.version is bumped by edits and like
+changes, so stale fragments are simply never looked up again.
+"""
+import time
+from typing import Any, Callable, FrozenSet, Iterable, Optional, Tuple
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+# Bump when the shape of the cached value changes so old entries are ignored
+LIKED_SET_FORMAT = 1
+
+# Write-through covers normal traffic; the timeout bounds how long a lost
+# update from two simultaneous requests by the same user can linger.
+LIKED_SET_TIMEOUT = 60 * 60
+
+
+def liked_set_key(user_id: int) -> str:
+    return f'vacations:liked:{LIKED_SET_FORMAT}:{user_id}'
+
+
+def _load_liked_set(user_id: int) -> FrozenSet[int]:
+    from .models import Like
+    return frozenset(
+        Like.objects.filter(user_id=user_id).values_list('vacation_id', flat=True)
+    )
+
+
+def get_liked_entry(user_id: int) -> Tuple[int, FrozenSet[int]]:
+    """Return ``(version, liked vacation ids)`` for a user, loading it on a miss."""
+    key = liked_set_key(user_id)
+    entry = cache.get(key)
+    if entry is None:
+        # Start from a timestamp so a reloaded entry never reuses an old version
+        entry = (time.time_ns(), _load_liked_set(user_id))
+        cache.add(key, entry, LIKED_SET_TIMEOUT)
+    return entry
+
+
+def liked_vacation_ids(user) -> FrozenSet[int]:
+    if not user.is_authenticated:
+        return frozenset()
+    return get_liked_entry(user.pk)[1]
+
+
+def like_version(user) -> int:
+    if not user.is_authenticated:
+        return 0
+    return get_liked_entry(user.pk)[0]
+
+
+def record_like(user_id: int, vacation_id: int, liked: bool) -> None:
+    """Write a like change through to the cached set and bump its version."""
+    version, liked_ids = get_liked_entry(user_id)
+    if liked:
+        liked_ids = liked_ids | {vacation_id}
+    else:
+        liked_ids = liked_ids - {vacation_id}
+    version = max(version + 1, time.time_ns())
+    cache.set(liked_set_key(user_id), (version, liked_ids), LIKED_SET_TIMEOUT)
+
+
+def forget_liked_sets(user_ids: Iterable[int]) -> None:
+    cache.delete_many([liked_set_key(user_id) for user_id in user_ids])
+
+
+AUTH_USER_FORMAT = 1
+
+# Short, since nothing but the signals in signals.py keeps entries fresh
+AUTH_USER_TIMEOUT = 5 * 60
+
+
+def auth_user_key(user_id: int) -> str:
+    return f'vacations:auth-user:{AUTH_USER_FORMAT}:{user_id}'
+
+
+def auth_user_version_key(user_id: int) -> str:
+    return f'vacations:auth-user-version:{user_id}'
+
+
+def get_auth_user(user_id: int, load: Callable[[], Optional[Any]]):
+    """The cached user for ``user_id``, or ``load()``'s result cached when missing or stale"""
+    key, version_key = auth_user_key(user_id), auth_user_version_key(user_id)
+    found = cache.get_many([key, version_key])
+    version = found.get(version_key)
+    entry = found.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    user = load()
+    if user is not None:
+        cache.set(key, (version, user), AUTH_USER_TIMEOUT)
+    return user
+
+
+def forget_auth_users(user_ids: Iterable[int]) -> None:
+    user_ids = list(user_ids)
+    version = time.time_ns()
+    # Versions outlive entries, so a late write of an old load stays stale
+    cache.set_many({auth_user_version_key(user_id): version for user_id in user_ids}, None)
+    cache.delete_many([auth_user_key(user_id) for user_id in user_ids])
+
+
+# Fragment names used by the {% cache %} tags in the card templates
+VACATION_CARD_FRAGMENTS = ('vacation_card', 'admin_vacation_card')
+
+
+def forget_vacation_cards(vacation) -> None:
+    cache.delete_many([
+        make_template_fragment_key(fragment, [vacation.pk, vacation.version])
+        for fragment in VACATION_CARD_FRAGMENTS
+    ])
+
+
+# Deletions leave no updated_at behind, so remember when the catalog last lost a row
+CATALOG_DELETED_KEY = 'vacations:catalog-deleted-at'
+
+
+def mark_catalog_deletion() -> None:
+    cache.set(CATALOG_DELETED_KEY, time.time_ns(), None)
+
+
+def catalog_deleted_at() -> int:
+    return cache.get(CATALOG_DELETED_KEY, 0)
@@ -1,10 +1,77 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.core.exceptions import ValidationError
-from .models import User, Role, Country, Vacation
+from django.forms.models import ModelChoiceIterator
+from .models import User, Country, Vacation
+from .refdata import reference_data
+from .uploads import validate_image_upload
+
+
+class VacationImageField(forms.FileField):
+    """
+    Image upload validated from its header only. Unlike forms.ImageField the
+    file is never read into memory or fully decoded during validation.
+    """
+    
+    def to_python(self, data):
+        upload = super().to_python(data)
+        if upload is not None:
+            validate_image_upload(upload)
+        return upload
+    
+    def widget_attrs(self, widget):
+        attrs = super().widget_attrs(widget)
+        if isinstance(widget, forms.FileInput) and 'accept' not in widget.attrs:
+            attrs.setdefault('accept', 'image/*')
+        return attrs
+
+
+class CountryChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for country in reference_data.countries():
+            yield self.choice(country)
+    
+    def __len__(self):
+        return len(reference_data.countries()) + (self.field.empty_label is not None)
+    
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(reference_data.countries())
+
+
+class CountryChoiceField(forms.ModelChoiceField):
+    """
+    Country select answered from the in-process reference data, so neither
+    rendering nor validating it runs a query
+    """
+    iterator = CountryChoiceIterator
+    
+    def __init__(self, **kwargs):
+        super().__init__(queryset=Country.objects.order_by('country_name'), **kwargs)
+    
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, Country):
+            value = value.pk
+        try:
+            country = reference_data.country(int(value))
+        except (TypeError, ValueError):
+            country = None
+        if country is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return country
 
 
 class UserRegistrationForm(UserCreationForm):
+    # Set by the async registration view, which hashes the password off the event loop
+    encoded_password = None
+    
     first_name = forms.CharField(
         max_length=50,
         widget=forms.TextInput(attrs={'placeholder': 'First Name', 'class': 'form-control'})
@@ -43,12 +110,19 @@ class UserRegistrationForm(UserCreationForm):
         user.last_name = self.cleaned_data['last_name']
         
         # Default to regular user role
-        user_role, created = Role.objects.get_or_create(role_name='user')
-        user.role = user_role
+        user.role = reference_data.role('user')
         
         if commit:
             user.save()
         return user
+    
+    def set_password_and_save(self, user, password_field_name='password1', commit=True):
+        if self.encoded_password is None:
+            return super().set_password_and_save(user, password_field_name, commit)
+        user.password = self.encoded_password
+        if commit:
+            user.save()
+        return user
 
 
 class UserLoginForm(forms.Form):
@@ -72,8 +146,7 @@ class UserLoginForm(forms.Form):
 
 
 class VacationForm(forms.ModelForm):
-    country = forms.ModelChoiceField(
-        queryset=Country.objects.all(),
+    country = CountryChoiceField(
         widget=forms.Select(attrs={'class': 'form-control'})
     )
     description = forms.CharField(
@@ -92,7 +165,7 @@ class VacationForm(forms.ModelForm):
         max_value=10000,
         widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
     )
-    image = forms.ImageField(
+    image = VacationImageField(
         required=False,
         widget=forms.FileInput(attrs={'class': 'form-control'})
     )
@@ -110,4 +183,75 @@ class VacationForm(forms.ModelForm):
             if end_date <= start_date:
                 raise ValidationError("End date must be after start date")
         
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+
+class VacationFilterForm(forms.Form):
+    """
+    Catalog filters and sort order from the query string. Invalid values are
+    ignored rather than rejected, so a bad parameter never breaks the list:
+    call is_valid() and use filter() and sort_order whatever it returns.
+    """
+    SORT_CHOICES = [
+        ('start_date', 'Start date'),
+        ('price', 'Price: low to high'),
+        ('-price', 'Price: high to low'),
+        ('popular', 'Most popular'),
+    ]
+    
+    country = CountryChoiceField(
+        required=False,
+        empty_label='All countries',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    min_price = forms.DecimalField(
+        required=False,
+        min_value=0,
+        decimal_places=2,
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'placeholder': 'Min $'})
+    )
+    max_price = forms.DecimalField(
+        required=False,
+        min_value=0,
+        decimal_places=2,
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'placeholder': 'Max $'})
+    )
+    start_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'})
+    )
+    end_by = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'})
+    )
+    sort = forms.ChoiceField(
+        choices=SORT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    
+    @property
+    def sort_order(self) -> str:
+        return self.cleaned_data.get('sort') or 'start_date'
+    
+    def filter(self, queryset):
+        country = self.cleaned_data.get('country')
+        if country is not None:
+            queryset = queryset.filter(country=country)
+        
+        min_price = self.cleaned_data.get('min_price')
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        max_price = self.cleaned_data.get('max_price')
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+        
+        # The whole trip must fall inside the requested window
+        start_from = self.cleaned_data.get('start_from')
+        if start_from is not None:
+            queryset = queryset.filter(start_date__gte=start_from)
+        end_by = self.cleaned_data.get('end_by')
+        if end_by is not None:
+            queryset = queryset.filter(end_date__lte=end_by)
+        
+        return queryset
@@ -0,0 +1,69 @@
+"""
+Password hashing off the event loop, in a small dedicated thread pool.
+
+PBKDF2 takes a good fraction of a second of CPU per call. Under ASGI the
+sync code of every request gets a thread of its own, so a burst of sync
+logins runs as many hashes at once as there are logins in flight and every
+other request waits for its share of the oversubscribed CPUs; Django's
+default ``aauthenticate()`` even verifies the password on the event loop.
+The async auth views instead hash here, at most ``PASSWORD_HASHING_WORKERS``
+at a time, while hashlib releases the GIL for the rest of the process.
+
+No more than ``PASSWORD_HASHING_MAX_PENDING`` hashes may be running or queued.
+Beyond that ``HashingPoolSaturated`` is raised at once, and the views answer
+429 instead of letting the queue and the latency grow without bound.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+
+
+class HashingPoolSaturated(Exception):
+    pass
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_init_lock = threading.Lock()
+
+
+def _pool() -> Tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    global _executor, _slots
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', None) or os.cpu_count() or 1
+                pending = getattr(settings, 'PASSWORD_HASHING_MAX_PENDING', None) or workers * 4
+                _slots = threading.BoundedSemaphore(pending)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+    return _executor, _slots
+
+
+async def run_hashing(func, *args):
+    """Await ``func(*args)`` on the hashing pool; raise HashingPoolSaturated when it is full"""
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        raise HashingPoolSaturated
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    # Released when the hash finishes, even if the request was cancelled
+    # meanwhile; the asyncio future awaited below is done at the cancellation
+    future.add_done_callback(lambda _: slots.release())
+    return await asyncio.wrap_future(future)
+
+
+async def amake_password(password: str) -> str:
+    return await run_hashing(make_password, password)
+
+
+async def averify_password(password: str, encoded: str) -> Tuple[bool, bool]:
+    """``(is_correct, must_update)``, like django.contrib.auth.hashers.verify_password()"""
+    return await run_hashing(verify_password, password, encoded)
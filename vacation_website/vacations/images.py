@@ -0,0 +1,129 @@
+"""
+Resized JPEG and WebP derivatives of vacation images.
+
+Cards are a few hundred pixels wide, but uploads are full-size photos. For
+every original ``images/vacation_images/paris.jpg`` we store
+``paris_320w.jpg``, ``paris_320w.webp``, ``paris_640w.jpg`` ... next to it,
+and the card templates offer them through ``srcset`` so browsers download
+the smallest one that fits.
+"""
+import io
+import os
+from typing import Dict, List, Sequence, Tuple
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+DERIVATIVE_WIDTHS = (320, 640, 960)
+
+# (format extension, Pillow format, save options)
+DERIVATIVE_FORMATS = (
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+)
+
+# Availability is only rechecked this often; uploads and the backfill
+# command update it directly.
+WIDTHS_CACHE_TIMEOUT = 60 * 60
+
+
+def derivative_name(name: str, width: int, extension: str) -> str:
+    stem, _ = os.path.splitext(name)
+    return f'{stem}_{width}w.{extension}'
+
+
+def _widths_cache_key(name: str) -> str:
+    return f'vacations:image-widths:{name}'
+
+
+def remember_widths(name: str, widths: Tuple[int, ...]) -> None:
+    cache.set(_widths_cache_key(name), widths, WIDTHS_CACHE_TIMEOUT)
+
+
+def _save(storage, name: str, content: bytes) -> None:
+    # Derivative names are deterministic; replace instead of getting a suffixed copy
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(content))
+
+
+def generate_derivatives(name: str, storage=None) -> Tuple[int, ...]:
+    """
+    Write every derivative of the image stored at ``name``.
+
+    Widths larger than the original are skipped. Returns the widths that now
+    exist, smallest first.
+    """
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        # Let the JPEG decoder downscale while decoding when it can
+        image.draft('RGB', (max(DERIVATIVE_WIDTHS), max(DERIVATIVE_WIDTHS)))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        widths = [width for width in DERIVATIVE_WIDTHS if width < image.width]
+        # Shrink step by step from the largest size, each step is cheaper
+        for width in sorted(widths, reverse=True):
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            for extension, image_format, options in DERIVATIVE_FORMATS:
+                buffer = io.BytesIO()
+                image.save(buffer, image_format, **options)
+                _save(storage, derivative_name(name, width, extension), buffer.getvalue())
+
+    widths = tuple(sorted(widths))
+    remember_widths(name, widths)
+    return widths
+
+
+def available_widths(name: str, storage=None) -> Tuple[int, ...]:
+    """Derivative widths that exist for ``name``, cached to avoid stat calls per render."""
+    key = _widths_cache_key(name)
+    widths = cache.get(key)
+    if widths is None:
+        storage = storage or default_storage
+        widths = tuple(
+            width for width in DERIVATIVE_WIDTHS
+            if storage.exists(derivative_name(name, width, DERIVATIVE_FORMATS[0][0]))
+        )
+        remember_widths(name, widths)
+    return widths
+
+
+def srcsets(name: str, url_prefix: str) -> Dict[str, str]:
+    """``{extension: srcset}`` for every derivative format of ``name``."""
+    widths = available_widths(name)
+    if not widths:
+        return {}
+    return {
+        extension: ', '.join(
+            f'{url_prefix}{derivative_name(name, width, extension)} {width}w'
+            for width in widths
+        )
+        for extension, _, _ in DERIVATIVE_FORMATS
+    }
+
+
+def derivative_names(name: str) -> List[str]:
+    return [
+        derivative_name(name, width, extension)
+        for width in DERIVATIVE_WIDTHS
+        for extension, _, _ in DERIVATIVE_FORMATS
+    ]
+
+
+def missing_derivatives(names: Sequence[str], storage=None) -> List[str]:
+    """Originals among ``names`` that exist in storage but have no derivatives yet."""
+    storage = storage or default_storage
+    missing = []
+    for name in names:
+        if not storage.exists(name):
+            continue
+        smallest = derivative_name(name, DERIVATIVE_WIDTHS[0], DERIVATIVE_FORMATS[0][0])
+        if not storage.exists(smallest):
+            missing.append(name)
+    return missing
@@ -0,0 +1,111 @@
+"""
+Idempotent like/unlike operations.
+
+On PostgreSQL each operation is a single statement: the INSERT ... ON CONFLICT
+DO NOTHING (or DELETE ... RETURNING) and the likes_count adjustment run in one
+round trip, so double clicks and retries can neither raise IntegrityError on
+the (user, vacation) unique constraint nor double count. Other databases fall
+back to the equivalent ORM calls inside a transaction.
+"""
+from typing import Optional
+
+from django.db import IntegrityError, connection, transaction
+
+from .models import Like, Vacation
+
+
+# The counter is only touched when a row was actually inserted/deleted; an
+# idempotent retry just reads the current value and writes nothing.
+_ADD_LIKE_SQL = """
+WITH inserted AS (
+    INSERT INTO {likes} (user_id, vacation_id)
+    SELECT %(user_id)s, id FROM {vacations} WHERE id = %(vacation_id)s
+    ON CONFLICT (user_id, vacation_id) DO NOTHING
+    RETURNING vacation_id
+), updated AS (
+    UPDATE {vacations}
+    SET likes_count = likes_count + 1,
+        version = version + 1,
+        updated_at = now()
+    WHERE id = %(vacation_id)s AND EXISTS (SELECT 1 FROM inserted)
+    RETURNING likes_count
+)
+SELECT likes_count FROM updated
+UNION ALL
+SELECT likes_count FROM {vacations}
+WHERE id = %(vacation_id)s AND NOT EXISTS (SELECT 1 FROM inserted)
+"""
+
+_REMOVE_LIKE_SQL = """
+WITH deleted AS (
+    DELETE FROM {likes}
+    WHERE user_id = %(user_id)s AND vacation_id = %(vacation_id)s
+    RETURNING vacation_id
+), updated AS (
+    UPDATE {vacations}
+    SET likes_count = likes_count - 1,
+        version = version + 1,
+        updated_at = now()
+    WHERE id = %(vacation_id)s AND EXISTS (SELECT 1 FROM deleted)
+    RETURNING likes_count
+)
+SELECT likes_count FROM updated
+UNION ALL
+SELECT likes_count FROM {vacations}
+WHERE id = %(vacation_id)s AND NOT EXISTS (SELECT 1 FROM deleted)
+"""
+
+
+def _run(sql: str, user_id: int, vacation_id: int) -> Optional[int]:
+    sql = sql.format(
+        likes=connection.ops.quote_name(Like._meta.db_table),
+        vacations=connection.ops.quote_name(Vacation._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'user_id': user_id, 'vacation_id': vacation_id})
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _current_count(vacation_id: int) -> int:
+    return Vacation.objects.values_list('likes_count', flat=True).get(pk=vacation_id)
+
+
+def add_like(user_id: int, vacation_id: int) -> Optional[int]:
+    """
+    Make sure ``user_id`` likes ``vacation_id``.
+
+    Returns the vacation's like count afterwards, or None if the vacation
+    does not exist.
+    """
+    if connection.vendor == 'postgresql':
+        return _run(_ADD_LIKE_SQL, user_id, vacation_id)
+
+    with transaction.atomic():
+        if not Vacation.objects.filter(pk=vacation_id).exists():
+            return None
+        try:
+            with transaction.atomic():
+                Like.objects.create(user_id=user_id, vacation_id=vacation_id)
+        except IntegrityError:
+            pass
+        return _current_count(vacation_id)
+
+
+def remove_like(user_id: int, vacation_id: int) -> Optional[int]:
+    """
+    Make sure ``user_id`` does not like ``vacation_id``.
+
+    Returns the vacation's like count afterwards, or None if the vacation
+    does not exist.
+    """
+    if connection.vendor == 'postgresql':
+        return _run(_REMOVE_LIKE_SQL, user_id, vacation_id)
+
+    with transaction.atomic():
+        if not Vacation.objects.filter(pk=vacation_id).exists():
+            return None
+        like = Like.objects.filter(user_id=user_id, vacation_id=vacation_id).first()
+        if like is not None:
+            like.delete()
+        return _current_count(vacation_id)
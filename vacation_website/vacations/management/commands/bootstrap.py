@@ -0,0 +1,111 @@
+import importlib.util
+import pkgutil
+import time
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+
+
+def migrations_on_disk():
+    """(app_label, name) of every migration file, found without importing them"""
+    found = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue
+        try:
+            spec = importlib.util.find_spec(module_name)
+        except ModuleNotFoundError:
+            continue
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        found.update(
+            (app_config.label, module.name)
+            for module in pkgutil.iter_modules(spec.submodule_search_locations)
+            if not module.ispkg and module.name[0] not in '_~'
+        )
+    return found
+
+
+def migrations_pending(connection):
+    """
+    Whether ``migrate`` has anything to do. Compares migration file names
+    with the django_migrations table, which takes one query instead of
+    importing every migration and building the graph. Anything unusual, such
+    as a squashed migration that is not recorded yet, counts as pending and
+    is left to the real planner.
+    """
+    recorder = MigrationRecorder(connection)
+    if not recorder.has_table():
+        return True
+    return not migrations_on_disk() <= set(recorder.applied_migrations())
+
+
+class Command(BaseCommand):
+    help = 'Prepare the database for serving: wait for it, migrate if needed, load seed data; reports timings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database to bootstrap (default: "default")'
+        )
+        parser.add_argument(
+            '--wait',
+            type=float,
+            default=30,
+            help='Seconds to keep retrying while the database is unavailable (default: 30)'
+        )
+        parser.add_argument(
+            '--skip-seed',
+            action='store_true',
+            help='Do not run populate_db'
+        )
+
+    def wait_for_database(self, connection, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                connection.ensure_connection()
+                return
+            except OperationalError as e:
+                if time.monotonic() >= deadline:
+                    raise CommandError(f'Database is unavailable: {e}')
+                time.sleep(0.5)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        verbosity = options['verbosity']
+        timings = []
+        started = time.perf_counter()
+
+        def phase(name, detail, since):
+            now = time.perf_counter()
+            timings.append((name, now - since, detail))
+            return now
+
+        mark = started
+        self.wait_for_database(connection, options['wait'])
+        mark = phase('database', 'connected', mark)
+
+        if migrations_pending(connection):
+            call_command('migrate', database=options['database'], interactive=False, verbosity=verbosity)
+            mark = phase('migrations', 'applied', mark)
+        else:
+            mark = phase('migrations', 'up to date', mark)
+
+        if options['skip_seed']:
+            mark = phase('seed', 'skipped', mark)
+        else:
+            call_command('populate_db', verbosity=verbosity)
+            mark = phase('seed', 'checked', mark)
+
+        for name, seconds, detail in timings:
+            self.stdout.write(f'bootstrap {name:<10} {seconds * 1000:8.1f}ms  {detail}')
+        self.stdout.write(self.style.SUCCESS(
+            f'bootstrap total      {(time.perf_counter() - started) * 1000:8.1f}ms'
+        ))
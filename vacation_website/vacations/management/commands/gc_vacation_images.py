@@ -0,0 +1,79 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from vacations.models import Vacation
+from vacations.storage import BLOB_NAME_RE, vacation_image_storage
+
+
+class Command(BaseCommand):
+    help = 'Delete content-addressed vacation images (and their derivatives) that no vacation references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60 * 60,
+            help='Only delete files older than this many seconds, so images of '
+                 'vacations that are still being saved are kept (default: 3600)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List what would be deleted without deleting anything'
+        )
+
+    def _walk(self, storage, directory):
+        directories, files = storage.listdir(directory)
+        for name in files:
+            yield f'{directory}/{name}'
+        for name in directories:
+            yield from self._walk(storage, f'{directory}/{name}')
+
+    def handle(self, *args, **options):
+        storage = vacation_image_storage
+        if not storage.exists(storage.prefix):
+            self.stdout.write(self.style.SUCCESS('No stored vacation images'))
+            return
+
+        referenced = set()
+        for name in Vacation.objects.order_by().values_list('image_file', flat=True).distinct().iterator():
+            match = BLOB_NAME_RE.match(name)
+            if match:
+                referenced.add(match.group('digest'))
+
+        unreferenced = []
+        # Newest mtime among the files of each digest; a re-upload renews the original's
+        touched = {}
+        for name in self._walk(storage, storage.prefix):
+            match = BLOB_NAME_RE.match(name)
+            digest = match and match.group('digest')
+            if match:
+                # Derivatives live and die with their original's digest
+                if digest in referenced:
+                    continue
+            elif f'/{storage.incoming_dir}/' not in name:
+                # Not ours: files uploaded before content addressing
+                continue
+            stat = os.stat(storage.path(name))
+            unreferenced.append((name, digest, stat))
+            if digest:
+                touched[digest] = max(touched.get(digest, 0), stat.st_mtime)
+
+        cutoff = time.time() - options['min_age']
+        deleted = freed = 0
+        for name, digest, stat in unreferenced:
+            if (touched[digest] if digest else stat.st_mtime) > cutoff:
+                continue
+
+            deleted += 1
+            freed += stat.st_size
+            if options['dry_run']:
+                self.stdout.write(f'Would delete {name}')
+            else:
+                storage.delete(name)
+
+        verb = 'Would free' if options['dry_run'] else 'Freed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {freed / 2**20:.1f} MB in {deleted} file(s)'
+        ))
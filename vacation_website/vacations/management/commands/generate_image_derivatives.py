@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from vacations.images import generate_derivatives, missing_derivatives, remember_widths
+from vacations.models import Vacation
+
+
+def _init_worker():
+    # Spawned workers start without Django configured; forked ones already are
+    django.setup()
+
+
+def _generate(name):
+    try:
+        return name, generate_derivatives(name), None
+    except Exception as e:
+        return name, (), str(e)
+
+
+class Command(BaseCommand):
+    help = 'Generate resized JPEG/WebP derivatives for existing vacation images, in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (default: one per CPU core)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate derivatives even for images that already have them'
+        )
+
+    def handle(self, *args, **options):
+        names = list(Vacation.objects.order_by().values_list('image_file', flat=True).distinct())
+        if not options['force']:
+            names = missing_derivatives(names)
+
+        if not names:
+            self.stdout.write(self.style.SUCCESS('All vacation images already have derivatives'))
+            return
+
+        self.stdout.write(f"Generating derivatives for {len(names)} image(s) with {options['workers']} worker(s)...")
+
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = [pool.submit(_generate, name) for name in names]
+            for future in as_completed(futures):
+                name, widths, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                # Workers have their own cache connection; make sure ours is current
+                remember_widths(name, widths)
+                self.stdout.write(f"{name}: {', '.join(f'{w}w' for w in widths) or 'too small to resize'}")
+
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Done, {failed} image(s) failed'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Done'))
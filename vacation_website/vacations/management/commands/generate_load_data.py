@@ -0,0 +1,208 @@
+import random
+import time
+from bisect import bisect_left
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from vacations.bulk import copy_rows
+from vacations.cache import mark_catalog_deletion
+from vacations.models import Country, Like, Role, User, Vacation
+from vacations.refdata import reference_data_changed
+
+# Generated rows are recognisable by these, so --replace can remove them
+EMAIL_DOMAIN = 'load.test'
+COUNTRY_PREFIX = 'Load Country'
+
+# Photos shipped in media/ with the seed data
+IMAGES = (
+    'images/vacation_images/telaviv.jpg', 'images/vacation_images/madrid.jpg',
+    'images/vacation_images/nyc.jpg', 'images/vacation_images/paris.jpg',
+    'images/vacation_images/berlin.jpg', 'images/vacation_images/tokyo.jpg',
+    'images/vacation_images/rio.jpg', 'images/vacation_images/sydney.jpg',
+    'images/vacation_images/buenosaires.jpg', 'images/vacation_images/losangeles.jpg',
+    'images/vacation_images/medellin.jpg',
+)
+SIGHTS = ('beaches', 'museums', 'old town', 'markets', 'mountains', 'vineyards',
+          'street food', 'nightlife', 'temples', 'lakes', 'islands', 'castles')
+
+USER_FIELDS = ('email', 'password', 'first_name', 'last_name', 'role', 'is_superuser',
+               'is_staff', 'is_active', 'date_joined')
+VACATION_FIELDS = ('country', 'description', 'start_date', 'end_date', 'price',
+                   'image_file', 'likes_count', 'version', 'updated_at')
+
+
+def zipf_cum_weights(n, exponent):
+    """Cumulative weights of ranks 1..n under a Zipf distribution"""
+    return list(accumulate(1 / rank ** exponent for rank in range(1, n + 1)))
+
+
+class Command(BaseCommand):
+    help = 'Generate production-sized users, vacations and Zipf-skewed likes for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Users to create (default: 10000)')
+        parser.add_argument('--vacations', type=int, default=10000, help='Vacations to create (default: 10000)')
+        parser.add_argument('--likes', type=int, default=1000000, help='Likes to create (default: 1000000)')
+        parser.add_argument('--countries', type=int, default=50, help='Countries to spread vacations over (default: 50)')
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Popularity skew: the k-th most popular vacation gets likes in '
+                 'proportion to 1/k^ZIPF (default: 1.1, 0 for uniform)'
+        )
+        parser.add_argument('--seed', type=int, default=1, help='Random seed; equal seeds give equal data (default: 1)')
+        parser.add_argument('--password', default='loadtest123', help='Password of every generated user')
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Delete previously generated load data first'
+        )
+
+    def phase(self, label, started):
+        self.stdout.write(f'{label} in {time.perf_counter() - started:.2f}s')
+        return time.perf_counter()
+
+    def handle(self, *args, **options):
+        users, vacations, likes = options['users'], options['vacations'], options['likes']
+        if min(users, vacations, options['countries']) < 1:
+            raise CommandError('--users, --vacations and --countries must be positive')
+        if likes < 0:
+            raise CommandError('--likes cannot be negative')
+        if likes > users * vacations:
+            raise CommandError(f'At most {users * vacations} distinct likes fit {users} users and {vacations} vacations')
+
+        existing = User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+        if existing.exists() and not options['replace']:
+            raise CommandError('Load data already exists; use --replace to regenerate it')
+
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            if options['replace']:
+                self.remove_load_data(existing)
+                started = self.phase('Removed previous load data', started)
+
+            role, _ = Role.objects.get_or_create(role_name='user')
+            countries = Country.objects.bulk_create(
+                Country(country_name=f'{COUNTRY_PREFIX} {i:03d}') for i in range(options['countries'])
+            )
+            # bulk_create() sends no post_save
+            reference_data_changed()
+
+            # Hashing is deliberately slow; one hash shared by every user
+            password = make_password(options['password'])
+            copy_rows(User, USER_FIELDS, (
+                (f'user{i:07d}@{EMAIL_DOMAIN}', password, 'Load', f'User {i}', role.id,
+                 False, False, True, now)
+                for i in range(users)
+            ))
+            started = self.phase(f'Created {users} users', started)
+
+            today = now.date()
+            country_ids = [country.id for country in countries]
+            copy_rows(Vacation, VACATION_FIELDS, (
+                self.vacation_row(rng, i, country_ids, today, now) for i in range(vacations)
+            ))
+            started = self.phase(f'Created {vacations} vacations', started)
+
+            user_ids = list(User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+                            .order_by('email').values_list('id', flat=True))
+            vacation_ids = list(Vacation.objects.filter(country_id__in=country_ids)
+                                .order_by('id').values_list('id', flat=True))
+            # Popularity rank is independent of id, dates and price
+            rng.shuffle(vacation_ids)
+
+            copy_rows(Like, ('user', 'vacation'), self.like_rows(
+                rng, user_ids, vacation_ids, likes, options['zipf']
+            ))
+            started = self.phase(f'Created {likes} likes', started)
+
+            Vacation.objects.filter(pk__in=vacation_ids).reconcile_like_counts()
+            started = self.phase('Updated like counts', started)
+        # Django creates foreign keys deferred, so they are checked here
+        started = self.phase('Committed', started)
+
+        if options['replace']:
+            # The removed rows' signals were skipped, and with them the
+            # liked sets, signed-in users and cards they would have forgotten
+            cache.clear()
+            mark_catalog_deletion()
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for model in (User, Vacation, Like):
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+            self.phase('Analyzed tables', started)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated load data with seed {options['seed']}; "
+            f"users log in as user0000000@{EMAIL_DOMAIN} ... with password {options['password']!r}"
+        ))
+
+    def remove_load_data(self, users):
+        """
+        Delete the generated rows with one DELETE per table. Going through
+        the ORM would send signals for, and cascade from, every row; the
+        like counts they kept up are reconciled at once instead.
+        """
+        countries = Country.objects.filter(country_name__startswith=f'{COUNTRY_PREFIX} ')
+        vacations = Vacation.objects.filter(country__in=countries)
+        for queryset in (
+            Like.objects.filter(Q(user__in=users) | Q(vacation__in=vacations)),
+            User.groups.through.objects.filter(user__in=users),
+            User.user_permissions.through.objects.filter(user__in=users),
+            users,
+            vacations,
+            countries,
+        ):
+            queryset._raw_delete(queryset.db)
+        # Vacations that generated users had liked
+        Vacation.objects.reconcile_like_counts()
+
+    def vacation_row(self, rng, i, country_ids, today, now):
+        start_date = today + timedelta(days=rng.randrange(1, 730))
+        sights = ', '.join(rng.sample(SIGHTS, 3))
+        return (
+            rng.choice(country_ids),
+            f'Load test vacation {i}: {sights} and more.',
+            start_date,
+            start_date + timedelta(days=rng.randrange(3, 22)),
+            f'{rng.randrange(10000, 1000000) / 100:.2f}',
+            rng.choice(IMAGES),
+            0,
+            1,
+            now,
+        )
+
+    def like_rows(self, rng, user_ids, vacation_ids, total, exponent):
+        """
+        ``total`` distinct (user, vacation) pairs, spread evenly over users,
+        with vacations drawn by Zipf rank. Only one user's picks are held in
+        memory at a time.
+        """
+        cum_weights = zipf_cum_weights(len(vacation_ids), exponent)
+        top = cum_weights[-1]
+        last_rank = len(vacation_ids) - 1
+        per_user, extra = divmod(total, len(user_ids))
+        extra_users = set(rng.sample(range(len(user_ids)), extra))
+
+        for index, user_id in enumerate(user_ids):
+            wanted = per_user + (index in extra_users)
+            if wanted > len(vacation_ids) // 2:
+                # Too dense for rejection sampling; popularity barely matters here
+                picks = rng.sample(range(len(vacation_ids)), wanted)
+            else:
+                picks = set()
+                while len(picks) < wanted:
+                    picks.add(min(bisect_left(cum_weights, rng.random() * top), last_rank))
+            for rank in picks:
+                yield user_id, vacation_ids[rank]
@@ -0,0 +1,219 @@
+import csv
+import json
+import os
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from vacations.bulk import DEFAULT_BATCH_SIZE, copy_rows
+from vacations.models import Country, Vacation
+from vacations.refdata import reference_data_changed
+
+DEFAULT_IMAGE = 'images/vacation_images/default.jpg'
+
+COPY_FIELDS = (
+    'country', 'description', 'start_date', 'end_date', 'price',
+    'image_file', 'likes_count', 'version', 'updated_at',
+)
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(path):
+    """(line number, dict) for every record in a .csv or .jsonl file"""
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as source:
+            reader = csv.DictReader(source)
+            for record in reader:
+                yield reader.line_num, record
+    elif path.endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as source:
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    record = {'_raw': line.rstrip('\n'), '_error': f'invalid JSON: {e}'}
+                if not isinstance(record, dict):
+                    record = {'_raw': line.rstrip('\n'), '_error': 'not a JSON object'}
+                yield line_number, record
+    else:
+        raise CommandError('Expected a .csv or .jsonl file')
+
+
+class RejectWriter:
+    """Bad records with their line number and reason, in the input's format"""
+
+    def __init__(self, path, jsonl):
+        self.path = path
+        self.jsonl = jsonl
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, line_number, record, error):
+        self.count += 1
+        if self._file is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+        if self.jsonl:
+            self._file.write(json.dumps({'line': line_number, 'error': error, 'record': record}) + '\n')
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(
+                self._file, fieldnames=['line', 'error', *record.keys()], extrasaction='ignore'
+            )
+            self._writer.writeheader()
+        self._writer.writerow({'line': line_number, 'error': error, **record})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def _text(record, key, required=True):
+    value = record.get(key)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{key} is required')
+    return value
+
+
+def _date(record, key):
+    try:
+        return date.fromisoformat(_text(record, key))
+    except ValueError:
+        raise RowError(f'{key} must be a YYYY-MM-DD date') from None
+
+
+def validate(record, today):
+    """Check one record the way Vacation.clean() and its validators would, without queries"""
+    if '_error' in record:
+        raise RowError(record['_error'])
+
+    description = _text(record, 'description')
+    start_date = _date(record, 'start_date')
+    end_date = _date(record, 'end_date')
+    if end_date <= start_date:
+        raise RowError('end_date must be after start_date')
+    if start_date < today:
+        raise RowError('start_date cannot be in the past')
+
+    try:
+        price = Decimal(_text(record, 'price'))
+    except InvalidOperation:
+        raise RowError('price must be a number') from None
+    if not price.is_finite() or not 0 <= price <= 10000:
+        raise RowError('price must be between 0 and 10000')
+    if price.as_tuple().exponent < -2:
+        raise RowError('price can have at most 2 decimal places')
+
+    image_file = _text(record, 'image_file', required=False) or DEFAULT_IMAGE
+    if len(image_file) > Vacation._meta.get_field('image_file').max_length:
+        raise RowError('image_file is too long')
+
+    return description, start_date, end_date, price, image_file
+
+
+class Command(BaseCommand):
+    help = 'Import vacations from a CSV or JSON Lines file in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='File with country, description, start_date, end_date, price '
+                 'and optional image_file per record (.csv with a header row, or .jsonl)'
+        )
+        parser.add_argument(
+            '--rejects',
+            help='Where to write records that fail validation '
+                 '(default: <path> with .rejects before the extension)'
+        )
+        parser.add_argument(
+            '--create-countries',
+            action='store_true',
+            help='Create countries that do not exist yet instead of rejecting their records'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Records validated and loaded per batch (default: {DEFAULT_BATCH_SIZE})'
+        )
+
+    def resolve_countries(self, batch, countries, create):
+        """Add the batch's unknown country names to ``countries``, creating them if allowed"""
+        missing = {}
+        for _, record in batch:
+            name = _text(record, 'country', required=False)
+            if name and name.casefold() not in countries:
+                missing.setdefault(name.casefold(), name)
+        if not missing or not create:
+            return
+        Country.objects.bulk_create(
+            [Country(country_name=name) for name in missing.values()], ignore_conflicts=True
+        )
+        # bulk_create() sends no post_save
+        reference_data_changed()
+        countries.update(
+            (name.casefold(), pk) for pk, name in
+            Country.objects.filter(country_name__in=missing.values()).values_list('id', 'country_name')
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        stem, extension = os.path.splitext(path)
+        rejects = RejectWriter(options['rejects'] or f'{stem}.rejects{extension}', jsonl=extension != '.csv')
+
+        started = time.perf_counter()
+        today = timezone.now().date()
+        now = timezone.now()
+        # Every country, once; names are matched case-insensitively
+        countries = {
+            name.casefold(): pk for pk, name in Country.objects.values_list('id', 'country_name')
+        }
+
+        imported = 0
+        records = read_rows(path)
+        try:
+            with transaction.atomic():
+                while True:
+                    batch = list(islice(records, options['batch_size']))
+                    if not batch:
+                        break
+                    self.resolve_countries(batch, countries, options['create_countries'])
+
+                    rows = []
+                    for line_number, record in batch:
+                        try:
+                            country_id = countries.get(_text(record, 'country').casefold())
+                            if country_id is None:
+                                raise RowError(f"unknown country {record['country']!r}")
+                            description, start_date, end_date, price, image_file = validate(record, today)
+                        except RowError as e:
+                            rejects.write(line_number, record, str(e))
+                            continue
+                        rows.append((country_id, description, start_date, end_date, price,
+                                     image_file, 0, 1, now))
+
+                    if rows:
+                        imported += copy_rows(Vacation, COPY_FIELDS, rows, batch_size=options['batch_size'])
+        finally:
+            rejects.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} vacation(s) in {elapsed:.2f}s'
+        ))
+        if rejects.count:
+            self.stdout.write(self.style.WARNING(
+                f'Rejected {rejects.count} record(s), see {rejects.path}'
+            ))
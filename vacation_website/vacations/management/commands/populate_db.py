@@ -1,14 +1,42 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.hashers import make_password
-from vacations.models import Role, User, Country, Vacation
+from django.db import transaction
+from vacations.models import Role, User, Country, Vacation, SeedVersion
 from datetime import date, timedelta
 from django.utils import timezone
 
 
+SEED_NAME = 'initial_data'
+# Bump whenever the data below changes so existing databases pick it up
+SEED_VERSION = 1
+
+
 class Command(BaseCommand):
     help = 'Populate database with initial data from init_db.sql'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run even if this version of the seed data was already loaded'
+        )
+
     def handle(self, *args, **options):
+        # A single query on every boot once the data is in place
+        if not options['force'] and SeedVersion.objects.filter(
+                name=SEED_NAME, version__gte=SEED_VERSION).exists():
+            self.stdout.write(f'Initial data v{SEED_VERSION} already loaded')
+            return
+
+        with transaction.atomic():
+            self.populate()
+            SeedVersion.objects.update_or_create(name=SEED_NAME, defaults={'version': SEED_VERSION})
+
+        self.stdout.write(
+            self.style.SUCCESS('Successfully populated database with initial data!')
+        )
+
+    def populate(self):
         self.stdout.write('Populating database with initial data...')
 
         # Create roles
@@ -179,7 +207,4 @@ class Command(BaseCommand):
                 }
             )
 
-        self.stdout.write('Created vacations')
-        self.stdout.write(
-            self.style.SUCCESS('Successfully populated database with initial data!')
-        )
\ No newline at end of file
+        self.stdout.write('Created vacations')
\ No newline at end of file
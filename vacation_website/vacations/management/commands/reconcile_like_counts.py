@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from vacations.models import Vacation
+
+
+class Command(BaseCommand):
+    help = 'Recompute vacations.likes_count for every vacation whose counter has drifted from the likes table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vacation',
+            type=int,
+            action='append',
+            dest='vacation_ids',
+            help='Only reconcile the given vacation id (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        vacations = Vacation.objects.all()
+        if options['vacation_ids']:
+            vacations = vacations.filter(pk__in=options['vacation_ids'])
+
+        with transaction.atomic():
+            fixed = vacations.reconcile_like_counts()
+
+        if fixed:
+            self.stdout.write(self.style.WARNING(f'Corrected like counts for {fixed} vacation(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All like counts are consistent'))
@@ -0,0 +1,69 @@
+"""
+Cache metrics: reads by key family and whether they hit, and the hit ratio.
+
+Recorded into the shared ``instrumentation.metrics`` registry, so they are
+served on /metrics with the request and database metrics.
+"""
+from django.utils.module_loading import import_string
+
+from instrumentation.metrics import Counter, HitRatio
+
+CACHE_LOOKUPS = Counter('cache_lookups_total', 'Cache reads by key family and result', ['family', 'result'])
+CACHE_HIT_RATIO = HitRatio('cache_hit_ratio', 'Share of cache reads that hit, by key family', CACHE_LOOKUPS)
+
+
+def key_family(key: str) -> str:
+    """Cache key without its variable part: ``vacations:liked``, ``template.cache.vacation_card``"""
+    if key.startswith('template.cache.'):
+        return key.rsplit('.', 1)[0]
+    return ':'.join(key.split(':', 2)[:2])
+
+
+_MISSING = object()
+
+
+class MeteredCache:
+    """
+    Cache backend counting hits and misses of reads into ``cache_lookups_total``.
+
+    Wraps the backend named by ``METERED_BACKEND`` in the cache's settings
+    and hands everything else to it unchanged.
+    """
+
+    def __init__(self, location, params):
+        params = dict(params)
+        backend = params.pop('METERED_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+        self._cache = import_string(backend)(location, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def _count(self, key, hit):
+        CACHE_LOOKUPS.inc(key_family(key), 'hit' if hit else 'miss')
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, _MISSING, version=version)
+        self._count(key, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self._cache.get_many(keys, version=version)
+        for key in keys:
+            self._count(key, key in found)
+        return found
+
+    async def aget(self, key, default=None, version=None):
+        value = await self._cache.aget(key, _MISSING, version=version)
+        self._count(key, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    async def aget_many(self, keys, version=None):
+        keys = list(keys)
+        found = await self._cache.aget_many(keys, version=version)
+        for key in keys:
+            self._count(key, key in found)
+        return found
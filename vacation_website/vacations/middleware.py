@@ -1,4 +1,4 @@
-import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import HttpResponse
 
 
@@ -7,13 +7,25 @@ class SuppressWellKnownMiddleware:
     Middleware to suppress Chrome DevTools .well-known requests
     """
     
+    sync_capable = True
+    async_capable = True
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         # Suppress Chrome DevTools requests silently
         if request.path.startswith('/.well-known/'):
             return HttpResponse(status=404)
         
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+    async def __acall__(self, request):
+        if request.path.startswith('/.well-known/'):
+            return HttpResponse(status=404)
+        return await self.get_response(request)
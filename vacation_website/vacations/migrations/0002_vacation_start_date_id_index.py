@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vacation',
+            index=models.Index(fields=['start_date', 'id'], name='vacations_start_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_likes_count(apps, schema_editor):
+    Vacation = apps.get_model('vacations', 'Vacation')
+    Like = apps.get_model('vacations', 'Like')
+    counts = (Like.objects
+              .filter(vacation=OuterRef('pk'))
+              .order_by()
+              .values('vacation')
+              .annotate(total=Count('*'))
+              .values('total'))
+    Vacation.objects.update(likes_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacations', '0002_vacation_start_date_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vacation',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_likes_count, migrations.RunPython.noop),
+    ]
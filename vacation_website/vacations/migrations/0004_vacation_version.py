@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacations', '0003_vacation_likes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vacation',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacations', '0004_vacation_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vacation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='vacation',
+            index=models.Index(fields=['updated_at'], name='vacations_updated_at_idx'),
+        ),
+    ]
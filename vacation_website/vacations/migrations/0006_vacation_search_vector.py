@@ -0,0 +1,109 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:33
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# A generated column cannot read the country name from another table, so the
+# vector is kept current by triggers instead: on vacations when the
+# description or country changes, and on countries when a country is renamed.
+CREATE_TRIGGERS_SQL = """
+CREATE FUNCTION vacations_search_vector(country_name text, description text)
+RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+    SELECT setweight(to_tsvector('english', coalesce(country_name, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+$$;
+
+CREATE FUNCTION vacations_search_vector_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := vacations_search_vector(
+        (SELECT country_name FROM countries WHERE id = NEW.country_id),
+        NEW.description
+    );
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER vacations_search_vector_update
+    BEFORE INSERT OR UPDATE OF country_id, description ON vacations
+    FOR EACH ROW EXECUTE FUNCTION vacations_search_vector_trigger();
+
+CREATE FUNCTION countries_search_vector_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    -- The country name is part of every cached card, so bump their versions too
+    UPDATE vacations
+    SET search_vector = vacations_search_vector(NEW.country_name, description),
+        version = version + 1,
+        updated_at = now()
+    WHERE country_id = NEW.id;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER countries_search_vector_update
+    AFTER UPDATE OF country_name ON countries
+    FOR EACH ROW WHEN (OLD.country_name IS DISTINCT FROM NEW.country_name)
+    EXECUTE FUNCTION countries_search_vector_trigger();
+
+UPDATE vacations
+SET search_vector = vacations_search_vector(countries.country_name, vacations.description)
+FROM countries
+WHERE countries.id = vacations.country_id;
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS countries_search_vector_update ON countries;
+DROP FUNCTION IF EXISTS countries_search_vector_trigger();
+DROP TRIGGER IF EXISTS vacations_search_vector_update ON vacations;
+DROP FUNCTION IF EXISTS vacations_search_vector_trigger();
+DROP FUNCTION IF EXISTS vacations_search_vector(text, text);
+"""
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['search_vector'], name='vacations_search_vector_idx'
+)
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGGERS_SQL)
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGGERS_SQL)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('vacations', 'Vacation'), SEARCH_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('vacations', 'Vacation'), SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacations', '0005_vacation_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vacation',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+        # GIN is PostgreSQL only; other databases search without the index
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='vacation', index=SEARCH_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+    ]
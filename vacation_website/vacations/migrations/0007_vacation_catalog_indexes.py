@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacations', '0006_vacation_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vacation',
+            index=models.Index(fields=['price', 'id'], name='vacations_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacation',
+            index=models.Index(fields=['likes_count', 'id'], name='vacations_likes_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacation',
+            index=models.Index(fields=['country', 'start_date', 'id'], name='vacations_country_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacation',
+            index=models.Index(fields=['country', 'price', 'id'], name='vacations_country_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vacation',
+            index=models.Index(fields=['country', 'likes_count', 'id'], name='vacations_country_likes_idx'),
+        ),
+    ]
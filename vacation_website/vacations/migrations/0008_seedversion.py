@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacations', '0007_vacation_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeedVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('version', models.PositiveIntegerField()),
+                ('applied_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'seed_versions',
+            },
+        ),
+    ]
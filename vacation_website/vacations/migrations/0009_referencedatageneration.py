@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    ReferenceDataGeneration = apps.get_model('vacations', 'ReferenceDataGeneration')
+    ReferenceDataGeneration.objects.using(schema_editor.connection.alias).create(generation=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacations', '0008_seedversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceDataGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'reference_data_generation',
+            },
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Substr
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator, MinLengthValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from .refdata import reference_data
+
 
 class Role(models.Model):
     ROLE_CHOICES = [
@@ -61,7 +67,11 @@ class User(AbstractUser):
     
     @property
     def is_admin(self) -> bool:
-        return self.role.role_name == 'admin'
+        # A dictionary lookup, unless the role is newer than this process's copy
+        role_name = reference_data.role_name(self.role_id)
+        if role_name is None:
+            role_name = self.role.role_name
+        return role_name == 'admin'
     
     class Meta:
         db_table = 'users'
@@ -78,6 +88,46 @@ class Country(models.Model):
         verbose_name_plural = 'countries'
 
 
+class VacationQuerySet(models.QuerySet):
+    # Cards only show the first 20 words, so there is no need to ship the
+    # whole description over the wire for every row.
+    FEED_SUMMARY_LENGTH = 300
+
+    def for_feed(self):
+        """
+        Everything a vacation card needs, in a single query: the country is
+        joined in and the like count is read from the denormalized column.
+        Whether the current user liked each card is answered from the
+        cached liked set (see vacations.cache), not per row in SQL.
+        """
+        return (self
+                .select_related('country')
+                .only('id', 'start_date', 'end_date', 'price', 'image_file',
+                      'likes_count', 'version', 'country__country_name')
+                .annotate(
+                    summary=Substr('description', 1, self.FEED_SUMMARY_LENGTH),
+                ))
+
+    def reconcile_like_counts(self) -> int:
+        """
+        Recompute ``likes_count`` from the likes table for every vacation in
+        this queryset whose counter has drifted, in a single UPDATE.
+        Returns the number of vacations that were corrected.
+        """
+        actual = Coalesce(Subquery(
+            Like.objects
+            .filter(vacation=OuterRef('pk'))
+            .order_by()
+            .values('vacation')
+            .annotate(total=Count('*'))
+            .values('total')
+        ), 0)
+        drifted = self.annotate(actual_likes=actual).filter(~Q(likes_count=F('actual_likes')))
+        return self.model.objects.filter(
+            pk__in=drifted.values('pk')
+        ).update(likes_count=actual)
+
+
 class Vacation(models.Model):
     country = models.ForeignKey(
         Country, 
@@ -93,6 +143,17 @@ class Vacation(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(10000)]
     )
     image_file = models.CharField(max_length=255)
+    # Denormalized COUNT of likes, kept in step by the Like receivers in signals.py
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped on every change that affects a rendered card; part of the
+    # template fragment cache key so edited cards are never served stale
+    version = models.PositiveIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Country name + description tsvector, maintained by database triggers
+    # on PostgreSQL (see vacations.search); always NULL elsewhere
+    search_vector = SearchVectorField(null=True, editable=False)
+    
+    objects = VacationQuerySet.as_manager()
     
     def clean(self):
         if self.start_date and self.end_date:
@@ -105,11 +166,26 @@ class Vacation(models.Model):
     
     def save(self, *args, **kwargs):
         self.full_clean()
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        
+        if 'update_fields' not in kwargs:
+            # likes_count is only ever changed with F() expressions, so never
+            # write back the possibly stale copy held by this instance;
+            # search_vector belongs to the database triggers
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('likes_count', 'search_vector')
+            ]
+        # Increment in SQL so a concurrent like bump is never overwritten
+        self.version = F('version') + 1
         super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
     
     @property
     def like_count(self) -> int:
-        return self.likes.count()
+        return self.likes_count
     
     def is_liked_by_user(self, user) -> bool:
         if user.is_authenticated:
@@ -122,6 +198,21 @@ class Vacation(models.Model):
     class Meta:
         db_table = 'vacations'
         ordering = ['start_date']
+        indexes = [
+            # Keyset pagination of the feed walks this index
+            models.Index(fields=['start_date', 'id'], name='vacations_start_date_id_idx'),
+            # MAX(updated_at) for the list page's conditional GET validators
+            models.Index(fields=['updated_at'], name='vacations_updated_at_idx'),
+            # Catalog sort orders (see views.VACATION_SORTS), on their own and
+            # behind the country filter; descending sorts scan them backwards
+            models.Index(fields=['price', 'id'], name='vacations_price_id_idx'),
+            models.Index(fields=['likes_count', 'id'], name='vacations_likes_id_idx'),
+            models.Index(fields=['country', 'start_date', 'id'], name='vacations_country_start_idx'),
+            models.Index(fields=['country', 'price', 'id'], name='vacations_country_price_idx'),
+            models.Index(fields=['country', 'likes_count', 'id'], name='vacations_country_likes_idx'),
+            # Full-text search; only created on PostgreSQL (migration 0006)
+            GinIndex(fields=['search_vector'], name='vacations_search_vector_idx'),
+        ]
 
 
 class Like(models.Model):
@@ -136,9 +227,41 @@ class Like(models.Model):
         related_name='likes'
     )
     
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # Lock the row first, so that of two concurrent deletes only the
+            # one that removes it goes on to uncount it (signals.py)
+            if not Like.objects.select_for_update().filter(pk=self.pk).exists():
+                return 0, {}
+            return super().delete(*args, **kwargs)
+    
     def __str__(self) -> str:
         return f"{self.user} likes {self.vacation.country.country_name}"
     
     class Meta:
         db_table = 'likes'
         unique_together = ['user', 'vacation']
+
+
+class SeedVersion(models.Model):
+    """Which version of each seed data set has been loaded (see populate_db)"""
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveIntegerField()
+    applied_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self) -> str:
+        return f"{self.name} v{self.version}"
+    
+    class Meta:
+        db_table = 'seed_versions'
+
+
+class ReferenceDataGeneration(models.Model):
+    """
+    Single-row counter bumped whenever roles or countries change, so every
+    process of both sites reloads its copy of them (see refdata.py)
+    """
+    generation = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'reference_data_generation'
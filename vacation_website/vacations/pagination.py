@@ -0,0 +1,119 @@
+import base64
+import json
+from typing import Any, List, Optional, Sequence
+
+from django.db.models import Q, QuerySet
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _field_name(key: str) -> str:
+    return key.lstrip('-')
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Turn the sort-key values of the last row on a page into an opaque token."""
+    payload = json.dumps([str(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, model, keys: Sequence[str]) -> List[Any]:
+    """Inverse of encode_cursor, converting each value back through its model field."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('Malformed cursor') from e
+
+    if not isinstance(raw_values, list) or len(raw_values) != len(keys):
+        raise InvalidCursor('Cursor does not match the sort order')
+
+    try:
+        return [
+            model._meta.get_field(_field_name(key)).to_python(value)
+            for key, value in zip(keys, raw_values)
+        ]
+    except Exception as e:
+        raise InvalidCursor('Cursor does not match the sort order') from e
+
+
+def keyset_filter(keys: Sequence[str], values: Sequence[Any]) -> Q:
+    """
+    Build ``(k1, k2, ...) > (v1, v2, ...)`` in the order given by ``keys``,
+    where a ``-`` prefix marks a descending key (compared with ``<``).
+
+    The leading ``k1 >= v1`` bound lets the database start an index range
+    scan right at the cursor, so page 1000 costs the same as page 1.
+    """
+    condition = Q()
+    for i in reversed(range(len(keys))):
+        name = _field_name(keys[i])
+        comparison = 'lt' if keys[i].startswith('-') else 'gt'
+        strictly_after = Q(**{f'{name}__{comparison}': values[i]})
+        if i == len(keys) - 1:
+            condition = strictly_after
+        else:
+            condition = strictly_after | (Q(**{name: values[i]}) & condition)
+    name = _field_name(keys[0])
+    bound = 'lte' if keys[0].startswith('-') else 'gte'
+    return Q(**{f'{name}__{bound}': values[0]}) & condition
+
+
+class KeysetPage:
+    def __init__(self, items: list, next_cursor: Optional[str]):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+def paginate_keyset(queryset: QuerySet, keys: Sequence[str], per_page: int,
+                    after: Optional[str] = None) -> KeysetPage:
+    """
+    Return the page of ``queryset`` that follows ``after``, ordered by ``keys``.
+
+    ``keys`` are ``order_by()`` expressions and must end with a unique column
+    (normally ``id``) so every row has a distinct position. One extra row is
+    fetched to know whether another page exists; no COUNT or OFFSET is ever
+    issued.
+    """
+    return _keyset_page(list(_page_queryset(queryset, keys, per_page, after)), keys, per_page)
+
+
+async def apaginate_keyset(queryset: QuerySet, keys: Sequence[str], per_page: int,
+                           after: Optional[str] = None) -> KeysetPage:
+    """paginate_keyset() through the async ORM"""
+    items = [item async for item in _page_queryset(queryset, keys, per_page, after)]
+    return _keyset_page(items, keys, per_page)
+
+
+def _page_queryset(queryset, keys, per_page, after):
+    queryset = queryset.order_by(*keys)
+    if after:
+        values = decode_cursor(after, queryset.model, keys)
+        queryset = queryset.filter(keyset_filter(keys, values))
+    return queryset[:per_page + 1]
+
+
+def _keyset_page(items, keys, per_page):
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        if isinstance(last, dict):
+            # Rows from .values()
+            next_cursor = encode_cursor([last[_field_name(key)] for key in keys])
+        else:
+            next_cursor = encode_cursor([getattr(last, _field_name(key)) for key in keys])
+
+    return KeysetPage(items, next_cursor)
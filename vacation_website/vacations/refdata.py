@@ -0,0 +1,118 @@
+"""
+In-process cache of the reference tables, roles and countries.
+
+Both are tiny and change only through the admin, so each process loads them
+once and answers lookups from dictionaries. Changes are signalled through
+the single-row ReferenceDataGeneration counter: signals.py bumps it after
+any role or country is saved or deleted, and every process (the stats site
+included, which reads the same table) compares its copy's generation with it
+at most once per ``REFERENCE_DATA_CHECK_INTERVAL`` seconds. The process that
+made the change reloads right away.
+
+A snapshot loaded by a transaction with uncommitted role or country changes
+is dropped as soon as those changes are committed or rolled back, so rows
+that were rolled back never outlive their transaction.
+
+Snapshots are immutable and swapped in whole, so readers never lock.
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+
+class Snapshot:
+    def __init__(self, generation: Optional[int]):
+        from .models import Country, Role
+
+        self.generation = generation
+        # Uncommitted changes of this thread's transaction that it includes
+        self.pending = pending_changes()
+        self.roles_by_name: Dict[str, 'Role'] = {}
+        self.roles_by_id: Dict[int, 'Role'] = {}
+        for role in Role.objects.all():
+            self.roles_by_name[role.role_name] = self.roles_by_id[role.pk] = role
+        self.countries: Tuple['Country', ...] = tuple(Country.objects.order_by('country_name'))
+        self.countries_by_id = {country.pk: country for country in self.countries}
+
+
+def current_generation() -> int:
+    from .models import ReferenceDataGeneration
+
+    return ReferenceDataGeneration.objects.values_list('generation', flat=True).first() or 0
+
+
+class ReferenceData:
+    def __init__(self):
+        self._snapshot: Optional[Snapshot] = None
+        self._checked = 0.0
+
+    def snapshot(self) -> Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.pending and not still_pending(snapshot.pending):
+            # Changes it saw have been committed (and bumped), rolled back, or
+            # belong to another thread's transaction
+            snapshot = None
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked < getattr(settings, 'REFERENCE_DATA_CHECK_INTERVAL', 5):
+            return snapshot
+        generation = current_generation()
+        if snapshot is None or snapshot.generation != generation:
+            snapshot = self._snapshot = Snapshot(generation)
+        self._checked = now
+        return snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def role(self, role_name: str):
+        """The role called ``role_name``, created if it does not exist yet"""
+        role = self.snapshot().roles_by_name.get(role_name)
+        if role is None:
+            from .models import Role
+            role, _ = Role.objects.get_or_create(role_name=role_name)
+        return role
+
+    def role_name(self, role_id: int) -> Optional[str]:
+        role = self.snapshot().roles_by_id.get(role_id)
+        return role.role_name if role is not None else None
+
+    def countries(self) -> Tuple:
+        """Every country, ordered by name"""
+        return self.snapshot().countries
+
+    def country(self, country_id: int):
+        return self.snapshot().countries_by_id.get(country_id)
+
+
+reference_data = ReferenceData()
+
+
+def bump_generation():
+    from .models import ReferenceDataGeneration
+
+    if not ReferenceDataGeneration.objects.update(generation=F('generation') + 1):
+        ReferenceDataGeneration.objects.create(generation=1)
+    reference_data.invalidate()
+
+
+def pending_changes() -> Tuple:
+    """The generation bumps this thread's transaction has yet to commit, one per change"""
+    return tuple(entry for entry in connection.run_on_commit if entry[1] is bump_generation)
+
+
+def still_pending(changes: Tuple) -> bool:
+    # A rolled back transaction or savepoint drops its on_commit callbacks,
+    # and a committed one runs and clears them
+    current = connection.run_on_commit
+    return all(any(change is entry for entry in current) for change in changes)
+
+
+def reference_data_changed():
+    """Call after writing roles or countries without model signals, e.g. bulk_create()"""
+    # This thread sees its own uncommitted rows at once; the rest of the world
+    # is told after the commit, so nobody reloads the old rows under a new generation
+    reference_data.invalidate()
+    transaction.on_commit(bump_generation)
@@ -0,0 +1,190 @@
+"""
+Reads from a PostgreSQL read replica, with read-your-writes per session.
+
+With a ``replica`` database configured and ``REPLICA_READS`` on,
+``ReplicaRouter`` sends reads of vacations and likes, the tables behind the
+pages, to the replica while a GET or HEAD request is served. Writes, and
+reads of any request that may write, stay on the primary, as does every
+read outside a request.
+
+The replica is used only while it answers and its replay lag is within
+``REPLICA_MAX_LAG_SECONDS``; each process checks at most once per
+``REPLICA_CHECK_INTERVAL`` seconds and otherwise reads from the primary.
+
+A signed-in user's successful POST (a like, an edit ...) pins their session
+to the primary for the longest the replica may lag behind it, so the pages
+they load next show what they just did. Lagging up to the threshold, plus a
+check interval, the replica has caught up with it by the time the pin runs
+out.
+"""
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA = 'replica'
+# Models whose reads may go to the replica
+REPLICA_MODELS = {'vacations.vacation', 'vacations.like'}
+# Session key: time.time() until which the session reads from the primary
+PIN_SESSION_KEY = '_replica_pin_until'
+
+# Whether the request being served may read from the replica
+replica_reads: ContextVar[bool] = ContextVar('replica_reads', default=False)
+
+_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    -- Nothing left to replay: the last replayed transaction is merely old
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class ReplicaStatus:
+    """Whether the replica may be read from, rechecked every ``REPLICA_CHECK_INTERVAL`` seconds"""
+
+    def __init__(self, alias: str = REPLICA):
+        self.alias = alias
+        self._usable: Optional[bool] = None
+        self._checked: Optional[float] = None
+
+    def usable(self) -> bool:
+        if self.alias not in connections.settings:
+            return False
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < settings.REPLICA_CHECK_INTERVAL:
+            return self._usable is True
+        if _on_event_loop():
+            # No queries here (aiterator() asks for its database on the loop);
+            # the next read from sync code checks
+            return self._usable is True
+        # Other threads keep the last answer while this one checks
+        self._checked = now
+        usable = self._check()
+        if usable and self._usable is False:
+            logger.warning('Replica %r is back in use', self.alias)
+        self._usable = usable
+        return usable
+
+    def invalidate(self):
+        self._checked = None
+
+    def _check(self) -> bool:
+        try:
+            lag = self.lag()
+        except DatabaseError as exc:
+            # A broken connection is dropped at the end of the request
+            logger.warning('Replica %r is unavailable: %s', self.alias, exc)
+            return False
+        if lag > settings.REPLICA_MAX_LAG_SECONDS:
+            logger.warning('Replica %r lags %.1fs behind the primary', self.alias, lag)
+            return False
+        return True
+
+    def lag(self) -> float:
+        """Seconds of changes the replica has yet to replay; 0 for a stand-in that is no replica"""
+        connection = connections[self.alias]
+        with connection.cursor() as cursor:
+            cursor.execute(_LAG_SQL if connection.vendor == 'postgresql' else 'SELECT 0')
+            return float(cursor.fetchone()[0])
+
+
+replica = ReplicaStatus()
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and model._meta.label_lower in REPLICA_MODELS and replica.usable():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Not None: Django would write an instance back where it was read from
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        if {obj1._state.db, obj2._state.db} <= {'default', REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == REPLICA else None
+
+
+def pin_seconds() -> float:
+    return settings.REPLICA_MAX_LAG_SECONDS + settings.REPLICA_CHECK_INTERVAL
+
+
+class ReplicaReadsMiddleware:
+    """
+    Serve GET and HEAD requests with replica reads unless their session is
+    pinned to the primary, and pin it after a signed-in user's write.
+
+    Listed after AuthenticationMiddleware; does nothing unless
+    ``REPLICA_READS`` is on.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REPLICA_READS:
+            return self.get_response(request)
+        token = replica_reads.set(
+            request.method in ('GET', 'HEAD') and request.session.get(PIN_SESSION_KEY, 0) <= time.time()
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        if self.wrote(request, response) and request.user.is_authenticated:
+            self.pin(request.session, request.session.get(PIN_SESSION_KEY, 0))
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REPLICA_READS:
+            return await self.get_response(request)
+        token = replica_reads.set(
+            request.method in ('GET', 'HEAD') and await request.session.aget(PIN_SESSION_KEY, 0) <= time.time()
+        )
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        if self.wrote(request, response) and (await request.auser()).is_authenticated:
+            self.pin(request.session, await request.session.aget(PIN_SESSION_KEY, 0))
+        return response
+
+    def wrote(self, request, response) -> bool:
+        return request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and response.status_code < 400
+
+    def pin(self, session, pinned_until):
+        now = time.time()
+        # A streak of likes saves the session about twice per pin, not on each
+        if pinned_until - now < pin_seconds() / 2:
+            session[PIN_SESSION_KEY] = now + pin_seconds()
@@ -0,0 +1,107 @@
+"""
+Full-text search over vacations.
+
+On PostgreSQL ``vacations.search_vector`` holds a weighted tsvector of the
+country name (A) and description (B). Triggers installed by migration 0006
+keep it current when a vacation or a country is written, and a GIN index
+makes matching a bitmap index scan instead of an ILIKE sequential scan.
+Other databases fall back to case-insensitive substring matching.
+"""
+import re
+from typing import List
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, Q, QuerySet
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+
+from .models import Vacation
+
+SEARCH_CONFIG = 'english'
+
+SEARCH_RESULTS_LIMIT = 50
+
+# ts_headline returns raw description text; these markers survive escaping
+# and are swapped for <mark> tags afterwards
+_START_SEL = '\x02'
+_STOP_SEL = '\x03'
+
+_SNIPPET_LENGTH = 200
+
+
+def search_query(terms: str) -> SearchQuery:
+    """Parse user input with websearch_to_tsquery: quotes, OR and -word all work"""
+    return SearchQuery(terms, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def uses_search_vector() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def filter_vacations(queryset: QuerySet, terms: str) -> QuerySet:
+    """Restrict ``queryset`` to vacations matching ``terms``, using the GIN index when available"""
+    if uses_search_vector():
+        return queryset.filter(search_vector=search_query(terms))
+    return queryset.filter(
+        Q(description__icontains=terms) | Q(country__country_name__icontains=terms)
+    )
+
+
+def _highlight(text: str) -> SafeString:
+    return mark_safe(
+        escape(text).replace(_START_SEL, '<mark>').replace(_STOP_SEL, '</mark>')
+    )
+
+
+def _fallback_headline(description: str, terms: str) -> SafeString:
+    words = [re.escape(word) for word in terms.split() if word]
+    match = re.search('|'.join(words), description, re.IGNORECASE) if words else None
+    start = max(match.start() - _SNIPPET_LENGTH // 4, 0) if match else 0
+    snippet = description[start:start + _SNIPPET_LENGTH]
+    if words:
+        snippet = re.sub(
+            f"({'|'.join(words)})",
+            lambda m: f'{_START_SEL}{m.group(1)}{_STOP_SEL}',
+            snippet,
+            flags=re.IGNORECASE,
+        )
+    prefix = '... ' if start else ''
+    suffix = ' ...' if start + _SNIPPET_LENGTH < len(description) else ''
+    return _highlight(f'{prefix}{snippet}{suffix}')
+
+
+def search_vacations(terms: str, limit: int = SEARCH_RESULTS_LIMIT) -> List[Vacation]:
+    """
+    The ``limit`` best matches for ``terms``, best first, each with a
+    ``headline`` attribute: an HTML-safe snippet with the matches in <mark>.
+    """
+    terms = terms.strip()
+    if not terms:
+        return []
+
+    vacations = Vacation.objects.select_related('country').defer('search_vector')
+    if not uses_search_vector():
+        results = list(filter_vacations(vacations, terms).order_by('start_date', 'id')[:limit])
+        for vacation in results:
+            vacation.headline = _fallback_headline(vacation.description, terms)
+        return results
+
+    query = search_query(terms)
+    # The headline is only computed for the rows that survive the LIMIT:
+    # PostgreSQL postpones expensive target-list expressions past the sort
+    results = list(
+        filter_vacations(vacations, terms)
+        .annotate(
+            rank=SearchRank(F('search_vector'), query),
+            raw_headline=SearchHeadline(
+                'description', query, config=SEARCH_CONFIG,
+                start_sel=_START_SEL, stop_sel=_STOP_SEL,
+                max_words=35, min_words=15,
+            ),
+        )
+        .order_by('-rank', 'start_date', 'id')[:limit]
+    )
+    for vacation in results:
+        vacation.headline = _highlight(vacation.raw_headline)
+    return results
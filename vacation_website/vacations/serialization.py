@@ -0,0 +1,62 @@
+"""
+JSON encoding for the API.
+
+``dumps()`` uses orjson when it is installed, which is several times faster
+than the standard library for the plain rows the API builds, and falls back
+to ``json`` with DjangoJSONEncoder otherwise. Both produce the same output
+for the types the API emits (dates as ISO strings, decimals as strings).
+Set ``VACATIONS_JSON_BACKEND`` to ``'orjson'``, ``'json'`` or the dotted
+path of a ``dumps(obj) -> bytes`` callable to choose explicitly.
+"""
+import json
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _orjson_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def orjson_dumps(data: Any) -> bytes:
+    return orjson.dumps(data, default=_orjson_default)
+
+
+def stdlib_dumps(data: Any) -> bytes:
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+JSON_BACKENDS = {
+    'orjson': orjson_dumps,
+    'json': stdlib_dumps,
+}
+
+
+@lru_cache(maxsize=None)
+def _load_backend(name) -> Callable[[Any], bytes]:
+    if name is None:
+        return orjson_dumps if orjson is not None else stdlib_dumps
+    if name == 'orjson' and orjson is None:
+        raise ImportError("VACATIONS_JSON_BACKEND is 'orjson' but orjson is not installed")
+    if name in JSON_BACKENDS:
+        return JSON_BACKENDS[name]
+    return import_string(name)
+
+
+def json_backend() -> Callable[[Any], bytes]:
+    return _load_backend(getattr(settings, 'VACATIONS_JSON_BACKEND', None))
+
+
+def dumps(data: Any) -> bytes:
+    return json_backend()(data)
@@ -0,0 +1,90 @@
+from django.db.models import F
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import forget_auth_users, forget_liked_sets, forget_vacation_cards, mark_catalog_deletion
+from .models import Country, Like, Role, User, Vacation
+from .refdata import reference_data_changed
+
+
+@receiver(pre_delete, sender=Vacation)
+def forget_likers_of_deleted_vacation(sender, instance, **kwargs):
+    # The likes cascade away with the vacation, so look up who liked it first
+    user_ids = Like.objects.filter(vacation=instance).values_list('user_id', flat=True)
+    forget_liked_sets(list(user_ids))
+
+
+@receiver(post_delete, sender=Vacation)
+def forget_deleted_vacation_cards(sender, instance, **kwargs):
+    forget_vacation_cards(instance)
+    mark_catalog_deletion()
+
+
+def adjust_vacation_likes(like, delta):
+    Vacation.objects.filter(pk=like.vacation_id).update(
+        likes_count=F('likes_count') + delta,
+        version=F('version') + 1,
+        updated_at=Now()
+    )
+    if Like._meta.get_field('vacation').is_cached(like):
+        like.vacation.refresh_from_db(fields=['likes_count', 'version'])
+
+
+def deleted_with(origin, model):
+    """Whether a delete started from ``model`` instances or a queryset of them"""
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+@receiver(post_save, sender=Like)
+def count_saved_like(sender, instance, created, **kwargs):
+    if created:
+        adjust_vacation_likes(instance, 1)
+
+
+@receiver(post_delete, sender=Like)
+def uncount_deleted_like(sender, instance, origin=None, **kwargs):
+    # Queryset deletes (the admin's "delete selected" among them) and cascades
+    # come here too. Likes deleted with their vacation need no counting, and
+    # those deleted with their user are uncounted per user below.
+    if deleted_with(origin, Vacation) or deleted_with(origin, User):
+        return
+    adjust_vacation_likes(instance, -1)
+
+
+@receiver(pre_delete, sender=User)
+def uncount_likes_of_deleted_user(sender, instance, **kwargs):
+    # One UPDATE for all the user's likes instead of one per cascaded like
+    Vacation.objects.filter(likes__user=instance).update(
+        likes_count=F('likes_count') - 1,
+        version=F('version') + 1,
+        updated_at=Now()
+    )
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    forget_liked_sets([instance.pk])
+    forget_auth_users([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def forget_saved_user(sender, instance, created, **kwargs):
+    if not created:
+        forget_auth_users([instance.pk])
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def forget_users_of_role(sender, instance, created=False, **kwargs):
+    # is_admin comes from the cached role; roles practically never change
+    if not created:
+        forget_auth_users(User.objects.filter(role_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+def reload_reference_data(sender, **kwargs):
+    reference_data_changed()
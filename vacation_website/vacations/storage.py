@@ -0,0 +1,93 @@
+"""
+Content-addressed storage for vacation images.
+
+Originals are stored as ``vacation_images/<h[:2]>/<h>.<ext>`` where ``h`` is
+the SHA-256 of the file, computed while the upload is streamed to disk, and
+``ext`` comes from the name it is saved under (see uploads.store_vacation_image).
+Uploading the same photo twice, or attaching it to several vacations, keeps
+a single file, and because a name always refers to the same bytes its URL
+can be cached by browsers forever.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from functools import partial
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_ADDRESSED_PREFIX = 'vacation_images'
+
+# Matches originals and their derivatives (see vacations.images)
+BLOB_NAME_RE = re.compile(
+    rf'^{CONTENT_ADDRESSED_PREFIX}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})(?:_\d+w)?\.\w+$'
+)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that ignores the client's file name and names files by content"""
+
+    incoming_dir = '.incoming'
+
+    def __init__(self, prefix=CONTENT_ADDRESSED_PREFIX, **kwargs):
+        super().__init__(**kwargs)
+        self.prefix = prefix
+
+    def blob_name(self, digest, extension):
+        return f'{self.prefix}/{digest[:2]}/{digest}{extension}'
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save(); identical
+        # content maps to the same name, so there is nothing to de-collide.
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        incoming = self.path(os.path.join(self.prefix, self.incoming_dir))
+        os.makedirs(incoming, exist_ok=True)
+
+        digest = hashlib.sha256()
+        if hasattr(content, 'temporary_file_path'):
+            # Already spooled to disk by the upload handler: hash it in place
+            # and move it, instead of copying it once more
+            with open(content.temporary_file_path(), 'rb') as spooled:
+                for chunk in iter(lambda: spooled.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            staged_path = content.temporary_file_path()
+            # Concurrent uploads of the same file write identical bytes
+            move = partial(file_move_safe, allow_overwrite=True)
+        else:
+            content.seek(0)
+            fd, staged_path = tempfile.mkstemp(dir=incoming)
+            with os.fdopen(fd, 'wb') as staged:
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+                    staged.write(chunk)
+            move = os.replace
+
+        final_name = self.blob_name(digest.hexdigest(), extension)
+        final_path = self.path(final_name)
+        if os.path.exists(final_path):
+            if move is os.replace:
+                os.remove(staged_path)
+            # Referenced again: restart the grace period of gc_vacation_images
+            os.utime(final_path)
+            return final_name
+
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        move(staged_path, final_path)
+        if move is not os.replace:
+            try:
+                # Closing a moved TemporaryUploadedFile would try to delete it
+                content.close()
+            except FileNotFoundError:
+                pass
+        if self.file_permissions_mode is not None:
+            os.chmod(final_path, self.file_permissions_mode)
+        return final_name
+
+
+vacation_image_storage = ContentAddressedStorage()
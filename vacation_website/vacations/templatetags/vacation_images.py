@@ -0,0 +1,19 @@
+from django import template
+from django.conf import settings
+
+from ..images import srcsets
+
+register = template.Library()
+
+
+@register.inclusion_tag('vacations/vacation_picture.html')
+def vacation_picture(vacation, sizes='(min-width: 768px) 33vw, 100vw'):
+    """Card image with WebP and JPEG srcsets when derivatives exist"""
+    sets = srcsets(vacation.image_file, settings.MEDIA_URL)
+    return {
+        'src': f'{settings.MEDIA_URL}{vacation.image_file}',
+        'alt': vacation.country.country_name,
+        'webp_srcset': sets.get('webp'),
+        'jpg_srcset': sets.get('jpg'),
+        'sizes': sizes,
+    }
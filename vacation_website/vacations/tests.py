@@ -1,4 +1,6 @@
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -7,6 +9,10 @@ from .models import Role, Country, Vacation, Like
 
 User = get_user_model()
 
+# For tests that sign in through the login view: a PBKDF2 hash alone would
+# take those requests past SLOW_REQUEST_THRESHOLD_MS
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
 
 class ModelTestCase(TestCase):
     
@@ -63,6 +69,7 @@ class ModelTestCase(TestCase):
         self.assertFalse(self.vacation.is_liked_by_user(self.regular_user))
 
 
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
 class ViewTestCase(TestCase):
     
     def setUp(self):
@@ -225,3 +232,2265 @@ class FormTestCase(TestCase):
         }
         form = VacationForm(data=form_data)
         self.assertFalse(form.is_valid())
+
+
+class VacationFeedQueryTestCase(TestCase):
+    
+    def setUp(self):
+        self.client = Client()
+        
+        self.user_role = Role.objects.create(role_name='user')
+        self.regular_user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.other_user = User.objects.create_user(
+            email='other@test.com',
+            password='testpass123',
+            first_name='Other',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.country = Country.objects.create(country_name='Test Country')
+        self.client.force_login(self.regular_user)
+        cache.clear()
+    
+    def create_vacations(self, count):
+        vacations = []
+        for i in range(count):
+            vacation = Vacation.objects.create(
+                country=self.country,
+                description=f'Feed vacation {i}',
+                start_date=date.today() + timedelta(days=30 + i),
+                end_date=date.today() + timedelta(days=40 + i),
+                price=1000.00,
+                image_file='test.jpg'
+            )
+            Like.objects.create(user=self.other_user, vacation=vacation)
+            vacations.append(vacation)
+        return vacations
+    
+    def count_list_queries(self):
+        from django.test.utils import CaptureQueriesContext
+        
+        from .refdata import reference_data
+        
+        # Measure the cold path, including loading the user's liked set;
+        # roles and countries are loaded once per process
+        cache.clear()
+        reference_data.snapshot()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('vacation_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+    
+    def test_query_count_does_not_grow_with_catalog(self):
+        self.create_vacations(2)
+        small_catalog = self.count_list_queries()
+        
+        self.create_vacations(20)
+        large_catalog = self.count_list_queries()
+        
+        self.assertEqual(small_catalog, large_catalog)
+    
+    def test_feed_annotations(self):
+        liked, not_liked = self.create_vacations(2)
+        Like.objects.create(user=self.regular_user, vacation=liked)
+        
+        response = self.client.get(reverse('vacation_list'))
+        feed = {v.id: v for v in response.context['vacations']}
+        
+        self.assertTrue(feed[liked.id].user_liked)
+        self.assertFalse(feed[not_liked.id].user_liked)
+        self.assertEqual(feed[liked.id].likes_count, 2)
+        self.assertEqual(feed[not_liked.id].likes_count, 1)
+        self.assertEqual(feed[liked.id].country.country_name, 'Test Country')
+
+
+class VacationPaginationTestCase(TestCase):
+    
+    def setUp(self):
+        self.client = Client()
+        
+        self.user_role = Role.objects.create(role_name='user')
+        self.regular_user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.country = Country.objects.create(country_name='Test Country')
+        self.client.force_login(self.regular_user)
+        
+        # Pairs of vacations share a start date so the id tie-breaker matters
+        for i in range(7):
+            Vacation.objects.create(
+                country=self.country,
+                description=f'Paged vacation {i}',
+                start_date=date.today() + timedelta(days=30 + i // 2),
+                end_date=date.today() + timedelta(days=40 + i // 2),
+                price=1000.00,
+                image_file='test.jpg'
+            )
+    
+    def test_keyset_pages_cover_catalog_in_order(self):
+        from .pagination import paginate_keyset
+        
+        expected = list(Vacation.objects.order_by('start_date', 'id').values_list('id', flat=True))
+        seen = []
+        cursor = None
+        while True:
+            page = paginate_keyset(Vacation.objects.all(), ('start_date', 'id'), 3, after=cursor)
+            seen.extend(vacation.id for vacation in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        
+        self.assertEqual(seen, expected)
+    
+    def test_page_endpoint(self):
+        from unittest import mock
+        from . import views
+        
+        with mock.patch.object(views, 'VACATION_PAGE_SIZE', 3):
+            response = self.client.get(reverse('vacation_list'))
+            cursor = response.context['next_cursor']
+            self.assertIsNotNone(cursor)
+            
+            response = self.client.get(reverse('vacation_page'), {'after': cursor})
+        
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['html'].count('vacation-card'), 3)
+        self.assertIsNotNone(data['next_cursor'])
+    
+    def test_page_endpoint_rejects_bad_cursor(self):
+        response = self.client.get(reverse('vacation_page'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class LikeCounterTestCase(TestCase):
+    
+    def setUp(self):
+        self.client = Client()
+        
+        self.user_role = Role.objects.create(role_name='user')
+        self.regular_user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.country = Country.objects.create(country_name='Test Country')
+        self.vacation = Vacation.objects.create(
+            country=self.country,
+            description='Counted vacation',
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=40),
+            price=1000.00,
+            image_file='test.jpg'
+        )
+        self.client.force_login(self.regular_user)
+    
+    def test_toggle_like_maintains_counter(self):
+        response = self.client.post(reverse('toggle_like', args=[self.vacation.id]))
+        self.assertEqual(response.json()['like_count'], 1)
+        self.vacation.refresh_from_db()
+        self.assertEqual(self.vacation.likes_count, 1)
+        
+        response = self.client.post(reverse('toggle_like', args=[self.vacation.id]))
+        self.assertEqual(response.json()['like_count'], 0)
+        self.vacation.refresh_from_db()
+        self.assertEqual(self.vacation.likes_count, 0)
+    
+    def test_saving_vacation_does_not_overwrite_counter(self):
+        stale = Vacation.objects.get(pk=self.vacation.pk)
+        Like.objects.create(user=self.regular_user, vacation=self.vacation)
+        
+        stale.description = 'Edited description'
+        stale.save()
+        
+        self.vacation.refresh_from_db()
+        self.assertEqual(self.vacation.likes_count, 1)
+    
+    def test_reconcile_like_counts_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        
+        Like.objects.create(user=self.regular_user, vacation=self.vacation)
+        Vacation.objects.filter(pk=self.vacation.pk).update(likes_count=42)
+        
+        out = StringIO()
+        call_command('reconcile_like_counts', stdout=out)
+        
+        self.vacation.refresh_from_db()
+        self.assertEqual(self.vacation.likes_count, 1)
+        self.assertIn('1 vacation', out.getvalue())
+    
+    def test_deleting_user_uncounts_their_likes(self):
+        other = User.objects.create_user(
+            email='other@test.com',
+            password='testpass123',
+            first_name='Other',
+            last_name='Test',
+            role=self.user_role
+        )
+        Like.objects.create(user=self.regular_user, vacation=self.vacation)
+        Like.objects.create(user=other, vacation=self.vacation)
+        
+        self.regular_user.delete()
+        
+        self.vacation.refresh_from_db()
+        self.assertEqual(self.vacation.likes_count, 1)
+        self.assertEqual(Vacation.objects.reconcile_like_counts(), 0)
+    
+    def test_queryset_delete_uncounts_likes(self):
+        other = User.objects.create_user(
+            email='other@test.com',
+            password='testpass123',
+            first_name='Other',
+            last_name='Test',
+            role=self.user_role
+        )
+        Like.objects.create(user=self.regular_user, vacation=self.vacation)
+        Like.objects.create(user=other, vacation=self.vacation)
+        self.vacation.refresh_from_db()
+        version = self.vacation.version
+        
+        # As the admin's "delete selected" action does
+        Like.objects.filter(vacation=self.vacation).delete()
+        
+        self.vacation.refresh_from_db()
+        self.assertEqual(self.vacation.likes_count, 0)
+        self.assertGreater(self.vacation.version, version)
+        self.assertEqual(Vacation.objects.reconcile_like_counts(), 0)
+    
+    def test_deleting_like_twice_uncounts_it_once(self):
+        Like.objects.create(user=self.regular_user, vacation=self.vacation)
+        like = Like.objects.get()
+        stale = Like.objects.get()
+        
+        like.delete()
+        self.assertEqual(stale.delete(), (0, {}))
+        
+        self.vacation.refresh_from_db()
+        self.assertEqual(self.vacation.likes_count, 0)
+
+
+class IdempotentLikeTestCase(TestCase):
+    
+    def setUp(self):
+        self.client = Client()
+        
+        self.user_role = Role.objects.create(role_name='user')
+        self.regular_user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.country = Country.objects.create(country_name='Test Country')
+        self.vacation = Vacation.objects.create(
+            country=self.country,
+            description='Idempotent vacation',
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=40),
+            price=1000.00,
+            image_file='test.jpg'
+        )
+        self.client.force_login(self.regular_user)
+    
+    def test_put_and_delete_are_idempotent(self):
+        url = reverse('toggle_like', args=[self.vacation.id])
+        
+        for _ in range(2):
+            response = self.client.put(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {'success': True, 'liked': True, 'like_count': 1})
+        
+        for _ in range(2):
+            response = self.client.delete(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {'success': True, 'liked': False, 'like_count': 0})
+        
+        self.assertFalse(Like.objects.filter(vacation=self.vacation).exists())
+    
+    def test_missing_vacation(self):
+        response = self.client.put(reverse('toggle_like', args=[self.vacation.id + 1000]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ConcurrentLikeStressTestCase(TransactionTestCase):
+    """Hammers one vacation from a thread pool; needs a real PostgreSQL server"""
+    
+    THREADS = 8
+    OPERATIONS_PER_THREAD = 50
+    
+    def setUp(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Concurrent like stress test requires PostgreSQL')
+        
+        user_role = Role.objects.create(role_name='user')
+        self.users = [
+            User.objects.create(
+                email=f'stress{i}@test.com',
+                first_name='Stress',
+                last_name=str(i),
+                role=user_role
+            )
+            for i in range(self.THREADS)
+        ]
+        country = Country.objects.create(country_name='Stress Country')
+        self.vacation = Vacation.objects.create(
+            country=country,
+            description='Hot vacation',
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=40),
+            price=1000.00,
+            image_file='test.jpg'
+        )
+    
+    def hammer(self, user):
+        from .likes import add_like, remove_like
+        
+        try:
+            for i in range(self.OPERATIONS_PER_THREAD):
+                # Every user races the others and retries its own request
+                operation = add_like if i % 3 else remove_like
+                operation(user.id, self.vacation.id)
+        finally:
+            connection.close()
+    
+    def test_concurrent_toggles_stay_consistent(self):
+        from concurrent.futures import ThreadPoolExecutor
+        
+        # Throughput is measured by benchmarks.like_contention
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            list(pool.map(self.hammer, self.users))
+        
+        self.vacation.refresh_from_db()
+        actual_likes = Like.objects.filter(vacation=self.vacation).count()
+        self.assertEqual(self.vacation.likes_count, actual_likes)
+
+
+class LikedSetCacheTestCase(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        
+        self.user_role = Role.objects.create(role_name='user')
+        self.regular_user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.country = Country.objects.create(country_name='Test Country')
+        self.vacation = Vacation.objects.create(
+            country=self.country,
+            description='Cached vacation',
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=40),
+            price=1000.00,
+            image_file='test.jpg'
+        )
+        self.client.force_login(self.regular_user)
+    
+    def test_liked_set_is_built_once(self):
+        from .cache import liked_vacation_ids
+        
+        Like.objects.create(user=self.regular_user, vacation=self.vacation)
+        self.assertEqual(liked_vacation_ids(self.regular_user), {self.vacation.id})
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(liked_vacation_ids(self.regular_user), {self.vacation.id})
+    
+    def test_like_views_write_through(self):
+        from .cache import get_liked_entry, liked_vacation_ids
+        
+        version, liked_ids = get_liked_entry(self.regular_user.id)
+        self.assertEqual(liked_ids, frozenset())
+        
+        self.client.post(reverse('toggle_like', args=[self.vacation.id]))
+        with self.assertNumQueries(0):
+            self.assertEqual(liked_vacation_ids(self.regular_user), {self.vacation.id})
+        
+        self.client.delete(reverse('toggle_like', args=[self.vacation.id]))
+        new_version, liked_ids = get_liked_entry(self.regular_user.id)
+        self.assertEqual(liked_ids, frozenset())
+        self.assertGreater(new_version, version)
+    
+    def test_deleting_vacation_invalidates_liked_sets(self):
+        from .cache import liked_set_key, liked_vacation_ids
+        
+        Like.objects.create(user=self.regular_user, vacation=self.vacation)
+        liked_vacation_ids(self.regular_user)
+        
+        self.vacation.delete()
+        
+        self.assertIsNone(cache.get(liked_set_key(self.regular_user.id)))
+        self.assertEqual(liked_vacation_ids(self.regular_user), frozenset())
+    
+    def test_several_workers_need_a_shared_cache(self):
+        import os
+        import subprocess
+        import sys
+        from django.conf import settings
+        
+        def start(**environ):
+            return subprocess.run(
+                [sys.executable, '-c', 'import vacation_project.settings'],
+                env={**os.environ, **environ}, cwd=settings.BASE_DIR, capture_output=True, text=True
+            )
+        
+        # A like written through in one worker's own cache never reaches the others
+        started = start(WEB_CONCURRENCY='2', CACHE_BACKEND='django.core.cache.backends.locmem.LocMemCache')
+        self.assertNotEqual(started.returncode, 0)
+        self.assertIn('ImproperlyConfigured', started.stderr)
+        
+        started = start(WEB_CONCURRENCY='2', CACHE_BACKEND='django.core.cache.backends.redis.RedisCache')
+        self.assertEqual(started.returncode, 0, started.stderr)
+
+
+class VacationCardFragmentCacheTestCase(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        
+        self.user_role = Role.objects.create(role_name='user')
+        self.regular_user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.country = Country.objects.create(country_name='Test Country')
+        self.vacation = Vacation.objects.create(
+            country=self.country,
+            description='Original description',
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=40),
+            price=1000.00,
+            image_file='test.jpg'
+        )
+        self.client.force_login(self.regular_user)
+    
+    def fragment_key(self, vacation):
+        from django.core.cache.utils import make_template_fragment_key
+        return make_template_fragment_key('vacation_card', [vacation.id, vacation.version])
+    
+    def test_card_is_cached_per_version(self):
+        self.client.get(reverse('vacation_list'))
+        self.assertIsNotNone(cache.get(self.fragment_key(self.vacation)))
+        
+        old_version = self.vacation.version
+        self.vacation.description = 'Edited description'
+        self.vacation.save()
+        self.assertEqual(self.vacation.version, old_version + 1)
+        
+        response = self.client.get(reverse('vacation_list'))
+        self.assertContains(response, 'Edited description')
+    
+    def test_like_bumps_version_but_heart_is_per_user(self):
+        old_version = self.vacation.version
+        self.client.get(reverse('vacation_list'))
+        
+        self.client.put(reverse('toggle_like', args=[self.vacation.id]))
+        self.vacation.refresh_from_db()
+        self.assertEqual(self.vacation.version, old_version + 1)
+        
+        response = self.client.get(reverse('vacation_list'))
+        self.assertContains(response, 'btn-danger')
+    
+    def test_deleting_vacation_drops_fragment(self):
+        self.client.get(reverse('vacation_list'))
+        key = self.fragment_key(self.vacation)
+        self.assertIsNotNone(cache.get(key))
+        
+        self.vacation.delete()
+        self.assertIsNone(cache.get(key))
+
+
+class VacationListConditionalGetTestCase(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        
+        self.user_role = Role.objects.create(role_name='user')
+        self.regular_user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.country = Country.objects.create(country_name='Test Country')
+        self.vacation = Vacation.objects.create(
+            country=self.country,
+            description='Conditional vacation',
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=40),
+            price=1000.00,
+            image_file='test.jpg'
+        )
+        self.client.force_login(self.regular_user)
+    
+    def get_etag(self):
+        response = self.client.get(reverse('vacation_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+        return response['ETag']
+    
+    def test_unchanged_list_returns_304_without_rendering(self):
+        etag = self.get_etag()
+        
+        with self.assertTemplateNotUsed('vacations/vacation_list.html'):
+            response = self.client.get(reverse('vacation_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+    
+    def test_like_changes_etag(self):
+        etag = self.get_etag()
+        
+        self.client.put(reverse('toggle_like', args=[self.vacation.id]))
+        
+        response = self.client.get(reverse('vacation_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_deleting_vacation_changes_etag(self):
+        etag = self.get_etag()
+        
+        self.vacation.delete()
+        
+        response = self.client.get(reverse('vacation_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class ImageDerivativeTestCase(TestCase):
+    
+    def setUp(self):
+        import tempfile
+        
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        media_override = self.settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        
+        self.admin_role = Role.objects.create(role_name='admin')
+        self.admin_user = User.objects.create_user(
+            email='admin@test.com',
+            password='testpass123',
+            first_name='Admin',
+            last_name='Test',
+            role=self.admin_role
+        )
+        self.country = Country.objects.create(country_name='Test Country')
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.media_root, ignore_errors=True)
+    
+    def make_jpeg(self, width=1200, height=800):
+        import io
+        from PIL import Image
+        
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), (200, 120, 40)).save(buffer, 'JPEG')
+        return buffer.getvalue()
+    
+    def test_generate_derivatives(self):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from .images import derivative_name, generate_derivatives
+        
+        name = default_storage.save('vacation_images/beach.jpg', ContentFile(self.make_jpeg()))
+        
+        self.assertEqual(generate_derivatives(name), (320, 640, 960))
+        for width in (320, 640, 960):
+            for extension in ('jpg', 'webp'):
+                self.assertTrue(default_storage.exists(derivative_name(name, width, extension)))
+    
+    def test_upload_renders_srcset(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.post(reverse('add_vacation'), {
+            'country': self.country.id,
+            'description': 'Uploaded vacation',
+            'start_date': date.today() + timedelta(days=30),
+            'end_date': date.today() + timedelta(days=40),
+            'price': 1000.00,
+            'image': SimpleUploadedFile('beach.jpg', self.make_jpeg(), content_type='image/jpeg'),
+        })
+        self.assertEqual(response.status_code, 302)
+        
+        vacation = Vacation.objects.get(description='Uploaded vacation')
+        self.assertTrue(vacation.image_file.startswith('vacation_images/'))
+        
+        response = self.client.get(reverse('vacation_list'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '_960w.jpg 960w')
+    
+    def test_backfill_command(self):
+        from io import StringIO
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from django.core.management import call_command
+        from .images import derivative_name
+        
+        name = default_storage.save('vacation_images/old.jpg', ContentFile(self.make_jpeg(700, 400)))
+        Vacation.objects.create(
+            country=self.country,
+            description='Existing vacation',
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=40),
+            price=1000.00,
+            image_file=name
+        )
+        
+        out = StringIO()
+        call_command('generate_image_derivatives', workers=1, stdout=out)
+        
+        self.assertIn('320w, 640w', out.getvalue())
+        self.assertTrue(default_storage.exists(derivative_name(name, 640, 'webp')))
+        self.assertFalse(default_storage.exists(derivative_name(name, 960, 'webp')))
+
+
+class ImageUploadValidationTestCase(TestCase):
+    
+    def setUp(self):
+        self.country = Country.objects.create(country_name='Test Country')
+    
+    def make_upload(self, width=100, height=100, image_format='JPEG'):
+        import io
+        from PIL import Image
+        
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height)).save(buffer, image_format)
+        return SimpleUploadedFile('upload.img', buffer.getvalue())
+    
+    def form(self, image):
+        from .forms import VacationForm
+        
+        return VacationForm(data={
+            'country': self.country.id,
+            'description': 'Upload validation',
+            'start_date': date.today() + timedelta(days=30),
+            'end_date': date.today() + timedelta(days=40),
+            'price': 1000.00
+        }, files={'image': image})
+    
+    def test_valid_image(self):
+        self.assertTrue(self.form(self.make_upload()).is_valid())
+    
+    def test_rejects_oversized_upload(self):
+        with self.settings(VACATION_IMAGE_MAX_UPLOAD_SIZE=100):
+            form = self.form(self.make_upload())
+            self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+    
+    def test_rejects_too_many_pixels_from_header(self):
+        with self.settings(VACATION_IMAGE_MAX_PIXELS=50 * 50):
+            form = self.form(self.make_upload(100, 100))
+            self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+    
+    def test_rejects_non_image(self):
+        form = self.form(SimpleUploadedFile('notes.jpg', b'not an image at all'))
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+    
+    def test_rejects_full_decode_formats_at_lower_pixel_count(self):
+        with self.settings(VACATION_IMAGE_MAX_FULL_DECODE_PIXELS=50 * 50):
+            self.assertTrue(self.form(self.make_upload(100, 100)).is_valid())
+            form = self.form(self.make_upload(100, 100, 'PNG'))
+            self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+    
+    def test_upload_past_size_limit_is_not_stored(self):
+        from django.core.files.uploadhandler import TemporaryFileUploadHandler
+        from django.test import RequestFactory
+        from .uploads import OversizedUpload, UploadSizeLimitHandler
+        
+        data = b'x' * 300_000
+        request = RequestFactory().post('/add/', {'image': SimpleUploadedFile('big.jpg', data)})
+        request.upload_handlers = [UploadSizeLimitHandler(request), TemporaryFileUploadHandler(request)]
+        stored = request.upload_handlers[1]
+        with self.settings(VACATION_IMAGE_MAX_UPLOAD_SIZE=100_000):
+            upload = request.FILES['image']
+            form = self.form(upload)
+            self.assertFalse(form.is_valid())
+        
+        self.assertIsInstance(upload, OversizedUpload)
+        self.assertEqual(upload.size, len(data))
+        self.assertTrue(stored.file.closed)
+        self.assertIn('too large', form.errors['image'][0])
+
+
+class ContentAddressedStorageTestCase(TestCase):
+    
+    def setUp(self):
+        import tempfile
+        
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        media_override = self.settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.country = Country.objects.create(country_name='Test Country')
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.media_root, ignore_errors=True)
+    
+    def make_upload(self, name='beach.jpg', color=(200, 120, 40)):
+        import io
+        from PIL import Image
+        
+        buffer = io.BytesIO()
+        Image.new('RGB', (700, 400), color).save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+    
+    def test_duplicate_uploads_share_one_file(self):
+        import hashlib
+        import os
+        from .uploads import store_vacation_image
+        
+        upload = self.make_upload('beach.jpg')
+        digest = hashlib.sha256(upload.read()).hexdigest()
+        
+        first = store_vacation_image(upload)
+        second = store_vacation_image(self.make_upload('BEACH copy.JPG'))
+        
+        self.assertEqual(first, f'vacation_images/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(second, first)
+        originals = [
+            name for name in os.listdir(os.path.join(self.media_root, 'vacation_images', digest[:2]))
+            if not name.endswith(('w.jpg', 'w.webp'))
+        ]
+        self.assertEqual(originals, [f'{digest}.jpg'])
+    
+    def test_temporary_upload_is_moved(self):
+        import os
+        from django.core.files.uploadedfile import TemporaryUploadedFile
+        from .storage import vacation_image_storage
+        
+        content = self.make_upload().read()
+        upload = TemporaryUploadedFile('big.jpg', 'image/jpeg', len(content), None)
+        upload.write(content)
+        upload.seek(0)
+        spooled_path = upload.temporary_file_path()
+        
+        name = vacation_image_storage.save(upload.name, upload)
+        
+        self.assertFalse(os.path.exists(spooled_path))
+        with vacation_image_storage.open(name, 'rb') as stored:
+            self.assertEqual(stored.read(), content)
+    
+    def test_hashed_media_is_immutable(self):
+        from django.test import RequestFactory
+        from .uploads import store_vacation_image
+        from .views import serve_media
+        
+        name = store_vacation_image(self.make_upload())
+        request = RequestFactory().get(f'/media/{name}')
+        
+        response = serve_media(request, name, document_root=self.media_root)
+        
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+    
+    def test_gc_removes_unreferenced_blobs(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .images import derivative_name
+        from .storage import vacation_image_storage
+        from .uploads import store_vacation_image
+        
+        kept = store_vacation_image(self.make_upload(color=(10, 20, 30)))
+        orphan = store_vacation_image(self.make_upload(color=(90, 80, 70)))
+        Vacation.objects.create(
+            country=self.country,
+            description='Referenced image',
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=40),
+            price=1000.00,
+            image_file=kept
+        )
+        
+        call_command('gc_vacation_images', stdout=StringIO())
+        self.assertTrue(vacation_image_storage.exists(orphan))
+        
+        call_command('gc_vacation_images', min_age=0, stdout=StringIO())
+        
+        self.assertTrue(vacation_image_storage.exists(kept))
+        self.assertTrue(vacation_image_storage.exists(derivative_name(kept, 320, 'webp')))
+        self.assertFalse(vacation_image_storage.exists(orphan))
+        self.assertFalse(vacation_image_storage.exists(derivative_name(orphan, 320, 'webp')))
+    
+    def test_reupload_renews_grace_period_of_orphan(self):
+        import os
+        from io import StringIO
+        from django.core.management import call_command
+        from .images import derivative_name
+        from .storage import vacation_image_storage
+        from .uploads import store_vacation_image
+        
+        orphan = store_vacation_image(self.make_upload())
+        for name in (orphan, derivative_name(orphan, 320, 'webp')):
+            os.utime(vacation_image_storage.path(name), (0, 0))
+        
+        self.assertEqual(store_vacation_image(self.make_upload()), orphan)
+        call_command('gc_vacation_images', min_age=60, stdout=StringIO())
+        
+        self.assertTrue(vacation_image_storage.exists(orphan))
+        self.assertTrue(vacation_image_storage.exists(derivative_name(orphan, 320, 'webp')))
+    
+    def test_extension_comes_from_image_format(self):
+        from .uploads import store_vacation_image
+        
+        first = store_vacation_image(self.make_upload('beach.jpeg'))
+        
+        self.assertTrue(first.endswith('.jpg'))
+        self.assertEqual(store_vacation_image(self.make_upload('beach.png')), first)
+
+
+class VacationSearchTestCase(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.user_role = Role.objects.create(role_name='user')
+        self.admin_role = Role.objects.create(role_name='admin')
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='Regular',
+            last_name='User',
+            role=self.user_role
+        )
+        self.italy = Country.objects.create(country_name='Italy')
+        self.japan = Country.objects.create(country_name='Japan')
+        self.rome = self.create_vacation(self.italy, 'Ancient ruins and <b>gelato</b> in the eternal city')
+        self.kyoto = self.create_vacation(self.japan, 'Temples, gardens and tea ceremonies')
+        self.client.force_login(self.user)
+    
+    def create_vacation(self, country, description):
+        return Vacation.objects.create(
+            country=country,
+            description=description,
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=40),
+            price=1000.00,
+            image_file='test.jpg'
+        )
+    
+    def search(self, query):
+        return self.client.get(reverse('search'), {'q': query})
+    
+    def test_matches_description_and_country(self):
+        response = self.search('temples')
+        self.assertEqual(list(response.context['vacations']), [self.kyoto])
+        
+        response = self.search('italy')
+        self.assertEqual(list(response.context['vacations']), [self.rome])
+    
+    def test_snippet_is_highlighted_and_escaped(self):
+        response = self.search('ruins')
+        
+        self.assertContains(response, '<mark>ruins</mark>', html=False)
+        self.assertContains(response, 'gelato')
+        self.assertNotContains(response, '<b>gelato</b>', html=False)
+    
+    def test_empty_query(self):
+        response = self.search('')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['vacations']), [])
+    
+    def test_admin_search(self):
+        admin = User.objects.create_superuser(
+            email='staff@test.com',
+            password='testpass123',
+            first_name='Staff',
+            last_name='User',
+            role=self.admin_role
+        )
+        self.client.force_login(admin)
+        
+        response = self.client.get(reverse('admin:vacations_vacation_changelist'), {'q': 'gardens'})
+        
+        self.assertEqual(list(response.context['cl'].result_list), [self.kyoto])
+    
+    def test_vector_follows_country_rename(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('search vector triggers are PostgreSQL only')
+        
+        self.japan.country_name = 'Nippon'
+        self.japan.save()
+        
+        response = self.search('nippon')
+        self.assertEqual(list(response.context['vacations']), [self.kyoto])
+    
+    def test_search_uses_gin_index(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('GIN index is PostgreSQL only')
+        from .search import filter_vacations
+        
+        with connection.cursor() as cursor:
+            # The table is tiny; make the planner show what it does at scale.
+            # GIN is only read through bitmap scans, and a plain index scan of
+            # the feed order's index would otherwise win on some statistics
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_indexscan = off')
+        plan = filter_vacations(Vacation.objects.all(), 'temples').explain()
+        
+        self.assertIn('vacations_search_vector_idx', plan)
+
+
+class VacationCatalogFilterTestCase(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.user_role = Role.objects.create(role_name='user')
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='Regular',
+            last_name='User',
+            role=self.user_role
+        )
+        self.italy = Country.objects.create(country_name='Italy')
+        self.japan = Country.objects.create(country_name='Japan')
+        self.cheap = self.create_vacation(self.italy, 30, 500, likes=1)
+        self.mid = self.create_vacation(self.japan, 60, 2500, likes=3)
+        self.pricey = self.create_vacation(self.italy, 90, 8000, likes=2)
+        self.client.force_login(self.user)
+    
+    def create_vacation(self, country, days_ahead, price, likes):
+        vacation = Vacation.objects.create(
+            country=country,
+            description=f'{country} for {price}',
+            start_date=date.today() + timedelta(days=days_ahead),
+            end_date=date.today() + timedelta(days=days_ahead + 7),
+            price=price,
+            image_file='test.jpg'
+        )
+        Vacation.objects.filter(pk=vacation.pk).update(likes_count=likes)
+        return vacation
+    
+    def listed(self, **params):
+        response = self.client.get(reverse('vacation_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [vacation.id for vacation in response.context['vacations']]
+    
+    def test_filters(self):
+        self.assertEqual(self.listed(country=self.italy.id), [self.cheap.id, self.pricey.id])
+        self.assertEqual(self.listed(min_price=1000, max_price=3000), [self.mid.id])
+        self.assertEqual(
+            self.listed(
+                start_from=date.today() + timedelta(days=50),
+                end_by=date.today() + timedelta(days=80),
+            ),
+            [self.mid.id]
+        )
+    
+    def test_sorts(self):
+        self.assertEqual(self.listed(sort='price'), [self.cheap.id, self.mid.id, self.pricey.id])
+        self.assertEqual(self.listed(sort='-price'), [self.pricey.id, self.mid.id, self.cheap.id])
+        self.assertEqual(self.listed(sort='popular'), [self.mid.id, self.pricey.id, self.cheap.id])
+    
+    def test_invalid_parameters_are_ignored(self):
+        self.assertEqual(
+            self.listed(country='nope', min_price='cheap', sort='random'),
+            [self.cheap.id, self.mid.id, self.pricey.id]
+        )
+    
+    def test_next_page_keeps_sort_order(self):
+        from .pagination import encode_cursor
+        
+        cursor = encode_cursor([3, self.mid.id])
+        response = self.client.get(reverse('vacation_page'), {'sort': 'popular', 'after': cursor})
+        
+        self.assertEqual(response.status_code, 200)
+        html = response.json()['html']
+        self.assertIn(f'data-vacation-id="{self.pricey.id}"', html)
+        self.assertIn(f'data-vacation-id="{self.cheap.id}"', html)
+        self.assertNotIn(f'data-vacation-id="{self.mid.id}"', html)
+
+
+class VacationCatalogIndexTestCase(TestCase):
+    """Every filter/sort combination must be answered from an index on a large table"""
+    
+    # ANALYZE samples 30000 rows, so at this size the statistics, and with
+    # them the plans, are the same on every run
+    ROWS = 30000
+    
+    @classmethod
+    def setUpTestData(cls):
+        if connection.vendor != 'postgresql':
+            return
+        import random
+        
+        rng = random.Random(12)
+        countries = Country.objects.bulk_create(
+            Country(country_name=f'Country {i}') for i in range(50)
+        )
+        first_day = date.today() + timedelta(days=1)
+        vacations = []
+        for _ in range(cls.ROWS):
+            start = first_day + timedelta(days=rng.randrange(3 * 365))
+            vacations.append(Vacation(
+                country=rng.choice(countries),
+                description='Seeded vacation',
+                start_date=start,
+                end_date=start + timedelta(days=rng.randrange(3, 22)),
+                price=rng.randrange(0, 1000000) / 100,
+                image_file='test.jpg',
+                likes_count=rng.randrange(1000),
+            ))
+        Vacation.objects.bulk_create(vacations, batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Vacation._meta.db_table}, {Country._meta.db_table}')
+        cls.country = countries[0]
+    
+    def setUp(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('query plans are only checked on PostgreSQL')
+    
+    def test_no_sequential_scans(self):
+        from itertools import combinations
+        from django.http import QueryDict
+        from .forms import VacationFilterForm
+        from .pagination import keyset_filter
+        from .views import VACATION_PAGE_SIZE, VACATION_SORTS
+        
+        window_start = date.today() + timedelta(days=200)
+        filters = {
+            'country': {'country': self.country.id},
+            'price': {'min_price': 2000, 'max_price': 3000},
+            'dates': {'start_from': window_start, 'end_by': window_start + timedelta(days=90)},
+        }
+        # A cursor half way through the catalog, as a later page would use
+        cursor_row = Vacation.objects.order_by('id')[self.ROWS // 2]
+        
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                for sort, keys in VACATION_SORTS.items():
+                    params = QueryDict(mutable=True)
+                    for name in names:
+                        params.update(filters[name])
+                    params['sort'] = sort
+                    filter_form = VacationFilterForm(params)
+                    filter_form.is_valid()
+                    queryset = filter_form.filter(Vacation.objects.for_feed()).order_by(*keys)
+                    cursor_values = [getattr(cursor_row, key.lstrip('-')) for key in keys]
+                    
+                    for page in (queryset, queryset.filter(keyset_filter(keys, cursor_values))):
+                        with self.subTest(filters=names, sort=sort):
+                            plan = page[:VACATION_PAGE_SIZE + 1].explain()
+                            self.assertNotIn(f'Seq Scan on {Vacation._meta.db_table}', plan)
+
+
+class VacationApiTestCase(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.user_role = Role.objects.create(role_name='user')
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='Regular',
+            last_name='User',
+            role=self.user_role
+        )
+        self.country = Country.objects.create(country_name='Test Country')
+        self.vacations = [
+            Vacation.objects.create(
+                country=self.country,
+                description=f'API vacation {i}',
+                start_date=date.today() + timedelta(days=30 + i),
+                end_date=date.today() + timedelta(days=40 + i),
+                price=1000 + i,
+                image_file='vacation_images/test.jpg'
+            )
+            for i in range(5)
+        ]
+        Like.objects.create(user=self.user, vacation=self.vacations[0])
+        self.client.force_login(self.user)
+    
+    def test_list(self):
+        response = self.client.get(reverse('api_vacation_list'))
+        
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertIsNone(data['next_cursor'])
+        first = data['results'][0]
+        self.assertEqual(first, {
+            'id': self.vacations[0].id,
+            'country': 'Test Country',
+            'description': 'API vacation 0',
+            'start_date': str(self.vacations[0].start_date),
+            'end_date': str(self.vacations[0].end_date),
+            'price': '1000.00',
+            'likes_count': 1,
+            'image_url': '/media/vacation_images/test.jpg',
+            'liked': True,
+        })
+        self.assertFalse(data['results'][1]['liked'])
+    
+    def test_sparse_fieldsets_select_only_requested_columns(self):
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api_vacation_list'), {'fields': 'id,price'})
+        
+        self.assertEqual(response.json()['results'][0], {'id': self.vacations[0].id, 'price': '1000.00'})
+        vacation_query = next(q['sql'] for q in queries if 'FROM "vacations"' in q['sql'])
+        self.assertNotIn('description', vacation_query)
+    
+    def test_unknown_field(self):
+        response = self.client.get(reverse('api_vacation_list'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+    
+    def test_cursor_pagination(self):
+        seen = []
+        params = {'limit': 2, 'sort': '-price', 'fields': 'id'}
+        while True:
+            data = self.client.get(reverse('api_vacation_list'), params).json()
+            seen.extend(row['id'] for row in data['results'])
+            if not data['next_cursor']:
+                break
+            params['after'] = data['next_cursor']
+        
+        self.assertEqual(seen, [vacation.id for vacation in reversed(self.vacations)])
+    
+    def test_detail(self):
+        vacation = self.vacations[2]
+        response = self.client.get(reverse('api_vacation_detail', args=[vacation.id]), {'fields': 'id,country'})
+        self.assertEqual(response.json()['vacation'], {'id': vacation.id, 'country': 'Test Country'})
+        
+        response = self.client.get(reverse('api_vacation_detail', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+    
+    def test_json_backends_agree(self):
+        from decimal import Decimal
+        from .serialization import orjson, orjson_dumps, stdlib_dumps
+        
+        if orjson is None:
+            self.skipTest('orjson is not installed')
+        row = {'id': 1, 'price': Decimal('12.50'), 'start_date': date(2030, 1, 2), 'liked': False}
+        self.assertEqual(orjson_dumps(row), stdlib_dumps(row))
+
+
+class ImportVacationsTestCase(TestCase):
+    
+    def setUp(self):
+        import tempfile
+        
+        self.workdir = tempfile.mkdtemp()
+        self.italy = Country.objects.create(country_name='Italy')
+        self.start = date.today() + timedelta(days=30)
+        self.end = self.start + timedelta(days=7)
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.workdir, ignore_errors=True)
+    
+    def run_import(self, filename, content, **options):
+        import os
+        from io import StringIO
+        from django.core.management import call_command
+        
+        path = os.path.join(self.workdir, filename)
+        with open(path, 'w', newline='') as f:
+            f.write(content)
+        call_command('import_vacations', path, stdout=StringIO(), **options)
+        return path
+    
+    def read_rejects(self, path):
+        import os
+        
+        stem, extension = os.path.splitext(path)
+        with open(f'{stem}.rejects{extension}') as f:
+            return f.read()
+    
+    def test_csv_import_with_rejects(self):
+        path = self.run_import('vacations.csv', '\n'.join([
+            'country,description,start_date,end_date,price,image_file',
+            f'italy,"Rome, with ""quotes""",{self.start},{self.end},1500.50,vacation_images/rome.jpg',
+            f'Italy,Venice,{self.start},{self.end},900,',
+            f'Italy,Backwards,{self.end},{self.start},900,',
+            f'Italy,Too expensive,{self.start},{self.end},20000,',
+            f'Atlantis,Sunken city,{self.start},{self.end},100,',
+        ]) + '\n')
+        
+        rome = Vacation.objects.get(description='Rome, with "quotes"')
+        self.assertEqual(rome.country, self.italy)
+        self.assertEqual(str(rome.price), '1500.50')
+        self.assertEqual(rome.image_file, 'vacation_images/rome.jpg')
+        self.assertEqual(rome.likes_count, 0)
+        self.assertEqual(Vacation.objects.get(description='Venice').image_file, 'images/vacation_images/default.jpg')
+        self.assertEqual(Vacation.objects.count(), 2)
+        
+        rejects = self.read_rejects(path)
+        self.assertIn('end_date must be after start_date', rejects)
+        self.assertIn('price must be between 0 and 10000', rejects)
+        self.assertIn("unknown country 'Atlantis'", rejects)
+    
+    def test_jsonl_import_creates_countries(self):
+        import json
+        
+        lines = [
+            json.dumps({'country': 'Peru', 'description': 'Machu Picchu',
+                        'start_date': str(self.start), 'end_date': str(self.end), 'price': 2100}),
+            'not json',
+        ]
+        path = self.run_import('vacations.jsonl', '\n'.join(lines) + '\n', create_countries=True)
+        
+        self.assertEqual(Vacation.objects.get().country.country_name, 'Peru')
+        self.assertIn('"line": 2', self.read_rejects(path))
+    
+    def test_copy_rows_streams_many_rows(self):
+        from django.utils import timezone
+        from .bulk import copy_rows
+        
+        now = timezone.now()
+        rows = (
+            (self.italy.id, f'Row {i}', self.start, self.end, '100.00', 'test.jpg', 0, 1, now)
+            for i in range(2500)
+        )
+        written = copy_rows(Vacation, (
+            'country', 'description', 'start_date', 'end_date', 'price',
+            'image_file', 'likes_count', 'version', 'updated_at',
+        ), rows, batch_size=1000)
+        
+        self.assertEqual(written, 2500)
+        self.assertEqual(Vacation.objects.count(), 2500)
+
+
+class GenerateLoadDataTestCase(TestCase):
+    
+    def generate(self, **options):
+        from io import StringIO
+        from django.core.management import call_command
+        
+        options = {'users': 30, 'vacations': 20, 'likes': 200, 'countries': 3, 'seed': 7, **options}
+        call_command('generate_load_data', stdout=StringIO(), **options)
+        # Popularity of each vacation in the order they were generated
+        return list(Vacation.objects.order_by('id').values_list('likes_count', flat=True))
+    
+    def test_generates_requested_rows(self):
+        counts = self.generate()
+        
+        self.assertEqual(User.objects.filter(email__endswith='@load.test').count(), 30)
+        self.assertEqual(len(counts), 20)
+        self.assertEqual(Like.objects.count(), 200)
+        self.assertEqual(sum(counts), 200)
+        self.assertEqual(Vacation.objects.reconcile_like_counts(), 0)
+        user = User.objects.get(email='user0000000@load.test')
+        self.assertTrue(user.check_password('loadtest123'))
+    
+    def test_popularity_is_skewed(self):
+        counts = sorted(self.generate(users=200, likes=1000), reverse=True)
+        self.assertGreater(counts[0], 4 * counts[-1])
+    
+    def test_same_seed_same_data(self):
+        from django.core.management.base import CommandError
+        
+        first = self.generate()
+        with self.assertRaises(CommandError):
+            self.generate()
+        
+        self.assertEqual(self.generate(replace=True), first)
+        self.assertNotEqual(self.generate(replace=True, seed=8), first)
+    
+    def test_replace_deletes_without_per_row_signals(self):
+        from unittest import mock
+        from django.db.models.signals import post_delete, pre_delete
+        
+        self.generate()
+        vacation = Vacation.objects.create(
+            country=Country.objects.create(country_name='Real Country'),
+            description='Not load data',
+            start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=40),
+            price=1000.00,
+            image_file='test.jpg'
+        )
+        Like.objects.create(user=User.objects.get(email='user0000000@load.test'), vacation=vacation)
+        cache.set('vacations:liked:1:7', 'stale')
+        
+        handler = mock.Mock()
+        for signal in (pre_delete, post_delete):
+            signal.connect(handler)
+            self.addCleanup(signal.disconnect, handler)
+        self.generate(replace=True)
+        
+        handler.assert_not_called()
+        vacation.refresh_from_db()
+        self.assertEqual(vacation.likes_count, 0)
+        self.assertEqual(Vacation.objects.reconcile_like_counts(), 0)
+        self.assertEqual(Vacation.objects.count(), 21)
+        self.assertIsNone(cache.get('vacations:liked:1:7'))
+    
+    def test_images_are_shipped(self):
+        from django.conf import settings
+        from .management.commands.generate_load_data import IMAGES
+        
+        for name in IMAGES:
+            self.assertTrue((settings.BASE_DIR / 'media' / name).is_file(), name)
+
+
+class BootstrapTestCase(TestCase):
+    
+    def call(self, *args, **options):
+        from io import StringIO
+        from django.core.management import call_command
+        
+        out = StringIO()
+        call_command(*args, stdout=out, **options)
+        return out.getvalue()
+    
+    def test_populate_db_runs_once_per_seed_version(self):
+        from .models import SeedVersion
+        
+        self.call('populate_db')
+        self.assertEqual(SeedVersion.objects.get(name='initial_data').version, 1)
+        vacations = Vacation.objects.count()
+        
+        with self.assertNumQueries(1):
+            output = self.call('populate_db')
+        self.assertIn('already loaded', output)
+        self.assertEqual(Vacation.objects.count(), vacations)
+    
+    def test_pending_migrations_detected_without_planner(self):
+        from django.db.migrations.recorder import MigrationRecorder
+        from .management.commands.bootstrap import migrations_on_disk, migrations_pending
+        
+        self.assertIn(('vacations', '0001_initial'), migrations_on_disk())
+        self.assertFalse(migrations_pending(connection))
+        
+        MigrationRecorder(connection).record_unapplied('vacations', '0008_seedversion')
+        self.assertTrue(migrations_pending(connection))
+    
+    def test_bootstrap_reports_phases(self):
+        output = self.call('bootstrap')
+        
+        self.assertIn('migrations', output)
+        self.assertIn('up to date', output)
+        self.assertIn('bootstrap total', output)
+        self.assertTrue(Role.objects.filter(role_name='admin').exists())
+
+
+class RequestTimingMiddlewareTestCase(TestCase):
+    
+    def setUp(self):
+        self.client = Client()
+        self.user_role = Role.objects.create(role_name='user')
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.client.force_login(self.user)
+    
+    def metrics(self, response):
+        return {
+            metric.split(';')[0]: metric
+            for metric in response['Server-Timing'].split(', ')
+        }
+    
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('vacation_list'))
+        
+        metrics = self.metrics(response)
+        self.assertEqual(set(metrics), {'db', 'tpl', 'view', 'total'})
+        self.assertRegex(metrics['db'], r'^db;dur=\d+\.\d;desc="[1-9]\d* queries"$')
+        # The list page is a rendered template
+        self.assertNotEqual(metrics['tpl'], 'tpl;dur=0.0')
+    
+    def test_json_view_has_no_template_time(self):
+        response = self.client.get(reverse('api_vacation_list'))
+        
+        self.assertEqual(self.metrics(response)['tpl'], 'tpl;dur=0.0')
+    
+    def test_header_can_be_disabled(self):
+        from django.test import override_settings
+        
+        with override_settings(SERVER_TIMING_HEADER=False):
+            response = self.client.get(reverse('vacation_list'))
+        self.assertNotIn('Server-Timing', response)
+    
+    def test_slow_requests_logged_with_slowest_statements(self):
+        from django.test import override_settings
+        
+        with override_settings(SLOW_REQUEST_THRESHOLD_MS=0, SLOW_REQUEST_TOP_QUERIES=2):
+            with self.assertLogs('instrumentation.middleware', 'WARNING') as logs:
+                self.client.get(reverse('vacation_list'))
+        
+        lines = logs.records[0].getMessage().splitlines()
+        self.assertTrue(lines[0].startswith('Slow request GET / 200 '))
+        self.assertEqual(len(lines), 3)
+        self.assertIn('SELECT', lines[1])
+        # Statements are logged without their parameters
+        self.assertNotIn('user@test.com', '\n'.join(lines))
+    
+    def test_fast_requests_not_logged(self):
+        from django.test import override_settings
+        
+        with override_settings(SLOW_REQUEST_THRESHOLD_MS=60000):
+            with self.assertNoLogs('instrumentation.middleware', 'WARNING'):
+                self.client.get(reverse('vacation_list'))
+    
+    async def test_async_requests_are_timed(self):
+        from django.test import AsyncClient
+        
+        # The sync view runs on another thread than the async middleware
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('vacation_list'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(self.metrics(response)['db'], r'^db;dur=\d+\.\d;desc="[1-9]\d* queries"$')
+
+
+class MetricsTestCase(TestCase):
+    
+    def setUp(self):
+        self.client = Client()
+        self.user_role = Role.objects.create(role_name='user')
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.client.force_login(self.user)
+        cache.clear()
+    
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+    
+    def test_requests_recorded_by_url_name(self):
+        before = self.scrape()
+        self.client.get(reverse('vacation_list'))
+        self.client.get('/no-such-page/')
+        after = self.scrape()
+        
+        def delta(name):
+            return after.get(name, 0) - before.get(name, 0)
+        
+        self.assertEqual(delta('http_responses_total{view="vacation_list",method="GET",status="200"}'), 1)
+        self.assertEqual(delta('http_responses_total{view="<unresolved>",method="GET",status="404"}'), 1)
+        self.assertEqual(delta('http_request_duration_seconds_count{view="vacation_list",method="GET"}'), 1)
+        self.assertEqual(delta('http_request_duration_seconds_bucket{view="vacation_list",method="GET",le="+Inf"}'), 1)
+        self.assertGreater(delta('db_queries_total{view="vacation_list"}'), 0)
+        # The scrape itself is the only request in flight
+        self.assertEqual(after['http_requests_in_flight'], 1)
+    
+    def test_cache_hits_and_misses(self):
+        before = self.scrape()
+        cache.get('vacations:liked:1:7')
+        cache.set('vacations:liked:1:7', 'x')
+        self.assertEqual(cache.get('vacations:liked:1:7'), 'x')
+        self.assertEqual(cache.get_many(['vacations:liked:1:7', 'vacations:liked:1:8']), {'vacations:liked:1:7': 'x'})
+        after = self.scrape()
+        
+        hits = 'cache_lookups_total{family="vacations:liked",result="hit"}'
+        misses = 'cache_lookups_total{family="vacations:liked",result="miss"}'
+        self.assertEqual(after[hits] - before.get(hits, 0), 2)
+        self.assertEqual(after[misses] - before.get(misses, 0), 2)
+        self.assertEqual(after['cache_hit_ratio{family="vacations:liked"}'],
+                         after[hits] / (after[hits] + after[misses]))
+    
+    def test_shards_summed_across_processes(self):
+        import os
+        import tempfile
+        import threading
+        from unittest import mock
+        from django.test import override_settings
+        from instrumentation import metrics
+        
+        counter = metrics.Counter('test_events_total', 'Test events', ['kind'])
+        gauge = metrics.Gauge('test_busy', 'Test gauge')
+        self.addCleanup(metrics._registry.pop, counter.name)
+        self.addCleanup(metrics._registry.pop, gauge.name)
+        
+        def record():
+            counter.inc('a', amount=2)
+            gauge.inc()
+        
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory), \
+                mock.patch.object(metrics, '_free_shards', []):
+            # Threads alive at the same time write shard files of their own
+            together = threading.Barrier(2)
+            threads = [threading.Thread(target=lambda: (record(), together.wait())) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(os.listdir(directory)), 2)
+            
+            # A worker that has exited: its counters stay, its gauges go
+            name = os.listdir(directory)[0]
+            os.rename(os.path.join(directory, name), os.path.join(directory, f'99999999-{name}'))
+            samples = self.scrape()
+        
+        self.assertEqual(samples['test_events_total{kind="a"}'], 4)
+        self.assertEqual(samples['test_busy'], 1)
+    
+    def test_exited_threads_leave_their_shards_to_new_ones(self):
+        import threading
+        from instrumentation import metrics
+        
+        counter = metrics.Counter('test_thread_events_total', 'Test events')
+        self.addCleanup(metrics._registry.pop, counter.name)
+        
+        shards = len(metrics._shards)
+        # One thread per request, as under runserver
+        for _ in range(20):
+            thread = threading.Thread(target=counter.inc)
+            thread.start()
+            thread.join()
+        
+        self.assertLessEqual(len(metrics._shards), shards + 1)
+        self.assertEqual(self.scrape()['test_thread_events_total'], 20)
+    
+    def test_scraped_only_from_allowed_networks_or_with_token(self):
+        def status(address, **headers):
+            return self.client.get(reverse('metrics'), REMOTE_ADDR=address, headers=headers).status_code
+        
+        # Loopback only by default
+        self.assertEqual(status('127.0.0.1'), 200)
+        self.assertEqual(status('203.0.113.7', Authorization='Bearer s3cret'), 403)
+        
+        with override_settings(METRICS_ALLOWED_NETWORKS=['10.0.0.0/8'], METRICS_TOKEN='s3cret'):
+            self.assertEqual(status('10.1.2.3'), 200)
+            self.assertEqual(status('127.0.0.1'), 403)
+            self.assertEqual(status('203.0.113.7', Authorization='Bearer wrong'), 403)
+            self.assertEqual(status('203.0.113.7', Authorization='Bearer s3cret'), 200)
+
+
+@override_settings(
+    AUTH_USER_CACHE=True,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    PASSWORD_HASHERS=FAST_PASSWORD_HASHERS,
+)
+class AuthUserCacheTestCase(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.admin_role = Role.objects.create(role_name='admin')
+        self.user_role = Role.objects.create(role_name='user')
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.client.post(reverse('login'), {'email': 'user@test.com', 'password': 'testpass123'})
+    
+    def auth_queries(self):
+        """Statements a page request runs against the session, user and role tables"""
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('vacation_list'))
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries.captured_queries
+            if any(table in query['sql'] for table in ('"django_session"', '"users"', '"roles"'))
+        ]
+    
+    def test_cache_hit_needs_no_auth_queries(self):
+        self.auth_queries()
+        self.assertEqual(self.auth_queries(), [])
+    
+    async def test_async_lookup_goes_through_cache(self):
+        from .backends import EmailBackend
+        
+        user = await EmailBackend().aget_user(self.user.pk)
+        
+        self.assertEqual(user.pk, self.user.pk)
+        # Loaded with its role, as get_user() caches it
+        self.assertIn('role', user._state.fields_cache)
+    
+    def test_miss_loads_user_with_role_in_one_query(self):
+        from .refdata import reference_data
+        
+        cache.clear()
+        reference_data.snapshot()
+        queries = self.auth_queries()
+        
+        # The session from the database, then the user joined to its role
+        self.assertEqual(len(queries), 2)
+        self.assertIn('"roles"', queries[1])
+    
+    def test_user_save_invalidates(self):
+        self.auth_queries()
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        
+        response = self.client.get(reverse('vacation_list'))
+        self.assertEqual(response.context['user'].first_name, 'Renamed')
+    
+    def test_role_change_invalidates(self):
+        self.assertFalse(self.client.get(reverse('vacation_list')).context['user'].is_admin)
+        self.user_role.role_name = 'admin'
+        self.admin_role.delete()
+        self.user_role.save()
+        
+        self.assertTrue(self.client.get(reverse('vacation_list')).context['user'].is_admin)
+    
+    def test_deleted_user_logged_out(self):
+        self.auth_queries()
+        self.user.delete()
+        
+        response = self.client.get(reverse('vacation_list'))
+        self.assertEqual(response.status_code, 302)
+    
+    def test_load_racing_an_update_stays_stale(self):
+        from .cache import forget_auth_users, get_auth_user
+        
+        stale = User.objects.get(pk=self.user.pk)
+        
+        def load_then_update():
+            # The user changes after it was read but before it is cached
+            forget_auth_users([self.user.pk])
+            return stale
+        
+        cache.clear()
+        self.assertIs(get_auth_user(self.user.pk, load_then_update), stale)
+        fresh = get_auth_user(self.user.pk, lambda: 'reloaded')
+        self.assertEqual(fresh, 'reloaded')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class UnsharedCacheAuthTestCase(TestCase):
+    """A process-local cache, as by default: nothing another worker could change is cached"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user_role = Role.objects.create(role_name='user')
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.client.post(reverse('login'), {'email': 'user@test.com', 'password': 'testpass123'})
+    
+    def test_user_changed_elsewhere_takes_effect_at_once(self):
+        from django.conf import settings
+        from django.contrib.sessions.models import Session
+        
+        self.assertFalse(settings.CACHE_SHARED)
+        self.assertEqual(self.client.get(reverse('vacation_list')).status_code, 200)
+        
+        # Deactivated by another worker: no signal reaches this one's cache
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(reverse('vacation_list')).status_code, 302)
+        
+        User.objects.filter(pk=self.user.pk).update(is_active=True)
+        # Logged out by another worker
+        Session.objects.all().delete()
+        self.assertEqual(self.client.get(reverse('vacation_list')).status_code, 302)
+
+
+class ReferenceDataTestCase(TestCase):
+    
+    def setUp(self):
+        from .refdata import reference_data
+        
+        self.admin_role = Role.objects.create(role_name='admin')
+        self.user_role = Role.objects.create(role_name='user')
+        self.italy = Country.objects.create(country_name='Italy')
+        self.spain = Country.objects.create(country_name='Spain')
+        self.reference_data = reference_data
+        self.reference_data.snapshot()
+    
+    def test_lookups_are_query_free(self):
+        from .forms import VacationFilterForm, VacationForm
+        
+        user = User.objects.create_user(
+            email='user@test.com', password='testpass123',
+            first_name='User', last_name='Test', role=self.admin_role
+        )
+        user = User.objects.get(pk=user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(user.is_admin)
+            html = str(VacationForm()['country'])
+            form = VacationFilterForm({'country': str(self.spain.pk)})
+            self.assertTrue(form.is_valid())
+            self.assertEqual(form.cleaned_data['country'], self.spain)
+        self.assertLess(html.index('Italy'), html.index('Spain'))
+    
+    def test_registration_uses_cached_role(self):
+        from django.test.utils import CaptureQueriesContext
+        from .forms import UserRegistrationForm
+        
+        form = UserRegistrationForm({
+            'first_name': 'New', 'last_name': 'User', 'email': 'new@test.com',
+            'password1': 'Str0ng-pass!', 'password2': 'Str0ng-pass!',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as queries:
+            user = form.save()
+        self.assertEqual(user.role, self.user_role)
+        self.assertFalse(any('"roles"' in query['sql'] for query in queries.captured_queries))
+    
+    def test_unknown_country_rejected(self):
+        from .forms import VacationForm
+        
+        form = VacationForm({'country': '999999'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('country', form.errors)
+    
+    def test_local_changes_visible_immediately(self):
+        Country.objects.create(country_name='France')
+        
+        self.assertIn('France', [country.country_name for country in self.reference_data.countries()])
+    
+    def test_other_processes_reload_after_generation_bump(self):
+        from django.db.models import F
+        from django.test import override_settings
+        from .models import ReferenceDataGeneration
+        
+        # Another process renames a country; this one only learns through the counter
+        Country.objects.filter(pk=self.italy.pk).update(country_name='Italia')
+        self.assertEqual(self.reference_data.country(self.italy.pk).country_name, 'Italy')
+        
+        ReferenceDataGeneration.objects.update(generation=F('generation') + 1)
+        with override_settings(REFERENCE_DATA_CHECK_INTERVAL=0):
+            self.assertEqual(self.reference_data.country(self.italy.pk).country_name, 'Italia')
+    
+    def test_generation_bumped_on_commit(self):
+        from .refdata import current_generation
+        
+        before = current_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spain.delete()
+        
+        self.assertEqual(current_generation(), before + 1)
+        self.assertIsNone(self.reference_data.country(self.spain.pk))
+    
+    def test_rolled_back_changes_are_forgotten(self):
+        from django.db import transaction
+        from django.test import override_settings
+        from .forms import VacationForm
+        
+        with override_settings(REFERENCE_DATA_CHECK_INTERVAL=3600):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                atlantis = Country.objects.create(country_name='Atlantis')
+                self.assertIn(atlantis, self.reference_data.countries())
+                raise RuntimeError('roll back')
+            
+            self.assertNotIn('Atlantis', [country.country_name for country in self.reference_data.countries()])
+            self.assertIsNone(self.reference_data.country(atlantis.pk))
+            form = VacationForm({'country': str(atlantis.pk)})
+            self.assertFalse(form.is_valid())
+            self.assertIn('country', form.errors)
+
+
+def async_request(method, path, data=None, user=None, **extra):
+    """A request for calling an async view directly, as if it had passed the middleware"""
+    from importlib import import_module
+    from django.conf import settings
+    from django.contrib.auth.models import AnonymousUser
+    from django.contrib.messages.storage.fallback import FallbackStorage
+    from django.test import AsyncRequestFactory
+    
+    request = getattr(AsyncRequestFactory(), method)(path, data, **extra)
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    request._messages = FallbackStorage(request)
+    request.user = user or AnonymousUser()
+    
+    async def auser():
+        return request.user
+    request.auser = auser
+    return request
+
+
+class AsyncAuthViewsTestCase(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.user_role = Role.objects.create(role_name='user')
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+    
+    def request(self, path, data):
+        return async_request('post', path, data)
+    
+    async def test_login_signs_user_in(self):
+        from . import views
+        
+        request = self.request('/login/', {'email': 'user@test.com', 'password': 'testpass123'})
+        response = await views.alogin_view(request)
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('vacation_list'))
+        self.assertEqual(request.user.pk, self.user.pk)
+    
+    async def test_wrong_password_is_rejected(self):
+        from . import views
+        
+        request = self.request('/login-simple/', {'email': 'user@test.com', 'password': 'wrong'})
+        response = await views.alogin_simple_view(request)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(request.user.is_authenticated)
+    
+    async def test_unknown_email_costs_a_hash(self):
+        from unittest import mock
+        from . import backends, views
+        
+        request = self.request('/login/', {'email': 'nobody@test.com', 'password': 'testpass123'})
+        with mock.patch.object(backends, 'amake_password', wraps=backends.amake_password) as amake_password:
+            response = await views.alogin_view(request)
+        
+        self.assertEqual(response.status_code, 200)
+        amake_password.assert_awaited_once_with('testpass123')
+    
+    async def test_saturated_pool_answers_429(self):
+        import threading
+        from unittest import mock
+        from . import hashing, views
+        
+        full = threading.BoundedSemaphore(1)
+        full.acquire()
+        hashing._pool()
+        request = self.request('/login/', {'email': 'user@test.com', 'password': 'testpass123'})
+        with mock.patch.object(hashing, '_slots', full):
+            response = await views.alogin_view(request)
+        
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(request.user.is_authenticated)
+    
+    async def test_hashing_slots_are_released(self):
+        import threading
+        from unittest import mock
+        from . import hashing
+        
+        hashing._pool()
+        slots = threading.BoundedSemaphore(1)
+        with mock.patch.object(hashing, '_slots', slots):
+            encoded = await hashing.amake_password('testpass123')
+            self.assertEqual(await hashing.averify_password('testpass123', encoded), (True, False))
+            with self.assertRaises(ValueError):
+                await hashing.run_hashing(int, 'not a number')
+            # A BoundedSemaphore refuses to be released past its size
+            self.assertTrue(slots.acquire(blocking=False))
+    
+    async def test_cancelled_request_holds_slot_until_hash_finishes(self):
+        import asyncio
+        import threading
+        from unittest import mock
+        from . import hashing
+        
+        hashing._pool()
+        slots = threading.BoundedSemaphore(1)
+        started, finish = threading.Event(), threading.Event()
+        
+        def slow_hash():
+            started.set()
+            finish.wait(5)
+        
+        with mock.patch.object(hashing, '_slots', slots):
+            task = asyncio.create_task(hashing.run_hashing(slow_hash))
+            await asyncio.to_thread(started.wait, 5)
+            # The client disconnects while its hash is running
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertFalse(slots.acquire(blocking=False))
+            
+            finish.set()
+            for _ in range(100):
+                if slots.acquire(blocking=False):
+                    break
+                await asyncio.sleep(0.01)
+            else:
+                self.fail('slot not released after the hash finished')
+    
+    async def test_register_creates_user_and_signs_in(self):
+        from . import views
+        
+        request = self.request('/register/', {
+            'first_name': 'New',
+            'last_name': 'User',
+            'email': 'new@test.com',
+            'password1': 'newpass123',
+            'password2': 'newpass123',
+        })
+        response = await views.aregister_view(request)
+        
+        self.assertEqual(response.status_code, 302)
+        user = await User.objects.select_related('role').aget(email='new@test.com')
+        self.assertTrue(user.check_password('newpass123'))
+        self.assertEqual(user.role.role_name, 'user')
+        self.assertEqual(request.user.pk, user.pk)
+
+
+class AsyncVacationListTestCase(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.admin_role = Role.objects.create(role_name='admin')
+        self.user_role = Role.objects.create(role_name='user')
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        self.admin = User.objects.create_user(
+            email='admin@test.com',
+            password='testpass123',
+            first_name='Admin',
+            last_name='Test',
+            role=self.admin_role
+        )
+        country = Country.objects.create(country_name='Test Country')
+        self.vacations = [
+            Vacation.objects.create(
+                country=country,
+                description=f'Async vacation {i}',
+                start_date=date.today() + timedelta(days=30 + i),
+                end_date=date.today() + timedelta(days=40 + i),
+                price=1000 + i,
+                image_file='test.jpg'
+            )
+            for i in range(3)
+        ]
+        Like.objects.create(user=self.user, vacation=self.vacations[1])
+    
+    def card_ids(self, response):
+        import re
+        return re.findall(r'data-vacation-id="(\d+)"\s+data-liked="(\w+)"', response.content.decode())
+    
+    async def render(self, user, query='', **headers):
+        from . import views
+        
+        request = async_request('get', '/' + query, user=user, headers=headers)
+        return await views.avacation_list_view(request)
+    
+    async def test_matches_sync_view(self):
+        from asgiref.sync import sync_to_async
+        
+        await sync_to_async(self.client.force_login)(self.user)
+        expected = await sync_to_async(self.client.get)(reverse('vacation_list'), {'sort': 'popular'})
+        response = await self.render(self.user, '?sort=popular')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], expected['ETag'])
+        self.assertEqual(response['Last-Modified'], expected['Last-Modified'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.card_ids(response), self.card_ids(expected))
+        self.assertIn((str(self.vacations[1].id), 'true'), self.card_ids(response))
+    
+    async def test_unchanged_list_returns_304(self):
+        etag = (await self.render(self.user))['ETag']
+        
+        response = await self.render(self.user, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+    
+    async def test_admin_gets_admin_list(self):
+        response = await self.render(self.admin)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(reverse('add_vacation'), response.content.decode())
+    
+    async def test_anonymous_user_is_redirected(self):
+        response = await self.render(None)
+        
+        self.assertEqual(response.status_code, 302)
+
+
+class ConnectionPoolTestCase(TransactionTestCase):
+    
+    def setUp(self):
+        if connection.vendor != 'postgresql' or connection.pool is None:
+            self.skipTest('connection pooling needs PostgreSQL with DB_POOL on')
+    
+    def samples(self):
+        from instrumentation.metrics import exposition
+        
+        return {
+            name: float(value)
+            for name, value in (line.rsplit(' ', 1) for line in exposition().splitlines() if not line.startswith('#'))
+        }
+    
+    def test_connection_from_pool_is_measured_and_returned(self):
+        import threading
+        
+        waits = 'db_connection_wait_seconds_count{alias="default",source="pool"}'
+        in_use = 'db_connections_in_use{alias="default"}'
+        before = self.samples()
+        holding = {}
+        
+        def request():
+            # A thread of its own gets a connection of its own
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            holding.update(self.samples())
+            connection.close()
+        
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+        after = self.samples()
+        
+        self.assertEqual(holding[waits] - before.get(waits, 0), 1)
+        self.assertEqual(holding[in_use] - before.get(in_use, 0), 1)
+        self.assertEqual(holding['db_pool_max_connections{alias="default"}'], connection.pool.max_size)
+        self.assertEqual(holding['db_pool_utilisation{alias="default"}'],
+                         holding[in_use] / connection.pool.max_size)
+        # Closing handed the connection back to the pool
+        self.assertEqual(after[in_use], before.get(in_use, 0))
+        self.assertGreaterEqual(connection.pool.get_stats()['pool_available'], 1)
+    
+    def test_timed_out_waits_are_counted(self):
+        import threading
+        from unittest import mock
+        from django.db import OperationalError
+        
+        errors = 'db_connection_errors_total{alias="default",source="pool"}'
+        before = self.samples().get(errors, 0)
+        pool = connection.pool
+        taken = []
+        self.addCleanup(lambda: [pool.putconn(conn) for conn in taken])
+        # Take every connection the pool has left, once it is done opening them
+        pool.open()
+        pool.wait()
+        while pool.get_stats()['pool_size'] < pool.max_size or pool.get_stats()['pool_available']:
+            taken.append(pool.getconn())
+        raised = []
+        
+        def request():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            except OperationalError as exc:
+                raised.append(exc)
+            finally:
+                connection.close()
+        
+        with mock.patch.object(pool, 'timeout', 0.05):
+            thread = threading.Thread(target=request)
+            thread.start()
+            thread.join()
+        
+        self.assertEqual(len(raised), 1)
+        self.assertEqual(self.samples()[errors] - before, 1)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class ReplicaReadsTestCase(TestCase):
+    """Routing tests need a 'replica' database; in tests it mirrors the default one"""
+    
+    databases = '__all__'
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from django.db import connections
+        
+        def close_replica():
+            # The test database can't be dropped while the replica holds connections to it
+            connections['replica'].close()
+            if connections['replica'].vendor == 'postgresql':
+                connections['replica'].close_pool()
+        
+        if 'replica' in connections.settings:
+            cls.addClassCleanup(close_replica)
+    
+    def setUp(self):
+        from . import replicas
+        
+        self.replicas = replicas
+        replicas.replica.invalidate()
+        self.addCleanup(replicas.replica.invalidate)
+        self.user_role = Role.objects.create(role_name='user')
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            first_name='User',
+            last_name='Test',
+            role=self.user_role
+        )
+        country = Country.objects.create(country_name='Italy')
+        self.vacation = Vacation.objects.create(
+            country=country,
+            description='Rome',
+            start_date=date.today() + timedelta(days=10),
+            end_date=date.today() + timedelta(days=20),
+            price=1000,
+            image_file='rome.jpg'
+        )
+        self.client.force_login(self.user)
+    
+    def require_replica(self):
+        from django.db import connections
+        
+        if 'replica' not in connections.settings:
+            self.skipTest('no replica database configured')
+    
+    def read_db(self, model=Vacation):
+        """The database a read of ``model`` goes to while serving a GET request"""
+        token = self.replicas.replica_reads.set(True)
+        try:
+            return model.objects.all().db
+        finally:
+            self.replicas.replica_reads.reset(token)
+    
+    def test_reads_go_to_replica_during_requests_only(self):
+        self.require_replica()
+        
+        self.assertEqual(self.read_db(), 'replica')
+        self.assertEqual(self.read_db(Like), 'replica')
+        # Other models, writes and reads outside a request stay on the primary
+        self.assertEqual(self.read_db(User), 'default')
+        self.assertEqual(Vacation.objects.all().db, 'default')
+    
+    def test_falls_back_to_primary_when_replica_lags_or_is_down(self):
+        from unittest import mock
+        from django.db import OperationalError
+        from django.test import override_settings
+        
+        self.require_replica()
+        replica = self.replicas.replica
+        
+        with override_settings(REPLICA_MAX_LAG_SECONDS=5), \
+                mock.patch.object(type(replica), 'lag', return_value=30.0):
+            self.assertEqual(self.read_db(), 'default')
+        # The answer stands until the next check is due
+        self.assertEqual(self.read_db(), 'default')
+        
+        replica.invalidate()
+        with mock.patch.object(type(replica), 'lag', side_effect=OperationalError('connection refused')):
+            self.assertEqual(self.read_db(), 'default')
+        
+        replica.invalidate()
+        self.assertEqual(self.read_db(), 'replica')
+    
+    def test_lag_is_measured_on_replica(self):
+        self.require_replica()
+        
+        # The test database is a primary, or SQLite standing in for a replica
+        self.assertEqual(self.replicas.replica.lag(), 0)
+    
+    def test_like_pins_session_to_primary(self):
+        import time
+        from unittest import mock
+        from django.test import override_settings
+        
+        with override_settings(REPLICA_READS=True), \
+                mock.patch.object(self.replicas.replica, 'usable', return_value=False) as usable:
+            self.client.get(reverse('vacation_list'))
+            self.assertTrue(usable.called)
+            
+            response = self.client.post(reverse('toggle_like', args=[self.vacation.id]))
+            self.assertTrue(response.json()['liked'])
+            pinned_until = self.client.session[self.replicas.PIN_SESSION_KEY]
+            self.assertGreater(pinned_until, time.time())
+            
+            # Until the pin runs out, this session's pages read from the primary
+            usable.reset_mock()
+            self.client.get(reverse('vacation_list'))
+            self.assertFalse(usable.called)
+            
+            with mock.patch('vacations.replicas.time.time', return_value=pinned_until + 1):
+                self.client.get(reverse('vacation_list'))
+            self.assertTrue(usable.called)
+    
+    def test_sessions_without_writes_are_not_pinned(self):
+        from django.test import override_settings
+        
+        with override_settings(REPLICA_READS=True):
+            self.client.get(reverse('vacation_list'))
+            self.client.post(reverse('toggle_like', args=[self.vacation.id + 1]))
+            self.client.logout()
+            self.client.post(reverse('login'), {'email': 'user@test.com', 'password': 'wrong'})
+        
+        self.assertNotIn(self.replicas.PIN_SESSION_KEY, self.client.session)
+
+
+class ReplicaWritesTestCase(TransactionTestCase):
+    """Commits its rows, so that the replica's connection can read them"""
+    
+    databases = '__all__'
+    
+    def setUp(self):
+        from django.db import connections
+        
+        if 'replica' not in connections.settings:
+            self.skipTest('no replica database configured')
+        
+        def close_replica():
+            connections['replica'].close()
+            if connections['replica'].vendor == 'postgresql':
+                connections['replica'].close_pool()
+        
+        self.addCleanup(close_replica)
+        country = Country.objects.create(country_name='Italy')
+        self.vacation = Vacation.objects.create(
+            country=country,
+            description='Rome',
+            start_date=date.today() + timedelta(days=10),
+            end_date=date.today() + timedelta(days=20),
+            price=1000,
+            image_file='rome.jpg'
+        )
+    
+    def test_instance_read_from_replica_is_saved_to_primary(self):
+        from . import replicas
+        
+        replicas.replica.invalidate()
+        token = replicas.replica_reads.set(True)
+        try:
+            vacation = Vacation.objects.get(pk=self.vacation.pk)
+        finally:
+            replicas.replica_reads.reset(token)
+        self.assertEqual(vacation._state.db, 'replica')
+        
+        vacation.description = 'Edited'
+        vacation.save()
+        
+        self.assertEqual(vacation._state.db, 'default')
+        self.assertEqual(Vacation.objects.get(pk=self.vacation.pk).description, 'Edited')
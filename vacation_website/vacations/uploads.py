@@ -0,0 +1,124 @@
+"""
+Bounded-memory handling of vacation image uploads.
+
+Django already spools large uploads to a temporary file, and
+UploadSizeLimitHandler stops storing one as soon as it grows past the size
+limit. From there the image is validated from its header alone (format and
+pixel dimensions, so decompression bombs are rejected before anything is
+decoded) and handed to
+content-addressed storage (see vacations.storage), which hashes it in chunks
+and moves the temporary file into place instead of copying it through memory.
+"""
+import warnings
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+from .images import available_widths, generate_derivatives
+from .storage import vacation_image_storage
+
+# Extension of stored originals by Pillow format, whatever the client named the file
+IMAGE_FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+ALLOWED_IMAGE_FORMATS = set(IMAGE_FORMAT_EXTENSIONS)
+
+
+def max_upload_size() -> int:
+    return settings.VACATION_IMAGE_MAX_UPLOAD_SIZE
+
+
+def max_image_pixels(image_format: str) -> int:
+    # Only JPEG is decoded at a fraction of its size (see images.generate_derivatives)
+    if image_format == 'JPEG':
+        return settings.VACATION_IMAGE_MAX_PIXELS
+    return settings.VACATION_IMAGE_MAX_FULL_DECODE_PIXELS
+
+
+class OversizedUpload(UploadedFile):
+    """An uploaded file dropped for exceeding the size limit; only its size is kept"""
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+
+
+class UploadSizeLimitHandler(FileUploadHandler):
+    """
+    Listed first in FILE_UPLOAD_HANDLERS: once a file grows past
+    ``VACATION_IMAGE_MAX_UPLOAD_SIZE`` the rest of it is counted but no
+    longer stored, and it arrives as an OversizedUpload for validation to
+    reject.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.oversized = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) <= max_upload_size():
+            return raw_data
+        if not self.oversized:
+            self.oversized = True
+            # Free what the handlers after this one stored of it so far
+            for handler in self.request.upload_handlers:
+                if handler is not self and hasattr(handler, 'file'):
+                    handler.file.close()
+        return None
+
+    def file_complete(self, file_size):
+        if self.oversized:
+            return OversizedUpload(self.file_name, self.content_type, file_size, self.charset,
+                                   self.content_type_extra)
+        return None
+
+
+def validate_image_upload(upload) -> None:
+    """
+    Reject uploads that are too large, not an image, or whose dimensions
+    would decode into too much memory. Only the file header is read.
+    """
+    if upload.size > max_upload_size():
+        raise ValidationError(
+            f'Image is too large ({filesizeformat(upload.size)}); '
+            f'the maximum is {filesizeformat(max_upload_size())}.'
+        )
+
+    try:
+        # Image.open() only parses the header; pixel data is never loaded here.
+        # Pillow's own bomb check is replaced by the explicit limit below.
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(upload) as image:
+                image_format = image.format
+                width, height = image.size
+    except (Image.DecompressionBombError, OSError, ValueError, SyntaxError) as e:
+        raise ValidationError('Upload a valid image.') from e
+    finally:
+        upload.seek(0)
+
+    if image_format not in ALLOWED_IMAGE_FORMATS:
+        raise ValidationError(f'Unsupported image format: {image_format}.')
+
+    if width * height > max_image_pixels(image_format):
+        raise ValidationError(
+            f'Image dimensions {width}x{height} are too large; '
+            f'the maximum is {max_image_pixels(image_format):,} pixels.'
+        )
+
+
+def store_vacation_image(upload) -> str:
+    """
+    Stream a validated upload into content-addressed storage, build its
+    derivatives and return its path. Re-uploading an image that is already
+    stored returns the existing path and reuses its derivatives.
+    """
+    # Header only, like validate_image_upload(): the same bytes always get the same name
+    with Image.open(upload) as image:
+        extension = IMAGE_FORMAT_EXTENSIONS[image.format]
+    upload.seek(0)
+    path = vacation_image_storage.save(f'image{extension}', upload)
+    if not available_widths(path):
+        generate_derivatives(path)
+    return path
@@ -1,14 +1,26 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
+
+if settings.ASYNC_VIEWS:
+    vacation_list_view = views.avacation_list_view
+    register_view, login_view, login_simple_view = views.aregister_view, views.alogin_view, views.alogin_simple_view
+else:
+    vacation_list_view = views.vacation_list_view
+    register_view, login_view, login_simple_view = views.register_view, views.login_view, views.login_simple_view
 
 urlpatterns = [
-    path('', views.vacation_list_view, name='vacation_list'),
-    path('register/', views.register_view, name='register'),
-    path('login/', views.login_view, name='login'),
-    path('login-simple/', views.login_simple_view, name='login_simple'),
+    path('', vacation_list_view, name='vacation_list'),
+    path('vacations/page/', views.vacation_page_view, name='vacation_page'),
+    path('search/', views.search_view, name='search'),
+    path('register/', register_view, name='register'),
+    path('login/', login_view, name='login'),
+    path('login-simple/', login_simple_view, name='login_simple'),
     path('logout/', views.logout_view, name='logout'),
     path('add/', views.add_vacation_view, name='add_vacation'),
     path('edit/<int:vacation_id>/', views.edit_vacation_view, name='edit_vacation'),
     path('delete/<int:vacation_id>/', views.delete_vacation_view, name='delete_vacation'),
-    path('like/<int:vacation_id>/', views.toggle_like_view, name='toggle_like'),
+    path('like/<int:vacation_id>/', views.like_view, name='toggle_like'),
+    path('api/vacations/', api.vacation_list_api, name='api_vacation_list'),
+    path('api/vacations/<int:vacation_id>/', api.vacation_detail_api, name='api_vacation_detail'),
 ]
\ No newline at end of file
@@ -1,14 +1,28 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import aauthenticate, alogin, authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, Http404
-from django.views.decorators.http import require_POST
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-import os
+from django.http import HttpResponse, JsonResponse, Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST, require_http_methods
+from django.views.static import serve
+from django.db import transaction
+from django.db.models import Count, Max
+from django.template.loader import render_to_string
+from asgiref.sync import sync_to_async
+from datetime import datetime, timezone as dt_timezone
+import hashlib
 from .models import User, Vacation, Like, Role, Country
-from .forms import UserRegistrationForm, UserLoginForm, VacationForm
+from .forms import UserRegistrationForm, UserLoginForm, VacationForm, VacationFilterForm
+from .likes import add_like, remove_like
+from .uploads import store_vacation_image
+from .hashing import HashingPoolSaturated, amake_password
+from .cache import catalog_deleted_at, get_liked_entry, like_version, liked_vacation_ids, record_like
+from .pagination import InvalidCursor, apaginate_keyset, paginate_keyset
+from .search import search_vacations
+from .storage import BLOB_NAME_RE
 
 
 def register_view(request):
@@ -79,22 +93,168 @@ def login_simple_view(request):
     return render(request, 'vacations/login_simple.html', {'form': form})
 
 
+# Async login and registration, served instead of the views above when
+# settings.ASYNC_VIEWS is on (under ASGI). Password hashing runs on the
+# bounded pool in hashing.py rather than on the event loop or on a thread
+# per request, and a saturated pool gets a fast 429.
+
+def too_many_sign_ins():
+    response = HttpResponse(
+        'Too many sign-ins at the moment, please try again shortly.',
+        status=429,
+        content_type='text/plain',
+    )
+    response['Retry-After'] = '1'
+    return response
+
+
+async def _alogin(request, template_name, invalid_message):
+    if request.method == 'POST':
+        form = UserLoginForm(request.POST)
+        
+        if form.is_valid():
+            email = form.cleaned_data['email']
+            password = form.cleaned_data['password']
+            
+            try:
+                user = await aauthenticate(request, username=email, password=password)
+            except HashingPoolSaturated:
+                return too_many_sign_ins()
+            
+            if user is not None:
+                await alogin(request, user)
+                messages.success(request, f'Welcome back, {user.first_name}!')
+                return redirect('vacation_list')
+            else:
+                messages.error(request, invalid_message)
+        else:
+            for field, errors in form.errors.items():
+                for error in errors:
+                    messages.error(request, f"{field}: {error}")
+    else:
+        form = UserLoginForm()
+    
+    return await sync_to_async(render)(request, template_name, {'form': form})
+
+
+async def alogin_view(request):
+    return await _alogin(request, 'vacations/login.html', 'Invalid email or password. Please try again.')
+
+
+async def alogin_simple_view(request):
+    return await _alogin(request, 'vacations/login_simple.html', 'Invalid email or password.')
+
+
+async def aregister_view(request):
+    if request.method == 'POST':
+        form = UserRegistrationForm(request.POST)
+        if await sync_to_async(form.is_valid)():
+            try:
+                form.encoded_password = await amake_password(form.cleaned_data['password1'])
+            except HashingPoolSaturated:
+                return too_many_sign_ins()
+            user = await sync_to_async(form.save)()
+            messages.success(request, 'Registration successful!')
+            await alogin(request, user, backend='vacations.backends.EmailBackend')
+            return redirect('vacation_list')
+        else:
+            messages.error(request, 'Please correct the errors below.')
+    else:
+        form = UserRegistrationForm()
+    
+    return await sync_to_async(render)(request, 'vacations/register.html', {'form': form})
+
+
 @login_required
 def logout_view(request):
     logout(request)
     return redirect('login')
 
 
+VACATION_PAGE_SIZE = 24
+
+# Matches Vacation.Meta.ordering, with id as a tie-breaker so the cursor is unique
+VACATION_FEED_KEYS = ('start_date', 'id')
+
+# Keyset for each sort option; each one is backed by a composite index on
+# Vacation (alone and prefixed by country_id) so filtered pages never sort
+VACATION_SORTS = {
+    'start_date': VACATION_FEED_KEYS,
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'popular': ('-likes_count', '-id'),
+}
+
+
+def filtered_feed(request):
+    """(filter form, filtered feed queryset, keyset keys) for the list's query string"""
+    form = VacationFilterForm(request.GET)
+    form.is_valid()
+    return form, form.filter(Vacation.objects.for_feed()), VACATION_SORTS[form.sort_order]
+
+
+def mark_user_likes(vacations, user):
+    """Set ``user_liked`` on each card from the user's cached liked set"""
+    liked_ids = liked_vacation_ids(user)
+    for vacation in vacations:
+        vacation.user_liked = vacation.id in liked_ids
+
+
+def _from_ns(timestamp_ns):
+    return datetime.fromtimestamp(timestamp_ns / 1e9, tz=dt_timezone.utc)
+
+
+def vacation_list_validators(request):
+    """
+    Cheap (etag, last_modified) pair for the list page: one aggregate query
+    plus cache reads, computed once per request. Returns (None, None) when
+    the page must be rendered anyway, e.g. flash messages are waiting.
+    """
+    if not hasattr(request, '_vacation_list_validators'):
+        validators = (None, None)
+        if request.user.is_authenticated and not len(messages.get_messages(request)):
+            catalog = Vacation.objects.aggregate(last_updated=Max('updated_at'), total=Count('id'))
+            user_likes = like_version(request.user) if not request.user.is_admin else 0
+            validators = list_validators(
+                request, request.user, request.user.is_admin, catalog, user_likes, catalog_deleted_at()
+            )
+        request._vacation_list_validators = validators
+    return request._vacation_list_validators
+
+
+def list_validators(request, user, is_admin, catalog, user_likes, deleted_at):
+    """(etag, last_modified) from the catalog aggregate and the cached versions"""
+    etag = hashlib.sha1(':'.join(str(part) for part in (
+        user.pk,
+        is_admin,
+        catalog['last_updated'],
+        catalog['total'],
+        user_likes,
+        request.get_full_path(),
+    )).encode()).hexdigest()
+    
+    candidates = [_from_ns(user_likes), _from_ns(deleted_at)]
+    if catalog['last_updated']:
+        candidates.append(catalog['last_updated'])
+    return etag, max(candidates)
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=lambda request: vacation_list_validators(request)[0],
+    last_modified_func=lambda request: vacation_list_validators(request)[1],
+)
 def vacation_list_view(request):
-    vacations = Vacation.objects.all().order_by('start_date')
-    
-    # Check if user liked each vacation
-    for vacation in vacations:
-        vacation.user_liked = vacation.is_liked_by_user(request.user)
+    filter_form, vacations, keys = filtered_feed(request)
+    page = paginate_keyset(vacations, keys, VACATION_PAGE_SIZE)
+    if not request.user.is_admin:
+        mark_user_likes(page, request.user)
     
     context = {
-        'vacations': vacations,
+        'vacations': page,
+        'next_cursor': page.next_cursor,
+        'filter_form': filter_form,
         'is_admin': request.user.is_admin
     }
     
@@ -104,6 +264,103 @@ def vacation_list_view(request):
         return render(request, 'vacations/vacation_list.html', context)
 
 
+def _feed_state(request, user):
+    """
+    The parts of the list page that may query without the async ORM: the
+    filter form and is_admin (reference data) and the cached like state.
+    Returns (filter form, feed queryset, keys, is_admin, like version,
+    liked ids, catalog deletion time).
+    """
+    filter_form, vacations, keys = filtered_feed(request)
+    is_admin = user.is_admin
+    user_likes, liked_ids = (0, frozenset()) if is_admin else get_liked_entry(user.pk)
+    return filter_form, vacations, keys, is_admin, user_likes, liked_ids, catalog_deleted_at()
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+async def avacation_list_view(request):
+    """
+    vacation_list_view() through the async ORM, served instead of it when
+    settings.ASYNC_VIEWS is on. Answers conditional requests itself, since
+    condition() would run the validators' query on the event loop.
+    """
+    user = await request.auser()
+    filter_form, vacations, keys, is_admin, user_likes, liked_ids, deleted_at = (
+        await sync_to_async(_feed_state)(request, user)
+    )
+    
+    etag = last_modified = None
+    # request.auser() loaded the session, so reading messages needs no query
+    if not len(messages.get_messages(request)):
+        catalog = await Vacation.objects.aaggregate(last_updated=Max('updated_at'), total=Count('id'))
+        etag, last_modified = list_validators(request, user, is_admin, catalog, user_likes, deleted_at)
+        etag, last_modified = quote_etag(etag), int(last_modified.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return set_validators(request, response, etag, last_modified)
+    
+    page = await apaginate_keyset(vacations, keys, VACATION_PAGE_SIZE)
+    if not is_admin:
+        for vacation in page:
+            vacation.user_liked = vacation.id in liked_ids
+    
+    context = {
+        'vacations': page,
+        'next_cursor': page.next_cursor,
+        'filter_form': filter_form,
+        'is_admin': is_admin
+    }
+    
+    template = 'vacations/admin_vacation_list.html' if is_admin else 'vacations/vacation_list.html'
+    response = await sync_to_async(render)(request, template, context)
+    return set_validators(request, response, etag, last_modified)
+
+
+def set_validators(request, response, etag, last_modified):
+    """Add ETag and Last-Modified to a GET or HEAD response, like condition() does"""
+    if request.method in ('GET', 'HEAD'):
+        if last_modified and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+        if etag:
+            response.headers.setdefault('ETag', etag)
+    return response
+
+
+@login_required
+def vacation_page_view(request):
+    """Next page of vacation cards for infinite scrolling, as an HTML fragment in JSON"""
+    _, vacations, keys = filtered_feed(request)
+    try:
+        page = paginate_keyset(vacations, keys, VACATION_PAGE_SIZE, after=request.GET.get('after'))
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    if not request.user.is_admin:
+        mark_user_likes(page, request.user)
+    
+    html = render_to_string('vacations/vacation_cards.html', {
+        'vacations': page,
+        'is_admin': request.user.is_admin
+    }, request=request)
+    
+    return JsonResponse({
+        'success': True,
+        'html': html,
+        'next_cursor': page.next_cursor
+    })
+
+
+@login_required
+def search_view(request):
+    """Vacations matching ?q=, best match first, with highlighted snippets"""
+    query = request.GET.get('q', '').strip()
+    return render(request, 'vacations/search.html', {
+        'query': query,
+        'vacations': search_vacations(query),
+        'is_admin': request.user.is_admin
+    })
+
+
 @login_required
 def add_vacation_view(request):
     if not request.user.is_admin:
@@ -115,12 +372,9 @@ def add_vacation_view(request):
         if form.is_valid():
             vacation = form.save(commit=False)
             
-            # Handle image upload
-            if 'image' in request.FILES:
-                image = request.FILES['image']
-                filename = f"vacation_images/{image.name}"
-                path = default_storage.save(filename, ContentFile(image.read()))
-                vacation.image_file = os.path.basename(path)
+            # Handle image upload (streamed to storage, never read into memory)
+            if form.cleaned_data.get('image'):
+                vacation.image_file = store_vacation_image(form.cleaned_data['image'])
             else:
                 vacation.image_file = 'images/vacation_images/default.jpg'
             
@@ -148,12 +402,9 @@ def edit_vacation_view(request, vacation_id):
         if form.is_valid():
             vacation = form.save(commit=False)
             
-            # Handle image upload
-            if 'image' in request.FILES:
-                image = request.FILES['image']
-                filename = f"vacation_images/{image.name}"
-                path = default_storage.save(filename, ContentFile(image.read()))
-                vacation.image_file = os.path.basename(path)
+            # Handle image upload (streamed to storage, never read into memory)
+            if form.cleaned_data.get('image'):
+                vacation.image_file = store_vacation_image(form.cleaned_data['image'])
             
             vacation.save()
             messages.success(request, 'Vacation updated successfully!')
@@ -189,19 +440,69 @@ def toggle_like_view(request, vacation_id):
         return JsonResponse({'success': False, 'error': 'Admins cannot like vacations'})
     
     vacation = get_object_or_404(Vacation, id=vacation_id)
-    like, created = Like.objects.get_or_create(
-        user=request.user,
-        vacation=vacation
-    )
     
-    if not created:
-        like.delete()
-        liked = False
-    else:
-        liked = True
+    # Saving or deleting a Like bumps vacation.likes_count with F() in the same
+    # transaction and refreshes it on this instance, so no COUNT is needed
+    with transaction.atomic():
+        like, created = vacation.likes.get_or_create(user=request.user)
+        
+        if not created:
+            like.delete()
+            liked = False
+        else:
+            liked = True
+    
+    record_like(request.user.id, vacation.id, liked)
     
     return JsonResponse({
         'success': True,
         'liked': liked,
         'like_count': vacation.like_count
     })
+
+
+@login_required
+@require_http_methods(['PUT', 'DELETE'])
+def set_like_view(request, vacation_id):
+    """
+    Idempotent like (PUT) / unlike (DELETE): repeating the request leaves the
+    same state, and each one is a single round trip to the database.
+    """
+    if request.user.is_admin:
+        return JsonResponse({'success': False, 'error': 'Admins cannot like vacations'}, status=403)
+    
+    liked = request.method == 'PUT'
+    if liked:
+        like_count = add_like(request.user.id, vacation_id)
+    else:
+        like_count = remove_like(request.user.id, vacation_id)
+    
+    if like_count is None:
+        raise Http404('No Vacation matches the given query.')
+    
+    record_like(request.user.id, vacation_id, liked)
+    
+    return JsonResponse({
+        'success': True,
+        'liked': liked,
+        'like_count': like_count
+    })
+
+
+def like_view(request, vacation_id):
+    """POST toggles the like, PUT/DELETE set it explicitly"""
+    if request.method in ('PUT', 'DELETE'):
+        return set_like_view(request, vacation_id)
+    return toggle_like_view(request, vacation_id)
+
+
+# Content-addressed media never changes under the same URL
+IMMUTABLE_MEDIA_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def serve_media(request, path, document_root=None):
+    """Serve uploaded media; content-addressed images may be cached for a year"""
+    response = serve(request, path, document_root=document_root)
+    if BLOB_NAME_RE.match(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MEDIA_MAX_AGE, immutable=True)
+    return response